@@ -0,0 +1,168 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#A compact binary container for the phone level SiRe labels of a whole corpus.
+#Most contexts only have a few different values, so instead of repeating the "|name:value"
+#text of each context on each line, each different "|name:value" is stored once in a
+#vocabulary of the corpus and each phoneme is a row of the vocabulary ids of its contexts.
+#The .lab text is only made when asked for, see BinaryLabelReader.get_lines.
+#
+#The file is laid out as (all numbers little endian):
+#MAGIC
+#For each utt: the start and end time of each phoneme as int64 followed by the
+#              vocabulary id of each context of each phoneme as uint32, row by row.
+#The index as json: {"version", "columns", "vocab", "utts":[[utt_id, offset, n_rows], ...]}
+#The offset of the index as uint64 followed by MAGIC.
+
+import os, json, struct
+from error_messages import SiReError
+
+BINARY_LAB_EXT = ".slab"
+MAGIC = "SIRELAB\x01"
+VERSION = 1
+
+#Returns True if path is the path of a binary label file.
+def is_binary_labels(path):
+  return path.endswith(BINARY_LAB_EXT)
+
+#Returns the int of a label time as written in a .lab.
+def get_time(t, utt_id):
+  try:
+    i = int(t)
+  except ValueError:
+    i = None
+  if i == None or str(i) != str(t):
+    raise SiReError("Cannot store time {0} of utt {1} in a binary label!".format(t, utt_id))
+  return i
+
+class BinaryLabelWriter(object):
+  """Writes the phone level labels of a corpus into one binary label file."""
+  def __init__(self, path):
+    if not is_binary_labels(path):
+      raise SiReError("A binary label file must end with {0}! Was {1}.".format(BINARY_LAB_EXT, path))
+    self.path = path
+    self.columns = None
+    self.vocab = {}
+    self.utts = []
+    #Written to a temporary file which is renamed when closed so it is never half written.
+    self.wf = open(path+".tmp", "wb")
+    self.wf.write(MAGIC)
+
+  #Writes the label of an utt.
+  #starts, ends = The start and end time of each phoneme.
+  #formatted = A list of (context name, ["|name:value" of each phoneme]) as made by
+  #            context_columns.ContextTable.get_formatted_columns.
+  def write(self, utt_id, starts, ends, formatted):
+    columns = [name for name, values in formatted]
+    if self.columns == None:
+      self.columns = columns
+    elif self.columns != columns:
+      raise SiReError("The contexts of utt {0} differ from those of earlier utts!".format(utt_id))
+    n_rows = len(starts)
+    times = []
+    for start, end in zip(starts, ends):
+      times.append(get_time(start, utt_id))
+      times.append(get_time(end, utt_id))
+    vocab = self.vocab
+    codes = []
+    for row in zip(*[values for name, values in formatted]):
+      for token in row:
+        if token not in vocab:
+          vocab[token] = len(vocab)
+        codes.append(vocab[token])
+    self.utts.append([utt_id, self.wf.tell(), n_rows])
+    self.wf.write(struct.pack("<%dq" % len(times), *times))
+    self.wf.write(struct.pack("<%dI" % len(codes), *codes))
+
+  def close(self):
+    offset = self.wf.tell()
+    vocab = [None]*len(self.vocab)
+    for token, i in self.vocab.iteritems():
+      vocab[i] = token
+    json.dump({"version":VERSION, "columns":self.columns or [], "vocab":vocab, "utts":self.utts}, self.wf)
+    self.wf.write(struct.pack("<Q", offset)+MAGIC)
+    self.wf.close()
+    os.rename(self.path+".tmp", self.path)
+
+class BinaryLabelReader(object):
+  """Reads the labels of a binary label file one utt at a time."""
+  def __init__(self, path):
+    if not os.path.isfile(path):
+      raise SiReError("Binary label file {0} does not exist!".format(path))
+    self.path = path
+    size = os.path.getsize(path)
+    f = open(path, "rb")
+    if size < 2*len(MAGIC)+8 or f.read(len(MAGIC)) != MAGIC:
+      raise SiReError("{0} is not a binary label file!".format(path))
+    f.seek(size-8-len(MAGIC))
+    trailer = f.read()
+    if trailer[8:] != MAGIC:
+      raise SiReError("Binary label file {0} is not complete!".format(path))
+    offset = struct.unpack("<Q", trailer[:8])[0]
+    f.seek(offset)
+    index = json.loads(f.read(size-offset-8-len(MAGIC)))
+    f.close()
+    if index["version"] != VERSION:
+      raise SiReError("Binary label file {0} is version {1} but only version {2} can be read!".format(path, index["version"], VERSION))
+    self.columns = [str(c) for c in index["columns"]]
+    self.vocab = [str(token) for token in index["vocab"]]
+    #The (context name, value) of each vocabulary id.
+    self.values = [tuple(token[1:].split(":", 1)) for token in self.vocab]
+    self.utts = [(str(utt_id), offset, n_rows) for utt_id, offset, n_rows in index["utts"]]
+    self.utt_index = dict([(utt_id, (offset, n_rows)) for utt_id, offset, n_rows in self.utts])
+
+  #Returns the utt ids in the order they were written.
+  def get_utt_ids(self):
+    return [utt_id for utt_id, offset, n_rows in self.utts]
+
+  #Returns the times (start and end of each phoneme) and the vocabulary id of each context of each phoneme.
+  def get_codes(self, utt_id, f=None):
+    if utt_id not in self.utt_index:
+      raise SiReError("Utt {0} is not in binary label file {1}!".format(utt_id, self.path))
+    offset, n_rows = self.utt_index[utt_id]
+    n_cols = len(self.columns)
+    close = f == None
+    if close:
+      f = open(self.path, "rb")
+    f.seek(offset)
+    times = struct.unpack("<%dq" % (2*n_rows), f.read(16*n_rows))
+    codes = struct.unpack("<%dI" % (n_rows*n_cols), f.read(4*n_rows*n_cols))
+    if close:
+      f.close()
+    rows = [codes[j*n_cols:(j+1)*n_cols] for j in xrange(n_rows)]
+    return times, rows
+
+  #Returns the lines of the .lab of an utt exactly as make_full_context_labs writes them.
+  def get_lines(self, utt_id, f=None):
+    times, rows = self.get_codes(utt_id, f)
+    vocab = self.vocab
+    return [str(times[2*j])+" "+str(times[2*j+1])+" "+"".join([vocab[c] for c in row])+"|" for j, row in enumerate(rows)]
+
+  #Returns the label of an utt in the format of sire_io.open_labdir_line_by_line but with a dict
+  #of the value of each context instead of the context string, see utterance_load.build_from_sire_lab.
+  def get_lab(self, utt_id, f=None):
+    times, rows = self.get_codes(utt_id, f)
+    values = self.values
+    return [utt_id]+[[str(times[2*j]), str(times[2*j+1]), dict([values[c] for c in row])] for j, row in enumerate(rows)]
+
+  #Yields the label of each utt in utt_ids (or all in the order written), see get_lab.
+  def iter_labs(self, utt_ids=None):
+    if utt_ids == None:
+      utt_ids = self.get_utt_ids()
+    f = open(self.path, "rb")
+    for utt_id in utt_ids:
+      yield self.get_lab(utt_id, f)
+    f.close()
@@ -0,0 +1,394 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#A compact utterance representation for corpus wide passes.
+#Instead of a graph of Phoneme, Syllable and Word objects the utterance is
+#stored as arrays of integers, one entry per segment. Segment objects are
+#only made as light views when asked for and are not kept around.
+#This does not contain parse or festival information and so cannot be used
+#to make full context labels, use utterance.Utterance for that.
+
+from array import array
+import utterance
+
+class SymbolTable(object):
+  """Maps symbols (phoneme ids, stress values etc.) to integer codes and back."""
+
+  def __init__(self):
+    self.codes = {}
+    self.symbols = []
+
+  def encode(self, symbol):
+    try:
+      return self.codes[symbol]
+    except KeyError:
+      self.codes[symbol] = len(self.symbols)
+      self.symbols.append(symbol)
+      return self.codes[symbol]
+
+  def decode(self, code):
+    return self.symbols[code]
+
+class CompactUtterance(object):
+  """An utterance stored as arrays of segment information."""
+
+  #Takes the same input as utterance.Utterance but only loads the segmental
+  #information, parses and festival features are ignored.
+  #Symbols = The SymbolTable to store the symbols of the utt in. The utts of a corpus
+  #          should share one so each distinct symbol is only stored once for the corpus.
+  def __init__(self, lab, args, symbols=None):
+    self.phoneme_features = utterance.get_phoneme_features(args)
+    if symbols == None:
+      symbols = SymbolTable()
+    self.symbols = symbols
+    #Phoneme arrays
+    self.p_id = array('l')
+    self.p_stress = array('l')
+    self.p_start = array('l')
+    self.p_end = array('l')
+    self.p_syll = array('l')
+    #Syllable arrays
+    self.s_id = array('l')
+    self.s_stress = array('l')
+    self.s_vowel = array('l')
+    self.s_word = array('l')
+    #The utt position of the first phoneme of each syllable, the last entry is the number of phonemes.
+    self.s_first_p = array('l')
+    #Word arrays
+    self.w_id = array('l')
+    #The utt position of the first syllable of each word, the last entry is the number of syllables.
+    self.w_first_s = array('l')
+    #State information is only there for state aligned input.
+    self.states = None
+    #f0 is only added for analysis and is stored as {phoneme utt pos:f0 list}
+    self.f0 = {}
+
+    utterance.build(lab, args, CompactBuilder(self))
+    self.s_first_p.append(len(self.p_id))
+    self.w_first_s.append(len(self.s_id))
+    self.txtloaded = args.intype == "txt"
+
+    self.phonemes = SegmentList(self, PhonemeView, len(self.p_id))
+    self.syllables = SegmentList(self, SyllableView, len(self.s_id))
+    self.words = SegmentList(self, WordView, len(self.w_id))
+
+  def num_phonemes(self):
+    return len(self.p_id)
+
+  def num_syllables(self):
+    return len(self.s_id)
+
+  def num_words(self):
+    return len(self.w_id)
+
+  def num_words_no_pau(self, keep_comma=False):
+    return len(self.get_words_no_pau(keep_comma))
+
+  def num_phonemes_no_pau(self):
+    return len(self.get_phonemes_no_pau())
+
+  def get_words_no_pau(self, keep_comma=False):
+    ignore = self.phoneme_features.get_sil_phonemes()
+    if keep_comma == False:
+      ignore = ignore + [","]
+    return [w for w in self.words if w.id not in ignore]
+
+  def get_phonemes_no_pau(self):
+    ignore = self.phoneme_features.get_sil_phonemes()
+    return [p for p in self.phonemes if p.id not in ignore]
+
+class CompactBuilder(object):
+  """Builds the arrays of a CompactUtterance, see utterance.UtteranceBuilder."""
+
+  def __init__(self, utt):
+    self.utt = utt
+
+  def set_id(self, utt_id):
+    self.utt.id = utt_id
+
+  #Ids are only known when the segment is ended.
+  def start_word(self):
+    self.utt.w_first_s.append(len(self.utt.s_id))
+    self.utt.w_id.append(-1)
+
+  def start_syllable(self, stress):
+    utt = self.utt
+    utt.s_first_p.append(len(utt.p_id))
+    utt.s_id.append(-1)
+    utt.s_stress.append(utt.symbols.encode(stress))
+    utt.s_vowel.append(-1)
+    utt.s_word.append(len(utt.w_id) - 1)
+
+  def add_phoneme(self, p_id, start, end, stress, states=None):
+    utt = self.utt
+    if states != None:
+      if utt.states == None:
+        utt.states = {}
+      utt.states[len(utt.p_id)] = states
+    utt.p_id.append(utt.symbols.encode(p_id))
+    utt.p_stress.append(utt.symbols.encode(stress))
+    utt.p_start.append(int(start))
+    utt.p_end.append(int(end))
+    utt.p_syll.append(len(utt.s_id) - 1)
+
+  def end_syllable(self, s_id=None):
+    utt = self.utt
+    p_ids = [utt.symbols.decode(c) for c in utt.p_id[utt.s_first_p[-1]:]]
+    if s_id == None:
+      s_id = "".join(p_ids)
+    utt.s_id[-1] = utt.symbols.encode(s_id)
+    #If a syllable contains more than one vowel this is the first one.
+    vowel_id = "novowel"
+    for p in p_ids:
+      if utt.phoneme_features.is_vowel(p):
+        vowel_id = p
+        break
+    utt.s_vowel[-1] = utt.symbols.encode(vowel_id)
+    return s_id
+
+  def end_word(self, w_id=None):
+    utt = self.utt
+    if w_id == None:
+      w_id = "".join([utt.symbols.decode(c) for c in utt.s_id[utt.w_first_s[-1]:]])
+    utt.w_id[-1] = utt.symbols.encode(w_id)
+    return w_id
+
+class SegmentList(object):
+  """A read only list of views of one segment type in a compact utt."""
+  __slots__ = ("utt", "view", "length")
+
+  def __init__(self, utt, view, length):
+    self.utt = utt
+    self.view = view
+    self.length = length
+
+  def __len__(self):
+    return self.length
+
+  def __getitem__(self, i):
+    if isinstance(i, slice):
+      return [self.view(self.utt, x) for x in xrange(*i.indices(self.length))]
+    if i < 0:
+      i += self.length
+    if i < 0 or i >= self.length:
+      raise IndexError("segment index out of range")
+    return self.view(self.utt, i)
+
+  def __iter__(self):
+    for i in xrange(self.length):
+      yield self.view(self.utt, i)
+
+class SegmentView(object):
+  """Base class of the views of a segment at a position in a compact utt."""
+  __slots__ = ("parent_utt", "index")
+
+  def __init__(self, utt, index):
+    self.parent_utt = utt
+    self.index = index
+
+  def __eq__(self, other):
+    return type(self) == type(other) and self.index == other.index and self.parent_utt is other.parent_utt
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((id(self.parent_utt), self.index))
+
+  def pos_in_utt(self):
+    return self.index
+
+class PhonemeView(SegmentView):
+  """A view of a phoneme in a compact utt."""
+  __slots__ = ()
+
+  @property
+  def id(self):
+    return self.parent_utt.symbols.decode(self.parent_utt.p_id[self.index])
+
+  @property
+  def stress(self):
+    return self.parent_utt.symbols.decode(self.parent_utt.p_stress[self.index])
+
+  @property
+  def start(self):
+    return self.parent_utt.p_start[self.index]
+
+  @property
+  def end(self):
+    return self.parent_utt.p_end[self.index]
+
+  @property
+  def states(self):
+    if self.parent_utt.states == None or self.index not in self.parent_utt.states:
+      raise AttributeError("phoneme has no state information")
+    return self.parent_utt.states[self.index]
+
+  #f0 is stored in the utt so it survives the view being thrown away.
+  def get_f0(self):
+    try:
+      return self.parent_utt.f0[self.index]
+    except KeyError:
+      raise AttributeError("no f0 has been added to phoneme")
+
+  def set_f0(self, f0):
+    self.parent_utt.f0[self.index] = f0
+
+  f0 = property(get_f0, set_f0)
+
+  @property
+  def parent_syllable(self):
+    return SyllableView(self.parent_utt, self.parent_utt.p_syll[self.index])
+
+  @property
+  def parent_word(self):
+    return WordView(self.parent_utt, self.parent_utt.s_word[self.parent_utt.p_syll[self.index]])
+
+  def pos_in_syllable(self):
+    return self.index - self.parent_utt.s_first_p[self.parent_utt.p_syll[self.index]]
+
+  def pos_in_word(self):
+    utt = self.parent_utt
+    return self.index - utt.s_first_p[utt.w_first_s[utt.s_word[utt.p_syll[self.index]]]]
+
+  def get_feats(self):
+    return self.parent_utt.phoneme_features.get_phoneme_feats(self.id)
+
+  def get_feats_dict(self):
+    return self.parent_utt.phoneme_features.get_phoneme_feats_dict(self.id)
+
+  #Returns the phoneme offset positions away or an "xx" phoneme if outside the utt.
+  def get_phoneme_at(self, offset):
+    pos = self.index + offset
+    if pos < 0 or pos >= len(self.parent_utt.p_id):
+      return utterance.Phoneme("xx")
+    return PhonemeView(self.parent_utt, pos)
+
+  def get_left_phoneme(self):
+    return self.get_phoneme_at(-1)
+
+  def get_left_left_phoneme(self):
+    return self.get_phoneme_at(-2)
+
+  def get_right_phoneme(self):
+    return self.get_phoneme_at(1)
+
+  def get_righ_right_phoneme(self):
+    return self.get_phoneme_at(2)
+
+  def get_duration(self):
+    return self.end - self.start
+
+class SyllableView(SegmentView):
+  """A view of a syllable in a compact utt."""
+  __slots__ = ()
+
+  @property
+  def id(self):
+    return self.parent_utt.symbols.decode(self.parent_utt.s_id[self.index])
+
+  @property
+  def stress(self):
+    return self.parent_utt.symbols.decode(self.parent_utt.s_stress[self.index])
+
+  @property
+  def vowel_id(self):
+    return self.parent_utt.symbols.decode(self.parent_utt.s_vowel[self.index])
+
+  @property
+  def phonemes(self):
+    utt = self.parent_utt
+    return [PhonemeView(utt, i) for i in xrange(utt.s_first_p[self.index], utt.s_first_p[self.index+1])]
+
+  @property
+  def parent_word(self):
+    return WordView(self.parent_utt, self.parent_utt.s_word[self.index])
+
+  def pos_in_word(self):
+    return self.index - self.parent_utt.w_first_s[self.parent_utt.s_word[self.index]]
+
+  def num_phonemes(self):
+    return self.parent_utt.s_first_p[self.index+1] - self.parent_utt.s_first_p[self.index]
+
+  def start_time(self):
+    return self.parent_utt.p_start[self.parent_utt.s_first_p[self.index]]
+
+  def end_time(self):
+    return self.parent_utt.p_end[self.parent_utt.s_first_p[self.index+1] - 1]
+
+  def get_vowel_feats(self):
+    return self.parent_utt.phoneme_features.get_phone_feats(self.vowel_id)
+
+  def get_vowel_feats_dict(self):
+    return self.parent_utt.phoneme_features.get_phone_feats_dict(self.vowel_id)
+
+  def get_left_syllable(self):
+    if self.index == 0:
+      return "xx"
+    return SyllableView(self.parent_utt, self.index - 1)
+
+  def get_right_syllable(self):
+    if self.index == len(self.parent_utt.s_id) - 1:
+      return "xx"
+    return SyllableView(self.parent_utt, self.index + 1)
+
+class WordView(SegmentView):
+  """A view of a word in a compact utt."""
+  __slots__ = ()
+
+  @property
+  def id(self):
+    return self.parent_utt.symbols.decode(self.parent_utt.w_id[self.index])
+
+  @property
+  def syllables(self):
+    utt = self.parent_utt
+    return [SyllableView(utt, i) for i in xrange(utt.w_first_s[self.index], utt.w_first_s[self.index+1])]
+
+  @property
+  def phonemes(self):
+    utt = self.parent_utt
+    first = utt.s_first_p[utt.w_first_s[self.index]]
+    last = utt.s_first_p[utt.w_first_s[self.index+1]]
+    return [PhonemeView(utt, i) for i in xrange(first, last)]
+
+  def num_syllables(self):
+    return self.parent_utt.w_first_s[self.index+1] - self.parent_utt.w_first_s[self.index]
+
+  def num_phonemes(self):
+    utt = self.parent_utt
+    return utt.s_first_p[utt.w_first_s[self.index+1]] - utt.s_first_p[utt.w_first_s[self.index]]
+
+  def start_time(self):
+    utt = self.parent_utt
+    return utt.p_start[utt.s_first_p[utt.w_first_s[self.index]]]
+
+  def end_time(self):
+    utt = self.parent_utt
+    return utt.p_end[utt.s_first_p[utt.w_first_s[self.index+1]] - 1]
+
+  def get_duration(self):
+    return self.end_time() - self.start_time()
+
+  def get_prev_word(self):
+    if self.index == 0:
+      return "xx"
+    return WordView(self.parent_utt, self.index - 1)
+
+  def get_next_word(self):
+    if self.index == len(self.parent_utt.w_id) - 1:
+      return "xx"
+    return WordView(self.parent_utt, self.index + 1)
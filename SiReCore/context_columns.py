@@ -0,0 +1,620 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#This contains the methods for creating the contexts of a whole utterance at once.
+#Instead of filling a context for each phoneme each context is computed as a column
+#over all the phonemes of the utterance. Contexts depending only on the syllable or word
+#are computed once for each and then spread to their phonemes.
+#The add_* methods add the contexts of each feature group, see FEATURE_GROUPS.
+
+import context_skeletons, pos
+from context_utils import to_relational
+from context_utils import get_pos_cat
+from context_utils import get_dep_pos_cat
+from parsetrees import dep_distance_in_arcs
+from error_messages import SiReError
+
+class ContextTable(object):
+  """The contexts of all phonemes in an utterance with a column for each context."""
+  def __init__(self, skeleton_class, utt):
+    self.schema = context_skeletons.get_schema(skeleton_class, utt.phoneme_features)
+    self.utt = utt
+    self.num_rows = len(utt.phonemes)
+    #If the values should be checked, see context_skeletons.set_validation.
+    self.validated = context_skeletons.is_validated(utt.id)
+    #The names of the columns in the order they were added.
+    self.names = []
+    self.columns = {}
+    #A list of (group, names) of each feature group added, see add_group.
+    self.groups = []
+    #A list of (first, second, rows) of contexts written in the opposite order on some rows, see swap_on_rows.
+    self.swaps = []
+    #The position in the utt of the syllable and word of each phoneme.
+    self.p_syll = [p.parent_syllable.pos_in_utt() for p in utt.phonemes]
+    self.p_word = [p.parent_word.pos_in_utt() for p in utt.phonemes]
+
+  #Adds a column with a value for each phoneme.
+  #Throws error if the context already has a column or a value is not valid for its type.
+  def add(self, v_name, values):
+    schema = self.schema
+    i = schema.index.get(v_name)
+    if i == None:
+      raise SiReError("Tried to add context ({0}) which does not exist in skeleton! ".format(v_name))
+    if v_name in self.columns:
+      raise SiReError("Tried to add a context ({0}) which already has a value.".format(v_name))
+    if len(values) != self.num_rows:
+      raise SiReError("Context ({0}) has {1} values but there are {2} phonemes in utt ({3})!".format(v_name, len(values), self.num_rows, self.utt.id))
+    if self.validated:
+      #Each different value only needs to be checked once.
+      for value in set(values):
+        schema.check(i, value, self)
+    self.names.append(v_name)
+    self.columns[v_name] = values
+
+  #Adds a column where the value of each phoneme is method(syllable) of its syllable.
+  #The method is only called once for each syllable containing phonemes.
+  def add_syllable_column(self, v_name, method):
+    self.add(v_name, spread(self.utt.syllables, self.p_syll, method))
+
+  #Adds a column where the value of each phoneme is method(word) of its word.
+  #The method is only called once for each word containing phonemes.
+  def add_word_column(self, v_name, method):
+    self.add(v_name, spread(self.utt.words, self.p_word, method))
+
+  #Adds a column with the same value for all phonemes.
+  def add_utt_column(self, v_name, value):
+    self.add(v_name, [value]*self.num_rows)
+
+  #Writes context second before context first in the label lines of the given rows.
+  #Only the formatted values are swapped, the columns keep their values.
+  def swap_on_rows(self, first, second, rows):
+    self.swaps.append((first, second, rows))
+
+  def get_column(self, v_name):
+    return self.columns[v_name]
+
+  #Returns a list of (context, values) tuples in the order they were added.
+  def get_columns(self):
+    return [(name, self.columns[name]) for name in self.names]
+
+  #Adds the columns of a feature group, see FEATURE_GROUPS.
+  def add_group(self, group):
+    start = len(self.names)
+    FEATURE_GROUPS[group](self)
+    self.groups.append((group, self.names[start:]))
+
+  #Returns a list of (context, formatted values) tuples of all contexts except the timings.
+  #The formatted values are as they are written in the label, e.g. "|cp:a".
+  def get_formatted_columns(self, HHEd_fix=False):
+    schema = self.schema
+    renderer = schema.get_renderer(tuple([schema.index[name] for name in self.names]), HHEd_fix)
+    formatted = []
+    for i, f in renderer:
+      column = self.columns[schema.names[i]]
+      #Most contexts only have a few different values.
+      values = dict([(v, f(v)) for v in set(column)])
+      formatted.append((schema.names[i], [values[v] for v in column]))
+    if self.swaps:
+      positions = dict([(name, k) for k, (name, values) in enumerate(formatted)])
+      for first, second, rows in self.swaps:
+        a = formatted[positions[first]][1]
+        b = formatted[positions[second]][1]
+        for j in rows:
+          a[j], b[j] = b[j], a[j]
+    return formatted
+
+  #Returns a list with the context string of each phoneme.
+  def get_context_strings(self, HHEd_fix=False):
+    formatted = [values for name, values in self.get_formatted_columns(HHEd_fix)]
+    starts = self.columns["start"]
+    ends = self.columns["end"]
+    if formatted:
+      rows = zip(*formatted)
+    else:
+      rows = [()]*self.num_rows
+    return [str(starts[j])+" "+str(ends[j])+" "+"".join(rows[j])+"|" for j in xrange(self.num_rows)]
+
+#Returns a list with method(segments[i]) for each i in positions.
+#The method is only called once for each position.
+def spread(segments, positions, method):
+  values = {}
+  for i in positions:
+    if i not in values:
+      values[i] = method(segments[i])
+  return [values[i] for i in positions]
+
+#Returns the table of the context set skeleton_class made from the feature groups given
+#in the order they are added. The groups of each context set are registered in contexts.
+def make_table(skeleton_class, utt, groups):
+  t = ContextTable(skeleton_class, utt)
+  for group in groups:
+    t.add_group(group)
+  return t
+
+#Returns a list of True/False for each phoneme in utt telling if it is a silence phoneme.
+def get_sil_column(utt):
+  sil = utt.phoneme_features.get_sil_phonemes()
+  return [p.id in sil for p in utt.phonemes]
+
+def add_basic(t):
+  """Adds the basic context set to a table."""
+  utt = t.utt
+  phoneme_features = utt.phoneme_features
+  phonemes = utt.phonemes
+  feature_lists = phoneme_features.get_feature_lists()
+  #The features of each phoneme id are only looked up once.
+  feats = {}
+  def get_feats(p_id):
+    if p_id not in feats:
+      feats[p_id] = phoneme_features.get_phoneme_feats_dict(p_id)
+    return feats[p_id]
+  ##### Timings #####
+  t.add("start", [str(p.start) for p in phonemes])
+  t.add("end", [str(p.end) for p in phonemes])
+  ##### Phoneme level features #####
+  neighbours = utt.get_phoneme_neighbours()
+  lp = [x[1] for x in neighbours]
+  cp = [p.id for p in phonemes]
+  rp = [x[2] for x in neighbours]
+  #Left left phoneme
+  t.add("llp", [x[0] for x in neighbours])
+  #Left phoneme
+  t.add("lp", lp)
+  #Current phoneme
+  t.add("cp", cp)
+  #Right phoneme
+  t.add("rp", rp)
+  #Right right phoneme
+  t.add("rrp", [x[3] for x in neighbours])
+  #Phoneme features
+  lpf = [get_feats(x) for x in lp]
+  cpf = [get_feats(x) for x in cp]
+  rpf = [get_feats(x) for x in rp]
+  for feat in feature_lists:
+    #Left phoneme feats
+    t.add("lp"+feat, [x[feat] for x in lpf])
+    #Current phoneme feats
+    t.add("cp"+feat, [x[feat] for x in cpf])
+    #Right phoneme feats
+    t.add("rp"+feat, [x[feat] for x in rpf])
+
+  ##### Syllable level features #####
+  neighbours = utt.get_syllable_neighbours()
+  #L Syllable stress
+  t.add_syllable_column("lss", lambda s: neighbours[s.pos_in_utt()][0])
+  #C Syllable stress
+  t.add_syllable_column("css", get_syllable_stress)
+  #R Syllable stress
+  t.add_syllable_column("rss", lambda s: neighbours[s.pos_in_utt()][1])
+  #Syllables to next stressed syllable
+  t.add_syllable_column("snss", lambda s: neighbours[s.pos_in_utt()][2])
+  #Syllables from previous stressed syllable
+  t.add_syllable_column("spss", lambda s: neighbours[s.pos_in_utt()][3])
+  #L Syllable number of phonemes
+  t.add_syllable_column("lsnp", lambda s: neighbours[s.pos_in_utt()][4])
+  #C Syllable number of phonemes
+  t.add_syllable_column("csnp", lambda s: str(s.num_phonemes()))
+  #R Syllable number of phonemes
+  t.add_syllable_column("rsnp", lambda s: neighbours[s.pos_in_utt()][5])
+  #Syll vowel id
+  t.add_syllable_column("svid", lambda s: s.vowel_id)
+  #Syll Vowel Feats
+  for feat in feature_lists:
+    t.add_syllable_column("sv"+feat, lambda s: get_feats(s.vowel_id)[feat])
+
+  ##### Word level features #####
+  #Word number of phonemes
+  t.add_word_column("wnp", lambda w: str(w.num_phonemes()))
+  #Word number of syllables
+  t.add_word_column("wns", lambda w: str(w.num_syllables()))
+
+  ##### Utterance level features #####
+  #Phonemes in utterance
+  t.add_utt_column("unp", str(utt.num_phonemes()))
+  #Syllables in utterance
+  t.add_utt_column("uns", str(utt.num_syllables()))
+  #Words in utterance
+  t.add_utt_column("unw", str(utt.num_words()))
+
+def get_syllable_stress(syll):
+  if syll.stress == "xx":
+    print "Warning! Current syllable stress is xx!"
+    print "Should only happen when converting hts labs"
+    print "Changing to 0 and continuing."
+    return "0"
+  return str(syll.stress)
+
+def add_emphasis(t):
+  """Adds the emphasis context set."""
+  ### Word Level Emphasis ###
+  #Word emphasis
+  t.add_word_column("wemph", lambda w: str(w.get_emph()))
+  #Next word emphasis
+  t.add_word_column("fwemph", lambda w: str(w.forward_emph()))
+  #Previous word emphasis
+  t.add_word_column("bwemph", lambda w: str(w.backward_emph()))
+  #Words until next emphasised word
+  t.add_word_column("wnew", lambda w: str(w.next_emph()))
+  #Words until last emphasised word
+  t.add_word_column("wpew", lambda w: str(w.prev_emph()))
+  ### Utterance Level Emphasis ###
+  #Emphasised words in utterance
+  t.add_utt_column("unew", str(t.utt.num_emph_words()))
+
+def add_categorical(t):
+  """Adds the categorical context set."""
+  utt = t.utt
+  phonemes = utt.phonemes
+  n = len(phonemes)
+  #Add the basic features
+  add_basic(t)
+  sil = get_sil_column(utt)
+  #The categorical syll and word pos of each phoneme.
+  psp = [get_pos_cat(p.pos_in_syllable(), p.parent_syllable.num_phonemes()) for p in phonemes]
+  pwp = [get_pos_cat(p.pos_in_word(), p.parent_word.num_phonemes()) for p in phonemes]
+  #Add current phoneme syll and word pos
+  t.add("cpsp", ["xx" if sil[i] else psp[i] for i in xrange(n)])
+  t.add("cpwp", ["xx" if sil[i] else pwp[i] for i in xrange(n)])
+  #Add left phoneme syll and word pos
+  t.add("lpsp", ["xx" if i == 0 or sil[i-1] else psp[i-1] for i in xrange(n)])
+  t.add("lpwp", ["xx" if i == 0 or sil[i-1] else pwp[i-1] for i in xrange(n)])
+  #Add right phoneme syll and word pos
+  t.add("rpsp", ["xx" if i == n-1 or sil[i+1] else psp[i+1] for i in xrange(n)])
+  t.add("rpwp", ["xx" if i == n-1 or sil[i+1] else pwp[i+1] for i in xrange(n)])
+  #Add syllable word pos
+  sylls = utt.syllables
+  swp = lambda s: get_pos_cat(s.pos_in_word(), s.parent_word.num_syllables())
+  #C Syllable pos in word
+  t.add_syllable_column("cswp", swp)
+  #L Syllable pos in word
+  t.add_syllable_column("lswp", lambda s: "xx" if s.pos_in_utt() == 0 else swp(sylls[s.pos_in_utt()-1]))
+  #R Syllable pos in word
+  t.add_syllable_column("rswp", lambda s: "xx" if s.pos_in_utt() == len(sylls)-1 else swp(sylls[s.pos_in_utt()+1]))
+  #Add pos in utt
+  words = utt.words
+  wup = lambda w: get_pos_cat(w.pos_in_utt(), len(words), True)
+  #C Word pos in utt
+  t.add_word_column("cwup", wup)
+  #L Word pos in utt
+  t.add_word_column("lwup", lambda w: "xx" if w.pos_in_utt() == 0 else wup(words[w.pos_in_utt()-1]))
+  #R Word pos in utt
+  t.add_word_column("rwup", lambda w: "xx" if w.pos_in_utt() == len(words)-1 else wup(words[w.pos_in_utt()+1]))
+
+def add_relational(t):
+  """Adds the relational context set."""
+  utt = t.utt
+  phonemes = utt.phonemes
+  n = len(phonemes)
+  #Add the basic features
+  add_basic(t)
+  sil = get_sil_column(utt)
+  #Add phoneme syll and word pos
+  #If this is a silence segment we have no relational pos.
+  pfwsp = []
+  pbwsp = []
+  pfwwp = []
+  pbwwp = []
+  sfwwp = []
+  sbwwp = []
+  for i, p in enumerate(phonemes):
+    if sil[i]:
+      pfwsp.append("0.0")
+      pbwsp.append("0.0")
+      pfwwp.append("0.0")
+      pbwwp.append("0.0")
+      sfwwp.append("0.0")
+      sbwwp.append("0.0")
+    else:
+      s_n_p = p.parent_syllable.num_phonemes()
+      pfwsp.append(str(to_relational(p.pos_in_syllable(), s_n_p - 1, True)))
+      pbwsp.append(str(to_relational(p.pos_in_syllable(), s_n_p - 1, False)))
+      w_n_p = p.parent_word.num_phonemes()
+      pfwwp.append(str(to_relational(p.pos_in_word(), w_n_p - 1, True)))
+      pbwwp.append(str(to_relational(p.pos_in_word(), w_n_p - 1, False)))
+      syll = p.parent_syllable
+      w_n_s = syll.parent_word.num_syllables()
+      sfwwp.append(str(to_relational(syll.pos_in_word(), w_n_s - 1, True)))
+      sbwwp.append(str(to_relational(syll.pos_in_word(), w_n_s - 1, False)))
+  #Phone forward pos in syll
+  t.add("pfwsp", pfwsp)
+  #Phone backward pos in syll
+  t.add("pbwsp", pbwsp)
+  #Phone forward pos in word
+  t.add("pfwwp", pfwwp)
+  #Phone backward pos in word
+  t.add("pbwwp", pbwwp)
+  #Syllable forward pos in word
+  t.add("sfwwp", sfwwp)
+  #Syllable backward pos in word
+  t.add("sbwwp", sbwwp)
+  #Add pos in utt
+  u_n_w = utt.num_words()
+  #Word forward pos in utterance
+  t.add_word_column("wfwup", lambda w: str(to_relational(w.pos_in_utt(), u_n_w - 1, True)))
+  #Word backward pos in utterance
+  t.add_word_column("wbwup", lambda w: str(to_relational(w.pos_in_utt(), u_n_w - 1, False)))
+
+def add_absolute(t):
+  """Adds the absolute context set."""
+  utt = t.utt
+  phonemes = utt.phonemes
+  #Add the basic features
+  add_basic(t)
+  #Add phoneme syll and word pos
+  #Phone forward pos in syll
+  t.add("pfwsp", [str(p.pos_in_syllable()) for p in phonemes])
+  #Phone backward pos in syll
+  t.add("pbwsp", [str(p.parent_syllable.num_phonemes() - 1 - p.pos_in_syllable()) for p in phonemes])
+  #Phone forward pos in word
+  t.add("pfwwp", [str(p.pos_in_word()) for p in phonemes])
+  #Phone backward pos in word
+  t.add("pbwwp", [str(p.parent_word.num_phonemes() - 1 - p.pos_in_word()) for p in phonemes])
+  #Add syllable forward and backward word pos
+  #Syllable forward pos in word
+  t.add_syllable_column("sfwwp", lambda s: str(s.pos_in_word()))
+  #Syllable backward pos in word
+  t.add_syllable_column("sbwwp", lambda s: str(s.parent_word.num_syllables() - 1 - s.pos_in_word()))
+  #Add pos in utt
+  u_n_w = utt.num_words() - 1
+  #Word forward pos in utterance
+  t.add_word_column("wfwup", lambda w: str(w.pos_in_utt()))
+  #Word backward pos in utterance
+  t.add_word_column("wbwup", lambda w: str(u_n_w - w.pos_in_utt()))
+
+def add_basic_stanford_pcfg(t):
+  """Adds the basic elements of stanford parse information."""
+  ###### Stanford Parse Information ######
+  #Word parent phrase
+  t.add_word_column("wpp", lambda w: w.parent_phrase.label)
+  #Word grandpparent phrase
+  t.add_word_column("wgpp", lambda w: w.grandparent_phrase.label)
+  #Word greatgrandparent phrase
+  t.add_word_column("wggpp", lambda w: w.greatgrandparent_phrase.label)
+
+def add_relational_stanford_pcfg(t):
+  """Adds the relational elements of stanford parse information."""
+  #Add basic info
+  add_basic_stanford_pcfg(t)
+  rel = lambda phrase, fw: str(to_relational(phrase.pos_in_parent, phrase.num_siblings, fw, True))
+  #Word relational position in parent phrase
+  t.add_word_column("wfwrppp", lambda w: rel(w.parent_phrase, True))
+  t.add_word_column("wbwrppp", lambda w: rel(w.parent_phrase, False))
+  #Word relational position in grandparent phrase
+  t.add_word_column("wfwrgppp", lambda w: rel(w.grandparent_phrase, True))
+  t.add_word_column("wbwrgppp", lambda w: rel(w.grandparent_phrase, False))
+  #Word relational position in greatgrandparent phrase
+  t.add_word_column("wfwrggppp", lambda w: rel(w.greatgrandparent_phrase, True))
+  t.add_word_column("wbwrggppp", lambda w: rel(w.greatgrandparent_phrase, False))
+
+def add_categorical_stanford_pcfg(t):
+  """Adds the categorical elements of stanford parse information."""
+  #Add basic info
+  add_basic_stanford_pcfg(t)
+  n_w = len(t.utt.words)
+  cat = lambda w: "xx" if w == "xx" else get_pos_cat(w.pos_in_utt(), n_w, with_sil=True)
+  #Right word categorical position in parent, grandparent and greatgrandparent phrase
+  for name in ["rwcppp", "rwcgppp", "rwcggppp"]:
+    t.add_word_column(name, lambda w: cat(w.get_next_word()))
+  #Current word categorical position in parent, grandparent and greatgrandparent phrase
+  for name in ["cwcppp", "cwcgppp", "cwcggppp"]:
+    t.add_word_column(name, cat)
+  #Left word categorical position in parent, grandparent and greatgrandparent phrase
+  for name in ["lwcppp", "lwcgppp", "lwcggppp"]:
+    t.add_word_column(name, lambda w: cat(w.get_prev_word()))
+
+def add_absolute_stanford_pcfg(t):
+  """Adds the absolute elements of stanford parse information."""
+  #Add basic info
+  add_basic_stanford_pcfg(t)
+  #We may have xx
+  bw = lambda phrase: str(phrase.pos_in_parent) if phrase.pos_in_parent == "xx" else str(phrase.num_siblings - 1 - phrase.pos_in_parent)
+  #Word absolute position in parent phrase
+  t.add_word_column("wfwrppp", lambda w: str(w.parent_phrase.pos_in_parent))
+  t.add_word_column("wbwrppp", lambda w: bw(w.parent_phrase))
+  #Word absolute position in grandparent phrase
+  t.add_word_column("wfwrgppp", lambda w: str(w.grandparent_phrase.pos_in_parent))
+  t.add_word_column("wbwrgppp", lambda w: bw(w.grandparent_phrase))
+  #Word absolute position in greatgrandparent phrase
+  #Note that if this is xx the number of siblings is used.
+  t.add_word_column("wfwrggppp", lambda w: str(w.greatgrandparent_phrase.pos_in_parent))
+  t.add_word_column("wbwrggppp", lambda w: str(w.greatgrandparent_phrase.num_siblings) if w.greatgrandparent_phrase.pos_in_parent == "xx" else bw(w.greatgrandparent_phrase))
+
+def add_basic_stanford_dependency(t):
+  """Adds the basic elements of stanford dependency parse information."""
+  utt = t.utt
+  sil = utt.phoneme_features.get_sil_phonemes()
+  ###### Stanford Dependency Parse Information ######
+  relation = lambda node: "xx" if node.parent_relation == None else node.parent_relation
+  #Word parent dependency relation
+  t.add_word_column("wpdr", lambda w: relation(w.parent_dependency))
+  #Word parent to grandparent relation
+  t.add_word_column("wgpdr", lambda w: relation(w.grandparent_dependency))
+  #Word grandparent to greatgrandparent relation
+  t.add_word_column("wggpdr", lambda w: relation(w.greatgrandparent_dependency))
+  #Word parent general dependency relation
+  t.add_word_column("wpgdr", lambda w: "xx" if w.parent_dependency.parent_relation == None else w.parent_dependency.get_parent_general_relation())
+  #Number of children
+  dnc = []
+  for p in utt.phonemes:
+    children = p.parent_word.parent_dependency.children
+    if children == None:
+      if p.id in sil: #this is a pause
+        dnc.append("xx")
+      else: #This is a leaf
+        dnc.append("0")
+    else:
+      dnc.append(str(len(children)))
+  t.add("dnc", dnc)
+  #Tree distance to left and right word in num arcs
+  t.add_word_column("dtdlw", lambda w: get_left_dep_distance(w, sil))
+  t.add_word_column("dtdrw", lambda w: get_right_dep_distance(w, sil))
+  #Pauses have always had dtdrw before dtdlw in the label.
+  t.swap_on_rows("dtdlw", "dtdrw", [j for j, p in enumerate(utt.phonemes) if p.parent_word.phonemes[0].id in sil])
+
+#Returns the tree distance to the left word in num arcs.
+def get_left_dep_distance(w, sil):
+  #If the current is a pau
+  if w.phonemes[0].id in sil:
+    return "xx"
+  if w.pos_in_utt() > 0:
+    wl = w.parent_utt.words[w.pos_in_utt()-1]
+    #If prev word is sil
+    if wl.phonemes[0].id in sil:
+      return "xx"
+    return str(dep_distance_in_arcs(w.parent_dependency, wl.parent_dependency))
+  return "xx"
+
+#Returns the tree distance to the right word in num arcs.
+def get_right_dep_distance(w, sil):
+  #If the current is a pau
+  if w.phonemes[0].id in sil:
+    return "xx"
+  try:
+    wr = w.parent_utt.words[w.pos_in_utt()+1]
+    #If next word is sil
+    if wr.phonemes[0].id in sil:
+      return "xx"
+    return str(dep_distance_in_arcs(w.parent_dependency, wr.parent_dependency))
+  except IndexError:
+    return "xx"
+
+#Adds the distances of each word to its parent, grandparent and greatgrandparent relation.
+#Method(word) returns a tuple of the three distances. If the word is a pause "xx" is used instead.
+def add_dependency_distances(t, method):
+  utt = t.utt
+  sil = utt.phoneme_features.get_sil_phonemes()
+  distances = {}
+  wdpr = []
+  wdgpr = []
+  wdggpr = []
+  for p in utt.phonemes:
+    w = p.parent_word
+    #If the current phoneme is sil/pau etc. the label is None and we can just add "xx" all through
+    if w.parent_dependency.label == None and p.id in sil:
+      d = ("xx", "xx", "xx")
+    else:
+      pos_in_utt = w.pos_in_utt()
+      if pos_in_utt not in distances:
+        distances[pos_in_utt] = method(w)
+      d = distances[pos_in_utt]
+    wdpr.append(d[0])
+    wdgpr.append(d[1])
+    wdggpr.append(d[2])
+  t.add("wdpr", wdpr)
+  t.add("wdgpr", wdgpr)
+  t.add("wdggpr", wdggpr)
+
+#Returns the parents of the dependency relations used for the distances of a word.
+#None is used if a relation has no parent or it is the ROOT.
+def get_dependency_parents(w):
+  parents = []
+  for node in [w.parent_dependency, w.grandparent_dependency, w.greatgrandparent_dependency]:
+    if node.parent != None and node.parent.label != "ROOT":
+      parents.append(node.parent)
+    else:
+      parents.append(None)
+  return parents
+
+def add_absolute_stanford_dependency(t):
+  """Adds the absolute elements of stanford parse information."""
+  add_basic_stanford_dependency(t)
+  def distances(w):
+    dep_pos = w.parent_dependency.utt_pos
+    return tuple(["xx" if p == None else str(abs(dep_pos-p.utt_pos)) for p in get_dependency_parents(w)])
+  add_dependency_distances(t, distances)
+
+def add_relational_stanford_dependency(t):
+  """Adds the relational elements of stanford parse information."""
+  add_basic_stanford_dependency(t)
+  #We subtract 1 because label pos and num phonemes start from 1 but to_relational starts from 0
+  def distances(w):
+    u_n_w = w.parent_utt.num_words()
+    dep_pos = to_relational(w.parent_dependency.utt_pos-1, u_n_w-1, True)
+    return tuple(["xx" if p == None else str(abs(dep_pos-to_relational(p.utt_pos-1, u_n_w-1, True))) for p in get_dependency_parents(w)])
+  add_dependency_distances(t, distances)
+
+def add_categorical_stanford_dependency(t):
+  """Adds the categorical elements of stanford parse information."""
+  add_basic_stanford_dependency(t)
+  n_w = len(t.utt.words)
+  def distances(w):
+    dep_pos = w.parent_dependency.utt_pos
+    return tuple(["xx" if p == None else get_dep_pos_cat(dep_pos, p.utt_pos, n_w, with_sil=True) for p in get_dependency_parents(w)])
+  add_dependency_distances(t, distances)
+
+#These are features necessary for festival equivalence.
+def add_festival(t, festival_gpos=True):
+  utt = t.utt
+  words = utt.words
+  if festival_gpos == True:
+    gpos_method = pos.get_festival_general_pos
+  else:
+    gpos_method = pos.get_sire_general_pos
+  #Note that w_pos starts from -1 as it always has in SiRe.
+  def rgpos(w):
+    w_pos = w.pos_in_utt() - 1
+    if w_pos > 0:
+      return gpos_method(words[w_pos-1])
+    return "xx"
+  def lgpos(w):
+    w_pos = w.pos_in_utt() - 1
+    if w_pos < utt.num_words() - 1:
+      return gpos_method(words[w_pos+1])
+    return "xx"
+  #General pos
+  t.add_word_column("rgpos", rgpos)
+  t.add_word_column("cgpos", gpos_method)
+  t.add_word_column("lgpos", lgpos)
+  #Cur Syll Accent
+  t.add_syllable_column("csacc", lambda s: s.accent)
+  neighbours = utt.get_accent_neighbours()
+  #Number of accented syllables before current syll
+  t.add_syllable_column("nasbcs", lambda s: neighbours[s.pos_in_utt()][0])
+  #Number of accented syllables after current syll
+  t.add_syllable_column("nasacs", lambda s: neighbours[s.pos_in_utt()][1])
+  #Distance to previous accented syllable
+  t.add_syllable_column("pasd", lambda s: neighbours[s.pos_in_utt()][2])
+  #Distance to next accented syllable
+  t.add_syllable_column("nasd", lambda s: neighbours[s.pos_in_utt()][3])
+
+#Festival features with the pos tags of a stanford pcfg parse.
+def add_festival_parsed_pos(t):
+  #We have proper pos tags to simplify
+  add_festival(t, False)
+
+#The feature groups a table is made of. Each adds a fixed set of columns, so labels
+#can be updated by recomputing only the groups which changed, see label_manifest.
+#More can be added with register_feature_group.
+FEATURE_GROUPS = {
+  "categorical": add_categorical,
+  "relational": add_relational,
+  "absolute": add_absolute,
+  "festival": add_festival,
+  "festival_parsed_pos": add_festival_parsed_pos,
+  "emphasis": add_emphasis,
+  "categorical_stanford_pcfg": add_categorical_stanford_pcfg,
+  "relational_stanford_pcfg": add_relational_stanford_pcfg,
+  "absolute_stanford_pcfg": add_absolute_stanford_pcfg,
+  "categorical_stanford_dependency": add_categorical_stanford_dependency,
+  "relational_stanford_dependency": add_relational_stanford_dependency,
+  "absolute_stanford_dependency": add_absolute_stanford_dependency,
+}
+
+#Adds a feature group. Method is called with the table and must add the same contexts to every table.
+def register_feature_group(name, method):
+  if name in FEATURE_GROUPS:
+    raise SiReError("A feature group called {0} already exists!".format(name))
+  FEATURE_GROUPS[name] = method
@@ -14,7 +14,7 @@
 #limitations under the License.                                          #
 ##########################################################################
 
-import context_utils
+import context_utils, zlib
 from collections import OrderedDict
 from error_messages import SiReError
 
@@ -510,3 +510,141 @@ class CategoricalStanfordCombined(CategoricalStanfordDependency, CategoricalStan
   """A skeleton containing the combined pcfg and dependency contexts using categorical values."""
   def __init__(self, phoneme_features):
     super(CategoricalStanfordCombined, self).__init__(phoneme_features)
+
+#The type codes used by the compiled schemas.
+TIMING = 0
+BOOL = 1
+INT = 2
+FLOAT = 3
+
+#Returns the type code of a skeleton type.
+#Note that float is checked before int in the same order as context_utils.check_value.
+def get_type_code(v_type):
+  if v_type == None:
+    return TIMING
+  elif "float" in v_type:
+    return FLOAT
+  elif v_type == "bool":
+    return BOOL
+  elif "int" in v_type:
+    return INT
+  raise SiReError("Unknown attribute type ({0})!".format(v_type))
+
+class ContextSchema(object):
+  """The contexts of a skeleton class compiled to an index and a type code for each context."""
+  def __init__(self, skeleton_class, phoneme_features):
+    self.skeleton_class = skeleton_class
+    skeleton = skeleton_class(phoneme_features)
+    self.names = sorted([x for x in vars(skeleton) if x != "added_contexts"])
+    self.index = dict([(name, i) for i, name in enumerate(self.names)])
+    self.types = [getattr(skeleton, name) for name in self.names]
+    self.codes = [get_type_code(t) for t in self.types]
+    #If "xx" is a valid value of ints and floats
+    self.xx = [t != None and "xx" in t for t in self.types]
+    #The start of the context string of each context.
+    self.prefixes = ["|"+name+":" for name in self.names]
+    #The compiled renderers keyed by context order and HHEd_fix.
+    self.renderers = {}
+    #The strintified float values seen so far, there are few different ones so they are kept.
+    self.strintified = {}
+
+  #Checks that value is valid for the type of context i.
+  #Context is the object the value is added to and only used for the error message.
+  def check(self, i, value, context):
+    code = self.codes[i]
+    if code == BOOL:
+      valid = isinstance(value, str)
+    else:
+      try:
+        if code == FLOAT:
+          float(value)
+        else:
+          int(value)
+        valid = True
+      except ValueError:
+        valid = code != TIMING and self.xx[i] and value == "xx"
+      except TypeError:
+        if code != TIMING:
+          raise
+        valid = False
+    if not valid:
+      raise SiReError("Value ({0}) is not valid for variable type ({1}) variable ({2}) in \n {3}".format(value, self.types[i], self.names[i], context))
+
+  #Returns a function formatting the value of context i for a context string.
+  #With HHEd_fix the current phoneme is written as -phoneme+ as this is hardcoded in HHEd.
+  def get_formatter(self, i, HHEd_fix):
+    prefix = self.prefixes[i]
+    if self.codes[i] == FLOAT:
+      if self.xx[i]:
+        return lambda v: prefix+"xx" if v == "xx" else prefix+self.strintify_value(v)
+      return lambda v: prefix+self.strintify_value(v)
+    if HHEd_fix == True and self.names[i] == "cp":
+      return lambda v: prefix+"-"+str(v)+"+"
+    return lambda v: prefix+str(v)
+
+  #Returns the strintified version of a float context value.
+  def strintify_value(self, value):
+    s = self.strintified.get(value)
+    if s == None:
+      s = context_utils.strintify(float(value))
+      self.strintified[value] = s
+    return s
+
+  #Returns the renderer of contexts added in the given order.
+  #This is a tuple of (index, formatter) for each context except the timings and is only
+  #compiled the first time an order is seen. Normally all contexts of a class are added
+  #in the same order so there are only one or two of these.
+  def get_renderer(self, order, HHEd_fix=False):
+    key = (order, HHEd_fix)
+    renderer = self.renderers.get(key)
+    if renderer == None:
+      renderer = tuple([(i, self.get_formatter(i, HHEd_fix)) for i in order if self.codes[i] != TIMING])
+      self.renderers[key] = renderer
+    return renderer
+
+#How the values added to contexts are validated when making labels.
+#"strict" = Every value is checked.
+#"sampled" = The values of a fraction (VALIDATION_RATE) of the utterances are checked.
+#"off" = No values are checked.
+VALIDATION_POLICIES = ["strict", "sampled", "off"]
+validation = "strict"
+validation_rate = 0.1
+#The last utt id asked about and if it is checked.
+last_validated = (None, True)
+
+#Sets the validation policy used when making context tables, see context_columns.ContextTable.
+def set_validation(policy, rate=0.1):
+  global validation, validation_rate, last_validated
+  if policy not in VALIDATION_POLICIES:
+    raise SiReError("Unknown validation policy ({0})! Must be one of {1}!".format(policy, VALIDATION_POLICIES))
+  if rate < 0.0 or rate > 1.0:
+    raise SiReError("The validation rate must be between 0.0 and 1.0! Was {0}".format(rate))
+  validation = policy
+  validation_rate = rate
+  last_validated = (None, True)
+
+#Returns True if the contexts of the utt with the given id should be checked.
+#In sampled mode the utts are picked by a hash of the id so the same utts
+#are checked in every run.
+def is_validated(utt_id):
+  global last_validated
+  if validation == "strict":
+    return True
+  elif validation == "off":
+    return False
+  if last_validated[0] != utt_id:
+    checked = (zlib.crc32(utt_id) & 0xffffffff) < validation_rate * 4294967296
+    last_validated = (utt_id, checked)
+  return last_validated[1]
+
+#The schemas made so far keyed by skeleton class and phoneme featureset.
+schemas = {}
+
+#Returns the schema of the skeleton class, it is only compiled the first time it is asked for.
+def get_schema(skeleton_class, phoneme_features):
+  key = (skeleton_class, phoneme_features)
+  schema = schemas.get(key)
+  if schema == None:
+    schema = ContextSchema(skeleton_class, phoneme_features)
+    schemas[key] = schema
+  return schema
@@ -0,0 +1,130 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#Reading and writing corpora kept in a tar or zip archive instead of one file per utt in a dir.
+#Anywhere a dir of txt, lab or parse files is read or labels are written an archive can be
+#given instead, see sire_io.list_corpus, sire_io.iter_corpus and sire_io.CorpusWriter.
+#The files of an archive are known by their file name only, so the dirs inside the archive
+#do not matter, but no two files may have the same name.
+#Tar archives are read as a stream, one member at a time, so compressed tarballs are never
+#unpacked on disk or read into memory as a whole.
+
+import os, time, tarfile, zipfile
+from cStringIO import StringIO
+from error_messages import SiReError
+
+#The extensions of the archives which can be used as a corpus and their tarfile write mode.
+TAR_EXTS = [(".tar", "w"), (".tar.gz", "w:gz"), (".tgz", "w:gz"), (".tar.bz2", "w:bz2"), (".tbz2", "w:bz2")]
+ZIP_EXTS = [".zip"]
+
+def is_tar(path):
+  return any([path.endswith(ext) for ext, mode in TAR_EXTS])
+
+def is_zip(path):
+  return any([path.endswith(ext) for ext in ZIP_EXTS])
+
+#Returns True if path is the path of a corpus archive, whether it exists or not.
+def is_archive(path):
+  return is_tar(path) or is_zip(path)
+
+class ArchiveReader(object):
+  """Reads the files of a tar or zip archive."""
+  def __init__(self, path):
+    if not is_archive(path):
+      raise SiReError("Unknown archive type of {0}! Must be one of {1}.".format(path, [ext for ext, mode in TAR_EXTS]+ZIP_EXTS))
+    if not os.path.isfile(path):
+      raise SiReError("Archive {0} does not exist!".format(path))
+    self.path = path
+
+  #Returns the names of the files in the archive in the order of the archive.
+  def get_names(self):
+    names = []
+    if is_tar(self.path):
+      tf = tarfile.open(self.path, "r|*")
+      for member in tf:
+        if member.isfile():
+          names.append(os.path.basename(member.name))
+      tf.close()
+    else:
+      zf = zipfile.ZipFile(self.path, "r")
+      names = [os.path.basename(info.filename) for info in zf.infolist() if not info.filename.endswith("/")]
+      zf.close()
+    if len(set(names)) != len(names):
+      raise SiReError("Archive {0} has more than one file with the same name!".format(self.path))
+    return names
+
+  #Yields the (name, data) of the files named in names in that order.
+  #A tar is read in one pass so files named in the order of the archive are yielded as soon as
+  #they are read. Files named before a file which is earlier in the archive are kept until used.
+  def iter_files(self, names):
+    if is_zip(self.path):
+      zf = zipfile.ZipFile(self.path, "r")
+      members = dict([(os.path.basename(info.filename), info) for info in zf.infolist() if not info.filename.endswith("/")])
+      for name in names:
+        if name not in members:
+          raise SiReError("File {0} is not in archive {1}!".format(name, self.path))
+        yield name, zf.read(members[name])
+      zf.close()
+      return
+    wanted = set(names)
+    kept = {}
+    i = 0
+    tf = tarfile.open(self.path, "r|*")
+    for member in tf:
+      if i == len(names):
+        break
+      name = os.path.basename(member.name)
+      if not member.isfile() or name not in wanted:
+        continue
+      kept[name] = tf.extractfile(member).read()
+      while i < len(names) and names[i] in kept:
+        yield names[i], kept.pop(names[i])
+        i += 1
+    tf.close()
+    if i < len(names):
+      raise SiReError("File {0} is not in archive {1}!".format(names[i], self.path))
+
+class ArchiveWriter(object):
+  """Writes files into a new tar or zip archive one at a time."""
+  def __init__(self, path):
+    if not is_archive(path):
+      raise SiReError("Unknown archive type of {0}! Must be one of {1}.".format(path, [ext for ext, mode in TAR_EXTS]+ZIP_EXTS))
+    self.path = path
+    #The archive is written to a temporary file which is renamed when closed so it is never half written.
+    if is_tar(path):
+      mode = [mode for ext, mode in TAR_EXTS if path.endswith(ext)][-1]
+      self.tar = tarfile.open(path+".tmp", mode)
+      self.zip = None
+    else:
+      self.tar = None
+      self.zip = zipfile.ZipFile(path+".tmp", "w", zipfile.ZIP_DEFLATED)
+
+  def write(self, name, data):
+    if self.tar != None:
+      info = tarfile.TarInfo(name)
+      info.size = len(data)
+      info.mtime = time.time()
+      info.mode = 0644
+      self.tar.addfile(info, StringIO(data))
+    else:
+      self.zip.writestr(name, data)
+
+  def close(self):
+    if self.tar != None:
+      self.tar.close()
+    else:
+      self.zip.close()
+    os.rename(self.path+".tmp", self.path)
@@ -0,0 +1,97 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#Methods for writing the numeric feature matrix of an utterance directly from its contexts.
+#A DNN back-end normally matches each question of a NN question set against each line of
+#the labels to make its input vectors. Here the same vectors are made from the context
+#values so the labels need not be written and read again.
+#There is one row per phoneme and one float32 column per question in the question file
+#in the order of the file. The questions are matched by question_matcher so the features
+#are the same as those of the written labels.
+#The matrix is written as raw float32 (.bin) or as a .npy file.
+
+import sys, struct, tempfile, cPickle, context_skeletons
+from array import array
+from error_messages import SiReError
+
+MATRIX_FORMATS = ["npy", "bin"]
+
+#Returns a dict with a list of the values of each context in table as they are written in a label.
+#This is all that is needed to make the matrix, so it can be kept instead of the table.
+def get_label_values(table, HHEd_fix=False):
+  schema = table.schema
+  values = {}
+  for name, column in table.get_columns():
+    i = schema.index[name]
+    if schema.codes[i] == context_skeletons.TIMING:
+      continue
+    f = schema.get_formatter(i, HHEd_fix)
+    l = len(schema.prefixes[i])
+    formatted = dict([(v, f(v)[l:]) for v in set(column)])
+    values[name] = [formatted[v] for v in column]
+  return values
+
+class LabelValueStore(object):
+  """Keeps the label values of each utt in a temporary file until the question set is finished.
+  Only one utt at a time is kept in memory so any size of corpus can be made."""
+  def __init__(self):
+    self.f = tempfile.TemporaryFile()
+
+  #Adds the label values of an utt, see get_label_values.
+  def add(self, utt_id, label_values):
+    cPickle.dump((utt_id, label_values), self.f, cPickle.HIGHEST_PROTOCOL)
+
+  #Yields the (utt id, label values) of each utt in the order they were added.
+  #The temporary file is removed when done.
+  def iter_values(self):
+    self.f.flush()
+    self.f.seek(0)
+    while True:
+      try:
+        yield cPickle.load(self.f)
+      except EOFError:
+        break
+    self.f.close()
+
+#Returns the feature matrix as a flat array of float32 in row major order and its shape.
+#Label_values is the output of get_label_values and matcher a question_matcher.QuestionMatcher.
+def make_matrix(label_values, matcher):
+  if len(label_values) == 0:
+    raise SiReError("Cannot make a feature matrix without any contexts!")
+  names = label_values.keys()
+  matrix = array("f")
+  n_rows = 0
+  for row in zip(*[label_values[name] for name in names]):
+    matrix.extend(matcher.get_context_vector(dict(zip(names, row))))
+    n_rows += 1
+  return matrix, (n_rows, matcher.size)
+
+#Writes the matrix as a .npy (version 1.0) or raw float32 .bin file.
+def write_matrix(path, matrix, shape, fmt="npy"):
+  if fmt not in MATRIX_FORMATS:
+    raise SiReError("Unknown feature matrix format ({0})! Must be one of {1}!".format(fmt, MATRIX_FORMATS))
+  #Both formats are little endian.
+  if sys.byteorder == "big":
+    matrix = array("f", matrix)
+    matrix.byteswap()
+  wf = open(path, "wb")
+  if fmt == "npy":
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % shape
+    #The header is padded so the data starts at a multiple of 16 bytes.
+    header += " "*(15 - (len(header) + 10) % 16) + "\n"
+    wf.write("\x93NUMPY\x01\x00"+struct.pack("<H", len(header))+header)
+  matrix.tofile(wf)
+  wf.close()
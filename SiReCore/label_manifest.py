@@ -0,0 +1,258 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#Methods for updating existing labels when only some feature groups change.
+#When asked to, make_full_context_labs writes a manifest to the lab dir telling which
+#feature groups (see context_columns.FEATURE_GROUPS) the labels were made of, the
+#type of each of their contexts and the structure (words, syllables and phonemes)
+#of each utt. A later run adding or changing feature groups, e.g. adding emphasis or
+#changing the context_type, can then reuse the contexts of the groups which did not
+#change and only compute the rest. These are spliced into the existing label lines.
+#An utt is made from scratch if its structure changed or its label cannot be read.
+#A run making labels for all utts replaces every manifest in the lab dir. A run making
+#only some (-utt_list or -shard) writes its own manifest next to the others instead,
+#see get_run_tag, and the manifests are joined when read, the newest entry of an utt winning.
+
+import os, json, hashlib, time
+import context_skeletons, utterance
+from error_messages import SiReError
+
+MANIFEST_NAME = "sire_manifest.json"
+#The manifest of a run making only some utts is called MANIFEST_PREFIX.<run tag>.json.
+MANIFEST_PREFIX = "sire_manifest."
+MANIFEST_EXT = ".json"
+#Change this if the contexts of a feature group change so old labels are not reused.
+MANIFEST_VERSION = 2
+
+#The groups which need the festival layer of the utt.
+FESTIVAL_GROUPS = ["festival", "festival_parsed_pos"]
+
+#Returns the settings which change all contexts in a label.
+def get_config(args):
+  return {"version":MANIFEST_VERSION,
+          "HHEd_fix":args.HHEd_fix,
+          "labtype":args.labtype,
+          "phoneset":args.phoneme_features.__class__.__name__}
+
+#Returns a hash of the word and syllable boundaries, syllable stress and phonemes of utt.
+#All contexts except those of the festival groups are made from these so if they are
+#the same so are those contexts. Word ids are left out as loading a parse may rename
+#the words, e.g. "if" to "If", see get_word_key.
+def get_structure_key(utt):
+  structure = []
+  for w in utt.words:
+    structure.append([(str(s.stress), [(p.id, p.start, p.end) for p in s.phonemes]) for s in w.syllables])
+  return hashlib.sha1(repr(structure)).hexdigest()
+
+#Returns a hash of the word ids of utt. The festival groups are made from these.
+def get_word_key(utt):
+  return hashlib.sha1(repr([w.id for w in utt.words])).hexdigest()
+
+#Returns the [structure key, word key] of utt as kept in the manifest.
+def get_utt_keys(utt):
+  return [get_structure_key(utt), get_word_key(utt)]
+
+#Returns the (group, [[context, type], ...]) of each group in table in the order they were added.
+def get_group_types(table):
+  schema = table.schema
+  return [[group, [[name, schema.types[schema.index[name]]] for name in names]] for group, names in table.groups]
+
+#Returns the tag of a run making only some utts or None if it makes all of them.
+#Shards are tagged by their number and utt lists by a hash of the ids, so reruns
+#of the same part replace their own manifest and different parts do not clash.
+def get_run_tag(args):
+  tag = []
+  if args.utt_list != None:
+    tag.append("list"+hashlib.sha1("\n".join(sorted(args.utt_list))).hexdigest()[:10])
+  if args.shard != None:
+    tag.append("{0}of{1}".format(args.shard[0], args.shard[1]))
+  if tag:
+    return ".".join(tag)
+  return None
+
+def get_path(labdir, tag=None):
+  if tag == None:
+    return os.path.join(labdir, MANIFEST_NAME)
+  return os.path.join(labdir, MANIFEST_PREFIX+tag+MANIFEST_EXT)
+
+#Returns the paths of all manifests in labdir.
+def get_paths(labdir):
+  if not os.path.isdir(labdir):
+    return []
+  names = [f for f in os.listdir(labdir) if f.startswith(MANIFEST_PREFIX) and f.endswith(MANIFEST_EXT)]
+  return [os.path.join(labdir, f) for f in sorted(names)]
+
+#Returns the manifest of the labels in labdir or None if there is none.
+#The manifests of all runs are joined in the order the runs started. The manifest of
+#the newest run which wrote one tells what the labels are made of and the utts of older
+#runs are only kept if they were made the same way. Utts of any other run are dropped.
+def read_manifest(labdir):
+  manifests = []
+  for path in get_paths(labdir):
+    try:
+      manifests.append(json.load(open(path, "r")))
+    except ValueError:
+      print "Warning! Could not read label manifest {0}.".format(path)
+      return None
+    #A run which did not finish may have changed any of the labels.
+    if manifests[-1].get("complete", True) == False:
+      print "Warning! The run writing label manifest {0} did not finish.".format(path)
+      return None
+  manifests.sort(key=lambda m: m.get("started", 0))
+  written = [m for m in manifests if m["groups"] != None]
+  if not written:
+    return None
+  newest = written[-1]
+  utts = {}
+  for m in manifests:
+    if m["config"] == newest["config"] and m["groups"] == newest["groups"]:
+      utts.update(m["utts"])
+    else:
+      for utt_id in m["utts"]:
+        utts.pop(utt_id, None)
+  return {"config":newest["config"], "groups":newest["groups"], "utts":utts}
+
+#Writes a manifest atomically. The temporary file is unique to the process
+#so runs writing into the same lab dir never write the same file.
+def write_manifest(path, manifest):
+  tmp_path = "{0}.{1}.tmp".format(path, os.getpid())
+  wf = open(tmp_path, "w")
+  json.dump(manifest, wf, indent=1, sort_keys=True)
+  wf.close()
+  os.rename(tmp_path, path)
+
+#Removes all manifests of labdir.
+def remove_manifests(labdir):
+  for path in get_paths(labdir):
+    os.remove(path)
+
+class LabelManifest(object):
+  """What the labels written in a run were made from."""
+  def __init__(self, args):
+    self.config = get_config(args)
+    self.groups = None
+    self.utts = {}
+    self.tag = get_run_tag(args)
+    self.started = time.time()
+
+  #Adds the utt whose label was made from the feature groups given, see get_group_types.
+  def add(self, utt, groups, keys=None):
+    if self.groups == None:
+      self.groups = groups
+    elif self.groups != groups:
+      raise SiReError("The feature groups of utt {0} differ from those of earlier utts!".format(utt.id))
+    if keys == None:
+      keys = get_utt_keys(utt)
+    self.utts[utt.id] = keys
+
+  #Called before writing any labels so no manifest is out of date with them if the run is stopped.
+  #A run making all utts removes all manifests. A run making some marks its own as not finished,
+  #but only if there are manifests or it will write one, so a plain lab dir is left as it is.
+  def start(self, labdir, write):
+    if self.tag == None:
+      remove_manifests(labdir)
+    elif write or get_paths(labdir):
+      write_manifest(get_path(labdir, self.tag), {"config":self.config, "groups":None, "utts":{}, "started":self.started, "complete":False})
+
+  #Called when all labels are written. If write is False but the run marked its manifest
+  #as not finished, see start, the manifest only tells the labels of its utts changed.
+  def finish(self, labdir, write):
+    path = get_path(labdir, self.tag)
+    if write:
+      write_manifest(path, {"config":self.config, "groups":self.groups, "utts":self.utts, "started":self.started, "complete":True})
+    elif os.path.isfile(path):
+      write_manifest(path, {"config":self.config, "groups":None, "utts":dict.fromkeys(self.utts), "started":self.started, "complete":True})
+
+class LabelUpdater(object):
+  """Updates the labels in labdir by computing only the feature groups which changed."""
+  def __init__(self, manifest, pipeline, args):
+    self.pipeline = pipeline
+    self.labdir = args.labdir
+    self.HHEd_fix = args.HHEd_fix
+    self.utts = manifest["utts"]
+    self.groups = pipeline.groups
+    schema = pipeline.schema
+    schema_types = dict(zip(schema.names, schema.types))
+    #The groups are reused if they were made the same way and each context has the same type.
+    self.reused = {}
+    if manifest["config"] == get_config(args):
+      for group, types in manifest["groups"]:
+        if group in self.groups and all([schema_types.get(name) == v_type for name, v_type in types]):
+          self.reused[group] = types
+    self.changed = [group for group in self.groups if group not in self.reused]
+    self.timings = [name for name, code in zip(schema.names, schema.codes) if code == context_skeletons.TIMING]
+    #The contexts of the existing labels in the order they are written.
+    self.old_names = [name for group, types in manifest["groups"] for name, v_type in types if name not in self.timings]
+
+  #Returns True if nothing can be reused.
+  def is_empty(self):
+    return len(self.reused) == 0
+
+  #Returns the layers which must be loaded to update utt.
+  #The festival layer is only needed if a festival group changed.
+  def get_layers(self, utt):
+    layers = []
+    for layer in utterance.LAYERS:
+      if layer == "festival" and not set(FESTIVAL_GROUPS) & set(self.changed):
+        continue
+      if utt.has_layer(layer):
+        layers.append(layer)
+    return layers
+
+  #Returns the lines of the updated label of utt, its groups (see get_group_types) and keys (see get_utt_keys).
+  #Returns None if the label of utt cannot be updated and must be made from scratch.
+  #If only the word ids changed, e.g. as a parse was added, the festival groups are made again.
+  def update(self, utt):
+    keys = get_utt_keys(utt)
+    old_keys = self.utts.get(utt.id)
+    if old_keys == None or old_keys[0] != keys[0]:
+      return None
+    changed = self.changed
+    if old_keys[1] != keys[1]:
+      changed = [group for group in self.groups if group in changed or group in FESTIVAL_GROUPS]
+      if set(changed) != set(self.changed) and utt.has_layer("festival"):
+        utt.load_layer("festival")
+    path = os.path.join(self.labdir, utt.id+".lab")
+    if not os.path.isfile(path):
+      return None
+    lines = [l.split() for l in open(path, "r") if l.strip() != ""]
+    if len(lines) != len(utt.phonemes) or any([len(l) != 3 for l in lines]):
+      return None
+    table = self.pipeline.make_table(utt, changed)
+    changed = dict(get_group_types(table))
+    #The contexts of the label in the order of a full run.
+    groups = []
+    for group in self.groups:
+      if group in changed:
+        groups.append([group, changed[group]])
+      else:
+        groups.append([group, self.reused[group]])
+    names = [name for group, types in groups for name, v_type in types if name not in self.timings]
+    new = dict(table.get_formatted_columns(self.HHEd_fix))
+    old_names = self.old_names
+    out = []
+    for j, l in enumerate(lines):
+      #The old contexts are taken by their position, not their name, as a few are
+      #written in another order on some lines, see context_columns.ContextTable.swap_on_rows.
+      tokens = ["|"+c for c in l[2][1:-1].split("|")]
+      if len(tokens) != len(old_names) or set([c.split(":", 1)[0][1:] for c in tokens]) != set(old_names):
+        return None
+      old = dict(zip(old_names, tokens))
+      try:
+        out.append(l[0]+" "+l[1]+" "+"".join([new[name][j] if name in new else old[name] for name in names])+"|")
+      except KeyError:
+        return None
+    return out, groups, keys
@@ -0,0 +1,61 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#Writes the labels made by make_full_context_labs.
+#Each label is joined and written in one go instead of line by line, and written to a
+#temporary file which is renamed when done, so a label is either complete or not there.
+#The lab dir may also be a corpus archive (see corpus_archive) which the labels are written into.
+#Alternatively all labels can be written into one full-context mlf. The mlf is only
+#renamed to its path when all labels are written.
+
+import os
+import sire_io
+from error_messages import SiReError
+
+#The size of the write buffer of an mlf in bytes.
+MLF_BUFFER_SIZE = 1048576
+
+class LabelWriter(object):
+  """Writes labels either as a .lab file each in a dir or archive or all into one mlf."""
+  def __init__(self, labdir=None, mlf_path=None):
+    if (labdir == None) == (mlf_path == None):
+      raise SiReError("A label writer must write to either a lab dir or an mlf!")
+    self.labdir = labdir
+    self.mlf_path = mlf_path
+    self.mlf = None
+    self.corpus = None
+    if labdir != None:
+      self.corpus = sire_io.CorpusWriter(labdir)
+    else:
+      self.mlf = open(mlf_path+".tmp", "w", MLF_BUFFER_SIZE)
+      self.mlf.write("#!MLF!#\n")
+
+  #Writes the label of utt_id given as a list of lines without line endings.
+  def write(self, utt_id, lines):
+    data = "\n".join(lines)+"\n"
+    if self.mlf != None:
+      self.mlf.write("\"*/"+utt_id+".lab\"\n"+data+".\n")
+    else:
+      self.corpus.write(utt_id+".lab", data)
+
+  #Finishes writing. Nothing is written to the mlf or archive path before this is called.
+  def close(self):
+    if self.corpus != None:
+      self.corpus.close()
+    if self.mlf != None:
+      self.mlf.close()
+      os.rename(self.mlf_path+".tmp", self.mlf_path)
+      self.mlf = None
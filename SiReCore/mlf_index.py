@@ -0,0 +1,138 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#An index of where each label is in an mlf, so some labels can be read without
+#reading the whole mlf.
+#The index is stored next to the mlf as MLFPATH.idx. The first line is the size and
+#modification time of the mlf it was made from, so it is made again if the mlf changes.
+#Each following line is "utt_id start end" where start and end are the byte offsets of
+#the label from its "*/utt_id.ext" line up to the next label.
+
+import os, mmap
+import sire_io
+from error_messages import SiReError
+
+INDEX_EXT = ".idx"
+INDEX_HEADER = "#!MLFINDEX!#"
+
+#Returns a list of the (utt_id, start, end) of each label in an mlf in the order of the mlf.
+#The mlf is memory mapped so it is never read into memory as a whole.
+def scan_mlf(mlf_path):
+  f = open(mlf_path, "rb")
+  size = os.fstat(f.fileno()).st_size
+  index = []
+  if size == 0:
+    f.close()
+    return index
+  m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  #The start of each label is a line starting with a quote.
+  if m[:1] == '"':
+    start = 0
+  else:
+    start = m.find('\n"')
+    if start != -1:
+      start += 1
+  while start != -1:
+    line_end = m.find("\n", start)
+    if line_end == -1:
+      line_end = size
+    header = m[start:line_end].strip()
+    next_start = m.find('\n"', line_end)
+    if next_start != -1:
+      next_start += 1
+    if "*/" in header:
+      if index and index[-1][2] == None:
+        index[-1][2] = start
+      index.append([header.split("*/")[1].split(".")[0], start, None])
+    start = next_start
+  if index:
+    index[-1][2] = size
+  m.close()
+  f.close()
+  return [tuple(x) for x in index]
+
+def get_index_path(mlf_path):
+  return mlf_path+INDEX_EXT
+
+#Returns the string identifying the version of the mlf an index was made from.
+def get_mlf_stamp(mlf_path):
+  st = os.stat(mlf_path)
+  return "{0} {1} {2}".format(INDEX_HEADER, st.st_size, int(st.st_mtime))
+
+#Returns the index of an mlf, see scan_mlf.
+#The stored index is used if it fits the mlf, else it is made and stored.
+def load_mlf_index(mlf_path):
+  if not os.path.isfile(mlf_path):
+    raise SiReError("Input path to mlf does no exist!")
+  stamp = get_mlf_stamp(mlf_path)
+  path = get_index_path(mlf_path)
+  if os.path.isfile(path):
+    lines = open(path, "r").read().split("\n")
+    if lines[0] == stamp:
+      index = []
+      for l in lines[1:]:
+        if l != "":
+          l = l.split()
+          index.append((l[0], int(l[1]), int(l[2])))
+      return index
+  print "Indexing mlf {0}...".format(mlf_path)
+  index = scan_mlf(mlf_path)
+  #The index is just not kept if it cannot be written, e.g. if the mlf is in a read only dir.
+  try:
+    wf = open(path+".tmp", "w")
+    wf.write(stamp+"\n")
+    for utt_id, start, end in index:
+      wf.write("{0} {1} {2}\n".format(utt_id, start, end))
+    wf.close()
+    os.rename(path+".tmp", path)
+  except (IOError, OSError):
+    print "Warning! Could not write mlf index {0}.".format(path)
+  return index
+
+#Returns the ids of the labels in an mlf in the order of the mlf.
+def get_utt_ids(mlf_path):
+  return [utt_id for utt_id, start, end in load_mlf_index(mlf_path)]
+
+#Yields the labels of the utts in utt_ids from an mlf in the format of sire_io.parse_mlf.
+#Only the labels asked for are read.
+def iter_indexed_mlf(mlf_path, intype, utt_ids):
+  ranges = dict([(utt_id, (start, end)) for utt_id, start, end in load_mlf_index(mlf_path)])
+  missing = [utt_id for utt_id in utt_ids if utt_id not in ranges]
+  if missing:
+    raise SiReError("{0} utts are not in mlf {1}! E.g. {2}".format(len(missing), mlf_path, missing[:5]))
+  f = open(mlf_path, "rb")
+  for utt_id in utt_ids:
+    start, end = ranges[utt_id]
+    f.seek(start)
+    lines = f.read(end - start).split("\n")
+    lines = [l for l in lines if l.strip() != ""]
+    #The last line of an mlf is always taken to be the end of the label.
+    if lines[-1].strip() != ".":
+      lines.append(".")
+    for lab in sire_io.iter_mlf(["#!MLF!#"]+lines, intype):
+      yield lab
+  f.close()
+
+#Returns an iterator over the labels of an mlf, see sire_io.iter_mlf.
+#If utt_list or shard is given only those labels are read using the index of the mlf,
+#see sire_io.select_utts.
+def get_mlf_labs(mlf_path, intype, utt_list=None, shard=None):
+  if utt_list == None and shard == None:
+    if not os.path.exists(mlf_path):
+      raise SiReError("Input path to mlf does no exist!")
+    return sire_io.iter_mlf(open(mlf_path, "r"), intype)
+  utt_ids = sire_io.select_utts(get_utt_ids(mlf_path), utt_list, shard)
+  return iter_indexed_mlf(mlf_path, intype, utt_ids)
@@ -15,8 +15,16 @@
 ##########################################################################
 
 from error_messages import SiReError
+from reference_utils import weak_property, get_slots_state, set_slots_state
+
+#Tree nodes only refer weakly to their parent so the trees contain no cycles.
+#The root must be kept by the user of the tree, e.g. utt.pcfg_tree.
+class stanfordPcfgTree(object):
+  __slots__ = ("label", "children", "list", "pos_in_parent", "num_siblings", "_parent", "__weakref__")
+  parent = weak_property("_parent")
+  __getstate__ = get_slots_state
+  __setstate__ = set_slots_state
 
-class stanfordPcfgTree:
   def __init__(self, label=None, parent=None, children=[]):
     self.label = label
     self.parent = parent
@@ -100,7 +108,12 @@ def get_fake_stanford_pcfg_parse():
   fake_tree.num_siblings = "xx"
   return fake_tree
 
-class stanfordDependencyTree:
+class stanfordDependencyTree(object):
+  __slots__ = ("label", "utt_pos", "parent_relation", "children", "_parent", "__weakref__")
+  parent = weak_property("_parent")
+  __getstate__ = get_slots_state
+  __setstate__ = set_slots_state
+
   def __init__(self, label=None, parent=None, parent_relation=None, utt_pos=None):
     self.label = label
     self.utt_pos = utt_pos
@@ -37,3 +37,6 @@ def simple_festival_accent_predict(utt):
     else:
       for syll in word.syllables:
         syll.accent = 0
+  #The accent counts and distances used by the festival contexts are computed once here.
+  utt.accent_neighbours = None
+  utt.get_accent_neighbours()
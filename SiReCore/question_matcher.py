@@ -0,0 +1,155 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#Methods for applying a question set to SiRe labels.
+#Instead of matching each pattern of each question against each label line, as HTS
+#style tools do, each line is split into its contexts once and the questions matched
+#by looking up the value of each context. Which questions a value matches is only
+#worked out the first time the value is seen.
+#All question types made by contexts.make_questions are supported:
+#QS / LQ 0 = 1.0 if any pattern of the question matches else 0.0.
+#LQ 1 = The value given in the question if any pattern matches else 0.0.
+#CQS = The number captured by the pattern or -1.0 if it does not match.
+#Patterns must be of the form *|context:value|* where value may use the ? and * wildcards.
+#There is one vector per label line, i.e. per phoneme or per state for state level labels.
+
+import os, re, fnmatch
+from array import array
+from error_messages import SiReError
+
+#Matches a question and gives the type, value (for LQ 1), name and patterns.
+QUESTION_PATTERN = re.compile(r'^(QS|CQS|LQ 0|LQ 1 (\S+))\s+"([^"]*)"\s+\{(.*)\}$')
+#Matches a single pattern and gives the context and value.
+CONTEXT_PATTERN = re.compile(r'^\*\|([^:|]+):([^|]*)\|\*$')
+
+class Question(object):
+  """A question and its patterns."""
+  def __init__(self, line):
+    m = QUESTION_PATTERN.match(line.strip())
+    if m == None:
+      raise SiReError("Cannot parse question ({0})!".format(line.strip()))
+    self.name = m.group(3)
+    if m.group(1) == "CQS":
+      self.qtype = "continuous"
+    elif m.group(2) != None:
+      self.qtype = "numeric"
+      self.number = float(m.group(2))
+    else:
+      self.qtype = "binary"
+      self.number = 1.0
+    #A list of (context, value) tuples.
+    self.patterns = []
+    for pattern in m.group(4).split(","):
+      c = CONTEXT_PATTERN.match(pattern.strip())
+      if c == None:
+        raise SiReError("Cannot match pattern {0} in question ({1})! Only patterns of the form *|context:value|* are supported.".format(pattern, line.strip()))
+      self.patterns.append((c.group(1), c.group(2)))
+    if self.qtype == "continuous" and len(self.patterns) != 1:
+      raise SiReError("A continuous question must have exactly one pattern ({0})!".format(line.strip()))
+
+#Returns the list of questions in a question file.
+def read_questions(qpath):
+  questions = []
+  for line in open(qpath, "r"):
+    if line.strip() != "":
+      questions.append(Question(line))
+  return questions
+
+#Returns a dict of the value of each context in a SiRe label line.
+#The times (if any) and state number of state level labels are ignored.
+def split_label_line(line):
+  for label in line.split():
+    if label.startswith("|"):
+      break
+  else:
+    raise SiReError("Cannot find any contexts in label line ({0})!".format(line.strip()))
+  contexts = {}
+  for c in label[1:label.rfind("|")].split("|"):
+    c = c.split(":", 1)
+    if len(c) != 2:
+      raise SiReError("Context without a value in label line ({0})!".format(line.strip()))
+    contexts[c[0]] = c[1]
+  return contexts
+
+class QuestionMatcher(object):
+  """A question set compiled for matching against labels."""
+  def __init__(self, questions):
+    self.questions = questions
+    self.size = len(questions)
+    #For each context, a dict of the questions about exact values.
+    self.exact = {}
+    #For each context, a list of the questions about patterns with wildcards.
+    self.wildcards = {}
+    #A list of the continuous questions.
+    self.continuous = []
+    for i, q in enumerate(questions):
+      for context, value in q.patterns:
+        if q.qtype == "continuous":
+          self.continuous.append((i, context, re.compile("^"+value+"$")))
+        elif "?" in value or "*" in value:
+          self.wildcards.setdefault(context, []).append((re.compile(fnmatch.translate(value)), i, q.number))
+        else:
+          self.exact.setdefault(context, {}).setdefault(value, []).append((i, q.number))
+    #The questions each (context, value) matches, filled in as values are seen.
+    self.matches = {}
+
+  #Returns a list of the (index, feature) of each question the value of a context matches.
+  def get_matches(self, context, value):
+    key = (context, value)
+    if key not in self.matches:
+      matches = list(self.exact.get(context, {}).get(value, []))
+      for regex, i, number in self.wildcards.get(context, []):
+        if regex.match(value):
+          matches.append((i, number))
+      self.matches[key] = matches
+    return self.matches[key]
+
+  #Returns the feature vector of a label line.
+  def get_vector(self, line):
+    return self.get_context_vector(split_label_line(line))
+
+  #Returns the feature vector of a dict of the value of each context as written in a label.
+  def get_context_vector(self, contexts):
+    vector = [0.0]*self.size
+    for context, value in contexts.iteritems():
+      for i, number in self.get_matches(context, value):
+        vector[i] = number
+    for i, context, regex in self.continuous:
+      m = regex.match(contexts.get(context, ""))
+      if m != None and len(m.groups()) > 0:
+        vector[i] = float(m.group(1))
+      else:
+        vector[i] = -1.0
+    return vector
+
+  #Returns the feature matrix of a label file as a flat array of float32 in row major order and its shape.
+  def match_label(self, path):
+    matrix = array("f")
+    n_rows = 0
+    for line in open(path, "r"):
+      if line.strip() == "":
+        continue
+      matrix.extend(self.get_vector(line))
+      n_rows += 1
+    return matrix, (n_rows, self.size)
+
+  #Matches each .lab file in a dir and yields the (file id, matrix, shape) of each.
+  #One file at a time is kept in memory so any size of corpus can be matched.
+  def match_labdir(self, labdir):
+    for f in sorted(os.listdir(labdir)):
+      if f.endswith(".lab"):
+        matrix, shape = self.match_label(os.path.join(labdir, f))
+        yield f[:-4], matrix, shape
@@ -0,0 +1,68 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#Methods for references between objects.
+
+import weakref
+
+#Returns a property storing its value in the given slot as a weak reference.
+#This is used for references to parents (e.g. a phoneme's parent_utt) so
+#that a child does not keep its parent alive and the two do not make a
+#reference cycle. The parent must be kept alive by something else, normally
+#the utterance the objects belong to.
+#Values which cannot be weakly referenced (e.g. "xx" or None) are stored as is.
+def weak_property(slot):
+  def get(self):
+    value = getattr(self, slot)
+    if type(value) is weakref.ref:
+      return value()
+    return value
+  def set(self, value):
+    try:
+      value = weakref.ref(value)
+    except TypeError:
+      pass
+    setattr(self, slot, value)
+  return property(get, set)
+
+#Pickling support for slotted classes, use as the __getstate__ and __setstate__ of the class.
+#Weak references cannot be pickled so the objects they refer to are pickled instead
+#and referred to weakly again when unpickled. The unpickled parents are kept alive
+#by the unpickled utterance just as the original ones were.
+def get_slots_state(obj):
+  state = {}
+  weak = {}
+  for cls in type(obj).__mro__:
+    for slot in cls.__dict__.get("__slots__", ()):
+      if slot == "__weakref__" or not hasattr(obj, slot):
+        continue
+      value = getattr(obj, slot)
+      if type(value) is weakref.ref:
+        weak[slot] = value()
+      else:
+        state[slot] = value
+  return (state, weak)
+
+def set_slots_state(obj, state):
+  state, weak = state
+  for slot, value in state.iteritems():
+    setattr(obj, slot, value)
+  for slot, value in weak.iteritems():
+    try:
+      value = weakref.ref(value)
+    except TypeError:
+      pass
+    setattr(obj, slot, value)
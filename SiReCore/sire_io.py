@@ -14,45 +14,116 @@
 #limitations under the License.                                          #
 ##########################################################################
 
-import os, sys
+import os, sys, itertools, collections
+from multiprocessing.pool import ThreadPool
+import corpus_archive
 from error_messages import SiReError
 
-#Opens each .lab file in a dir line by line.
-def open_labdir_line_by_line(path, dur_lab=False):
-  l = os.listdir(path)
-  labs = []
-  if dur_lab == False:
-    for i, lab in enumerate(l):
-      if ".lab" in lab:
-        tmp = [lab.split(".")[0]]
-        tmp += [x.split() for x in open(os.path.join(path, lab), "r").readlines()]
-        labs.append(tmp)
-  elif dur_lab == True:
-    for i, lab in enumerate(l):
-      if ".dur" in lab:
-        c_pos = 0
-        tmp = [lab.split(".")[0]]
-        for x in open(os.path.join(path, lab), "r").readlines():
-          if ".state[" not in x:
-            x = x.split()
-            frames = int(x[-3].split("=")[1])
-            tmp += [[str(c_pos*50000), str((c_pos+frames)*50000), x[0]]]
-            c_pos += frames
-        labs.append(tmp)
+#The number of threads reading files in the dir loaders below. Reading a file is mostly
+#waiting on the filesystem, e.g. on NFS, so this overlaps the waiting. 1 reads serially.
+IO_THREADS = 8
+#How many files each thread may read ahead of the file being used.
+IO_READ_AHEAD = 4
+
+#Yields read_fn(path) for each path in paths in the same order.
+#The files are read by a pool of threads which read at most threads*IO_READ_AHEAD files
+#ahead, so the files can be used while the rest are being read without reading all of
+#them into memory first.
+def iter_read_files(read_fn, paths, threads=None):
+  if threads == None:
+    threads = IO_THREADS
+  if threads <= 1:
+    for path in paths:
+      yield read_fn(path)
+    return
+  pool = ThreadPool(threads)
+  try:
+    paths = iter(paths)
+    pending = collections.deque([pool.apply_async(read_fn, (path,)) for path in itertools.islice(paths, threads*IO_READ_AHEAD)])
+    while pending:
+      #Any error reading a file is raised here.
+      result = pending.popleft().get()
+      for path in itertools.islice(paths, 1):
+        pending.append(pool.apply_async(read_fn, (path,)))
+      yield result
+  finally:
+    pool.terminate()
+
+#Returns the names of the files in a dir or corpus archive (see corpus_archive) whose name
+#contains ext, in the order of os.listdir or of the archive.
+def list_corpus(path, ext):
+  if corpus_archive.is_archive(path):
+    names = corpus_archive.ArchiveReader(path).get_names()
   else:
+    names = os.listdir(path)
+  return [name for name in names if ext in name]
+
+#Yields parse_fn(name, data) for each of the files in names in a dir or corpus archive in that order.
+#The files of a dir are read by a pool of threads, see iter_read_files.
+def iter_corpus(path, names, parse_fn):
+  if corpus_archive.is_archive(path):
+    for name, data in corpus_archive.ArchiveReader(path).iter_files(names):
+      yield parse_fn(name, data)
+  else:
+    for result in iter_read_files(lambda name: parse_fn(name, open(os.path.join(path, name), "r").read()), names):
+      yield result
+
+#Returns the lines of the contents of a file as readlines would but without line endings.
+def split_lines(data):
+  lines = data.split("\n")
+  if lines[-1] == "":
+    lines.pop()
+  return lines
+
+#Returns the utt ids of the .lab (or .dur if dur_lab) files in a dir or corpus archive in the order of list_corpus.
+def get_labdir_ids(path, dur_lab=False):
+  if dur_lab not in [True, False]:
     raise SiReError("dur_lab must be boolean!")
-  return labs
+  ext = ".dur" if dur_lab else ".lab"
+  return [lab.split(".")[0] for lab in list_corpus(path, ext)]
+
+def parse_lab(name, data):
+  return [name.split(".")[0]] + [x.split() for x in split_lines(data)]
+
+def parse_dur_lab(name, data):
+  c_pos = 0
+  tmp = [name.split(".")[0]]
+  for x in split_lines(data):
+    if ".state[" not in x:
+      x = x.split()
+      frames = int(x[-3].split("=")[1])
+      tmp += [[str(c_pos*50000), str((c_pos+frames)*50000), x[0]]]
+      c_pos += frames
+  return tmp
+
+#Yields each .lab file in a dir or corpus archive line by line, see open_labdir_line_by_line.
+#If utt_ids is given only those labs are read in that order.
+def iter_labdir_line_by_line(path, dur_lab=False, utt_ids=None):
+  if dur_lab not in [True, False]:
+    raise SiReError("dur_lab must be boolean!")
+  if dur_lab == False:
+    ext, parse_fn = ".lab", parse_lab
+  else:
+    ext, parse_fn = ".dur", parse_dur_lab
+  files = list_corpus(path, ext)
+  if utt_ids != None:
+    names = dict([(lab.split(".")[0], lab) for lab in files])
+    files = [names[utt_id] for utt_id in utt_ids]
+  return iter_corpus(path, files, parse_fn)
+
+#Opens each .lab file in a dir or corpus archive line by line.
+def open_labdir_line_by_line(path, dur_lab=False):
+  return list(iter_labdir_line_by_line(path, dur_lab))
 
 #Opens a file and returns a list containing each line as a seperate item.
 def open_file_line_by_line(path):
 #  return open(path, "r").read().split("\n") #This is probably faster but will leave the last item as '' if file ends with \n - the below does not so is easier to work with.
   return [x.strip() for x in open(path, "r").readlines()]
 
-#Opens and makes a simple tokenization of a file (actually just removes tokens).
-#The return list has the format of l[0] == The name of the txt filepath - .txt extension.
+#Makes a simple tokenization of the contents of a txt file (actually just removes tokens).
+#The return list has the format of l[0] == The name of the txt file - .txt extension.
 #l[1:] the tokens.
-def open_and_tokenise_txt(path, keep_commas=False):
-  txt = open(path, "r").read()
+def tokenise_txt(name, txt, keep_commas=False):
   punctuation = [".", ",", "!", "?", ";", ":"]
   if keep_commas:
     punctuation.remove(",")
@@ -63,17 +134,75 @@ def open_and_tokenise_txt(path, keep_commas=False):
     txt = txt.replace(x, "")
   #This has to be done seperately as some word contain this in the middle
   txt.replace(" - ", " ")
-  return [os.path.splitext(os.path.basename(path))[0]]+txt.lower().split()
+  return [os.path.splitext(os.path.basename(name))[0]]+txt.lower().split()
+
+#Opens and makes a simple tokenization of a file, see tokenise_txt.
+def open_and_tokenise_txt(path, keep_commas=False):
+  return tokenise_txt(path, open(path, "r").read(), keep_commas)
 
-#Opens, and tokenizes all txt files in a dir and returns them in a list.
+#Opens, and tokenizes all txt files in a dir or corpus archive and returns them in a list.
 #We may wish to keep_commas as they may mark a pause.
 #If you want the file id kept use keep_file_id, it will return a tuple (file_id, tokenized_txt_list) for each list item.
 def load_txt_dir(dirpath, keep_commas=False):
   print "Loading txt files from dir..."
-  txt = [open_and_tokenise_txt(os.path.join(dirpath, x), keep_commas) for x in os.listdir(dirpath) if ".txt" in x]
+  txt = list(iter_corpus(dirpath, list_corpus(dirpath, ".txt"), lambda name, data: tokenise_txt(name, data, keep_commas)))
   print "Done."
   return txt
 
+#Returns the utt ids in a file with one id per line.
+def read_utt_list(path):
+  return [x.strip() for x in open(path, "r").readlines() if x.strip() != ""]
+
+#Returns the utt ids of utt_ids to work on, keeping their order.
+#utt_list = Only use the utts in this list.
+#shard = A tuple (i, n). Split the utts into n shards and only use the i'th (counting from 0).
+#        Each utt is in exactly one shard so n runs with i from 0 to n-1 cover all utts.
+def select_utts(utt_ids, utt_list=None, shard=None):
+  if utt_list != None:
+    known = set(utt_ids)
+    missing = [utt_id for utt_id in utt_list if utt_id not in known]
+    if missing:
+      raise SiReError("{0} utts in the utt list are not in the input! E.g. {1}".format(len(missing), missing[:5]))
+    wanted = set(utt_list)
+    utt_ids = [utt_id for utt_id in utt_ids if utt_id in wanted]
+  if shard != None:
+    i, n = shard
+    if n < 1 or i < 0 or i >= n:
+      raise SiReError("Invalid shard {0} of {1}! The shard must be between 0 and {2}.".format(i, n, n-1))
+    utt_ids = [utt_id for j, utt_id in enumerate(utt_ids) if j % n == i]
+  return utt_ids
+
+#Writes data to a file in one go. It is written to a temporary file which is then
+#renamed, so the file at path is never half written.
+def write_file_atomic(path, data):
+  wf = open(path+".tmp", "w")
+  wf.write(data)
+  wf.close()
+  os.rename(path+".tmp", path)
+
+class CorpusWriter(object):
+  """Writes the files of a corpus into a dir or a corpus archive, see corpus_archive."""
+  def __init__(self, path):
+    self.path = path
+    self.archive = None
+    if corpus_archive.is_archive(path):
+      self.archive = corpus_archive.ArchiveWriter(path)
+    elif not os.path.isdir(path):
+      raise SiReError("Output dir {0} does not exist!".format(path))
+
+  #Writes a whole file. In a dir it is written atomically, see write_file_atomic.
+  def write(self, name, data):
+    if self.archive != None:
+      self.archive.write(name, data)
+    else:
+      write_file_atomic(os.path.join(self.path, name), data)
+
+  #Finishes writing. An archive is only at its path after this is called.
+  def close(self):
+    if self.archive != None:
+      self.archive.close()
+      self.archive = None
+
 #Checks if a path exists before opening the file to avoid overwriting.
 #Alternatively if overwrite is set to True a warning is printed.
 def open_writefile_safe(filepath, overwrite=False):
@@ -95,54 +224,59 @@ def open_writefile_safe(filepath, overwrite=False):
 
 #Parse an mlf into the lines of containing labels.
 #Each labels is a list of each line split on whitespace.
+#This keeps all labels in memory, use iter_mlf if they can be used one at a time.
 def parse_mlf(mlf, intype):
+  return list(iter_mlf(mlf, intype))
+
+#Yields the labels of an mlf one at a time in the same format as parse_mlf.
+#Mlf can be any iterable of lines, e.g. an open file, so only one label is in memory at a time.
+def iter_mlf(mlf, intype):
   if intype in ["align_mlf", "state_align_mlf"]:
     ext = ".rec"
   elif intype == "hts_mlf":
     ext = ".lab"
   else:
     raise SiReError("Don't know what to do with mlf of type - {0}".format(intype))
+  lines = iter(mlf)
   #Remove mlf header
-  mlf.pop(0)
-  labs = []
+  next(lines, None)
   tmp = []
-  end = len(mlf) - 1
-  for i, l in enumerate(mlf):
+  #We look one line ahead as the last line is treated differently.
+  l = next(lines, None)
+  while l != None:
+    next_l = next(lines, None)
     l = l.split()
     if ext in l[0]:
-      if tmp == []:
-        tmp.append(l[0].split("*/")[1].split(".")[0])
-      else:
+      if tmp != []:
         if tmp[-1] == ["."]:
           tmp.pop(-1)
-        labs.append(tmp)
-        tmp = []
-        tmp.append(l[0].split("*/")[1].split(".")[0])
-    elif i == end:
-      labs.append(tmp)
+        yield collapse_mlf_states(tmp, intype)
+      tmp = [l[0].split("*/")[1].split(".")[0]]
+    elif next_l == None:
+      yield collapse_mlf_states(tmp, intype)
     else:
       tmp.append(l)
-  # Collapse states
-  if intype == "state_align_mlf":
-    new_labs = []
-    for lab in labs:
-      n_lab = []
+    l = next_l
+
+#Collapses the states of each phone of a state_align_mlf label into a list of its five state lines.
+#Labels of other mlf types are returned as they are.
+def collapse_mlf_states(lab, intype):
+  if intype != "state_align_mlf":
+    return lab
+  n_lab = []
+  tmp = []
+  for i, line in enumerate(lab):
+    if i == 0:
+      n_lab.append(line)
+    elif line[2] == "s2":
+      tmp.append(line)
+    elif line[2] == "s6":
+      #Append the state info
+      tmp.append(line)
+      if len(tmp) != 5:
+        raise SiReError("Not enough states in phone! 5 expected but I got {0}! Please check format.\n{1}".format(len(tmp), tmp))
+      n_lab.append(tmp)
       tmp = []
-      for i, line in enumerate(lab):
-        #print line
-        if i == 0:
-          n_lab.append(line)
-        elif line[2] == "s2":
-          tmp.append(line)
-        elif line[2] == "s6":
-          #Append the state info
-          tmp.append(line)
-          if len(tmp) != 5:
-            raise SiReError("Not enough states in phone! 5 expected but I got {0}! Please check format.\n{1}".format(len(tmp), tmp))
-          n_lab.append(tmp)
-          tmp = []
-        else:
-          tmp.append(line)
-      new_labs.append(n_lab)
-    labs = new_labs
-  return labs
+    else:
+      tmp.append(line)
+  return n_lab
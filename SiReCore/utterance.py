@@ -14,137 +14,95 @@
 #limitations under the License.                                          #
 ##########################################################################
 
-import phoneme_features, utterance_load, os, prosody, pos
+import phoneme_features, utterance_load, os, prosody, pos, time
 from error_messages import SiReError
+from reference_utils import weak_property, get_slots_state, set_slots_state
+
+#The layers of information which can be added to an utt after it is made, in the order they are added.
+#txt replaces the phoneme based word ids with those from the text, pcfg and dependency add the
+#stanford parses and festival adds the festival POS and accents.
+LAYERS = ["txt", "pcfg", "dependency", "festival"]
+
+#Feeds the input to builder using the loader for args.intype.
+#Builder can be any object with the methods of UtteranceBuilder.
+def build(lab, args, builder):
+  if args.intype == "align_mlf":
+    utterance_load.build_from_align_lab(builder, lab)
+  elif args.intype == "state_align_mlf":
+    utterance_load.build_from_state_align_lab(builder, lab)
+  elif args.intype == "hts_mlf":
+    utterance_load.build_from_hts_lab(builder, lab, args.state_level)
+  elif args.intype == "sire_lab":
+    #As we need additional information here we check if args contains it
+    if not hasattr(args, "context_type"):
+      raise SiReError("You're trying to create an utterance from a SiRe label but have not told what kind of positional context_type was used!")
+    if not hasattr(args, "HHEd_fix"):
+      raise SiReError("You're trying to create an utterance from a SiRe label but have not told if HHEd_fix was used to create the labels!")
+    utterance_load.build_from_sire_lab(builder, lab, args.context_type, args.HHEd_fix)
+  elif args.intype == "txt":
+    #Check if args has all the necessary elements and insert defaults if not.
+    if not hasattr(args, 'pron_reduced') or args.pron_reduced == False:
+      args.pron_reduced = False
+      args.lm_score_dir = None
+      args.reduction_level = 1.0
+    else:
+      #If we are we need to check if we know enough to do it and fail if we don't.
+      if not hasattr(args, 'lm_score_dir'):
+        raise SiReError("You have asked to produce a reduced phonemisation but no path to a directory containing LM word probabilities to base the reduction on.")
+      if not hasattr(args, 'reduction_level'):
+        raise SiReError("You have asked to produce a reduced phonemisation but not specified to which degree the sentence should be reduced.")
+    if not hasattr(args, 'general_sil_phoneme'):
+      print "Warning! args does not tell if there is a standard silence phoneme! Using default... (\"sil\")"
+      args.general_sil_phoneme = "sil"
+    if not hasattr(args, 'comma_is_pause'):
+      print "Warning! args does not tell if commas should be used as pauses! Using default... (no)"
+      args.comma_is_pause = False
+    if not hasattr(args, 'stanford_pcfg_parse'):
+      print "Warning! args does not tell if we are using stanford parsing! Using default... (no)"
+      args.stanford_pcfg_parse = False
+    if args.stanford_pcfg_parse == False:
+      args.pcfgdict = False
+    utterance_load.build_from_txt(builder, lab, args.dictionary, args.general_sil_phoneme, args.comma_is_pause, args.stanford_pcfg_parse, args.pcfgdict, args.pron_reduced, args.lm_score_dir, args.reduction_level)
+  else:
+    raise SiReError("Don't know what to do with intype - {0}".format(args.intype))
+
+#Makes a proto utt from the input according to args.intype.
+#See ProtoBuilder for the conventions a proto utt follows.
+def make_proto(lab, args):
+  builder = ProtoBuilder()
+  build(lab, args, builder)
+  return builder.proto
+
+#Returns the phoneme featureset args asks utterances to be created with.
+def get_phoneme_features(args):
+  if hasattr(args, 'dictionary'):
+    return args.dictionary.phoneme_feats
+  elif hasattr(args, 'phoneme_features'):
+    return args.phoneme_features
+  else:
+    raise SiReError("args does not contain either a dictionary or a phoneme featureset!")
 
 class Utterance(object):
   """An object representing an utterance."""
 
-  #Create an empty utt.
-  #The proto utterance follows the following conventions:
-  #It is a dictionary with two keys, id giving the name of the utt,
-  #and utt containing the actual utt.
-  #Utt is itself a list of proto_words.
-  #A proto_word is a dict containing two keys, id giving the name of the word,
-  #and syllables.
-  #Syllables is itself a list of proto_syllables.
-  #A proto_syllable is a dict containing three keys, id giving the name of the syllable,
-  #stress giving its stress value and phonemes.
-  #The id of a syllable is expected to be the id of all its contained
-  #phonemes in order as a string.
-  #Phonemes is itself a list of proto_phonemes.
-  #A proto_phoneme is a dict containing 4 keys.
-  #Id being the type of phoneme, must be a valid phoneme in phoneme set used.
-  #Start - the start time in HTK style values where 10000 is 1ms.
-  #End - the end time in HTK style values where 10000 is 1 ms.
-  #Stress - the stress value of the phoneme - this may be None in case we do not have the information.
+  #Create an utt from the input according to args.intype.
+  #The loaders feed the segments to an UtteranceBuilder which makes the
+  #phonemes, syllables and words directly.
   def __init__(self, lab, args):
-    #Make a proto utt from the input
-    if args.intype == "align_mlf":
-      proto = utterance_load.proto_from_align_lab(lab)
-      self.txtloaded = False
-    elif args.intype == "state_align_mlf":
-      proto = utterance_load.proto_from_state_align_lab(lab)
-      self.txtloaded = False
-    elif args.intype == "hts_mlf":
-      proto = utterance_load.proto_from_hts_lab(lab, args.state_level)
-      self.txtloaded = False
-    elif args.intype == "sire_lab":
-      #As we need additional information here we check if args contains it
-      if not hasattr(args, "context_type"):
-        raise SiReError("You're trying to create an utterance from a SiRe label but have not told what kind of positional context_type was used!")
-      if not hasattr(args, "HHEd_fix"):
-        raise SiReError("You're trying to create an utterance from a SiRe label but have not told if HHEd_fix was used to create the labels!")
-      proto = utterance_load.proto_from_sire_lab(lab, args.context_type, args.HHEd_fix)
-      self.txtloaded = False
-    elif args.intype == "txt":
-      #Check if args has all the necessary elements and insert defaults if not.
-      if not hasattr(args, 'pron_reduced') or args.pron_reduced == False:
-        args.pron_reduced = False
-        args.lm_score_dir = None
-        args.reduction_level = 1.0
-      else:
-        #If we are we need to check if we know enough to do it and fail if we don't.
-        if not hasattr(args, 'lm_score_dir'):
-          raise SiReError("You have asked to produce a reduced phonemisation but no path to a directory containing LM word probabilities to base the reduction on.")
-        if not hasattr(args, 'reduction_level'):
-          raise SiReError("You have asked to produce a reduced phonemisation but not specified to which degree the sentence should be reduced.")
-      if not hasattr(args, 'general_sil_phoneme'):
-        print "Warning! args does not tell if there is a standard silence phoneme! Using default... (\"sil\")"
-        args.general_sil_phoneme = "sil"
-      if not hasattr(args, 'comma_is_pause'):
-        print "Warning! args does not tell if commas should be used as pauses! Using default... (no)"
-        args.comma_is_pause = False
-      if not hasattr(args, 'stanford_pcfg_parse'):
-        print "Warning! args does not tell if we are using stanford parsing! Using default... (no)"
-        args.stanford_pcfg_parse = False
-      if args.stanford_pcfg_parse == False:
-        args.pcfgdict = False
-      proto = utterance_load.proto_from_txt(lab, args.dictionary, args.general_sil_phoneme, args.comma_is_pause, args.stanford_pcfg_parse, args.pcfgdict, args.pron_reduced, args.lm_score_dir, args.reduction_level)
-      self.txtloaded = True
-    else:
-      raise SiReError("Don't know what to do with intype - {0}".format(args.intype))
-
-    #Construct the utt from the proto utt
-    self.id = proto["id"]
     self.phonemes = []
     self.syllables = []
     self.words = []
     #We need to know which phoneme features this utterance is created with.
-    if hasattr(args, 'dictionary'):
-      self.phoneme_features = args.dictionary.phoneme_feats
-    elif hasattr(args, 'phoneme_features'):
-      self.phoneme_features = args.phoneme_features
-    else:
-      raise SiReError("args does not contain either a dictionary or a phoneme featureset!")
-    s_utt_pos = 0
-    p_utt_pos = 0
-
-    for wi, proto_word in enumerate(proto["utt"]):
-      p_word_pos = 0
-      word = Word()
-      word.load_from_proto(proto_word, wi, p_utt_pos, s_utt_pos, len(proto["utt"]), self)
-      self.words.append(word)
-      for si, proto_syll in enumerate(proto_word["syllables"]):
-        syll = Syllable()
-        syll.load_from_proto(proto_syll, p_utt_pos, si, s_utt_pos, word, self)
-        self.syllables.append(syll)
-        for pi, proto_phone in enumerate(proto_syll["phonemes"]):
-          phoneme = Phoneme()
-          phoneme.load_from_proto(proto_phone, pi, p_utt_pos, p_word_pos, syll, word, self)
-          self.phonemes.append(phoneme)
-          p_word_pos += 1
-          p_utt_pos += 1
-        s_utt_pos += 1
-        syll.add_phonemes()
-      word.add_phonemes()
-      word.add_syllables()
-
-    #If we should use the stanford pcfg parse info
-    if hasattr(args, 'stanford_pcfg_parse') and args.stanford_pcfg_parse:
-      print "Loading stanford pcfg parse info to utt..."
-      if args.intype != "txt":
-        utterance_load.load_txt(self, os.path.join(args.txtdir, self.id+".txt"))
-      utterance_load.load_stanford_pcfg_parse(self, args.pcfgdict[self.id], args.comma_is_pause)
-
-    #If we should use the stanford dependency parse info
-    if hasattr(args, 'stanford_dependency_parse') and args.stanford_dependency_parse:
-      print "Loading stanford dependency parse info to utt..."
-      if args.intype != "txt" and self.txtloaded == False:
-        utterance_load.load_txt(self, os.path.join(args.txtdir, self.id+".txt"))
-      utterance_load.load_stanford_dependency_parse(self, args.dependencydict[self.id])
-
-    #If we output a Festival context set we should modify the UTT a bit further.
-    #Right now we use the full festival features as standard, but some operations, like corpus analysis, does not rely on this and it is a nuisance to have the text a requirement so this is still just an option.
-    if args.festival_features == True:
-      #We need to know the words
-      if args.intype != "txt" and self.txtloaded == False:
-        # print "ID", self.id
-        utterance_load.load_txt(self, os.path.join(args.txtdir, self.id+".txt"), args.emphasis)
-      #If we have a pcfg parse we have a proper POS tag mechanism and they have already been added
-      if not args.stanford_pcfg_parse:
-        pos.simple_festival_pos_predict(self)
-      prosody.simple_festival_accent_predict(self)
+    self.phoneme_features = get_phoneme_features(args)
+    build(lab, args, UtteranceBuilder(self))
+    self.txtloaded = args.intype == "txt"
+    #These are computed when first asked for, see get_phoneme_neighbours and get_syllable_neighbours.
+    self.phoneme_neighbours = None
+    self.syllable_neighbours = None
+    #This is computed when accents are predicted, see get_accent_neighbours.
+    self.accent_neighbours = None
+    #The text, parse and festival information is only added when first asked for, see load_layer.
+    self.init_layers(args)
 
 #    #Replacing UH - test!
 #    if not self.txtloaded:
@@ -155,6 +113,185 @@ class Utterance(object):
 #          if p.id in ["@", "V"]:
 #            p.id = "UHV"
 
+  #Stores the inputs of each layer args asks for so it can be loaded later.
+  #The utt only needs to keep the inputs themselves and not args.
+  def init_layers(self, args):
+    self.layer_inputs = {}
+    self.loaded_layers = []
+    #The time in seconds spent loading each layer.
+    self.layer_costs = {}
+    pcfg = hasattr(args, 'stanford_pcfg_parse') and args.stanford_pcfg_parse == True
+    dependency = hasattr(args, 'stanford_dependency_parse') and args.stanford_dependency_parse == True
+    festival = args.festival_features == True
+    #Emphasis is marked by capitalisation in the text so it is loaded with the text.
+    emphasis = hasattr(args, 'emphasis') and args.emphasis == True
+    if self.txtloaded:
+      self.loaded_layers.append("txt")
+    elif pcfg or dependency or festival:
+      #If the txt files are in an archive their contents are already read, see make_full_context_labs.
+      if getattr(args, 'txtdict', None) != None:
+        self.layer_inputs["txt"] = (None, emphasis, args.txtdict[self.id])
+      else:
+        self.layer_inputs["txt"] = (os.path.join(args.txtdir, self.id+".txt"), emphasis, None)
+    if pcfg:
+      self.layer_inputs["pcfg"] = (args.pcfgdict[self.id], args.comma_is_pause)
+    if dependency:
+      self.layer_inputs["dependency"] = (args.dependencydict[self.id],)
+    if festival:
+      #If we have a pcfg parse we have a proper POS tag mechanism and they are added with it.
+      self.layer_inputs["festival"] = (pcfg,)
+
+  #Returns True if the layer has been or can be loaded.
+  def has_layer(self, name):
+    return name in self.loaded_layers or name in self.layer_inputs
+
+  #Loads the layer if it is not already loaded.
+  #The layers change the words (e.g. the parses may split them) so all layers asked for
+  #coming before it in LAYERS are loaded first. This way the result is the same no
+  #matter which layer is asked for first.
+  def load_layer(self, name):
+    if not self.has_layer(name):
+      raise SiReError("The {0} layer was not asked for when creating utt {1}!".format(name, self.id))
+    for layer in LAYERS:
+      if layer in self.layer_inputs:
+        self.load_layer_inputs(layer)
+      if layer == name:
+        break
+
+  #Loads all layers asked for.
+  def load_layers(self):
+    for layer in LAYERS:
+      if layer in self.layer_inputs:
+        self.load_layer_inputs(layer)
+
+  def load_layer_inputs(self, name):
+    start = time.time()
+    inputs = self.layer_inputs[name]
+    if name == "txt":
+      if inputs[2] != None:
+        utterance_load.load_txt_string(self, inputs[2], inputs[1])
+      else:
+        utterance_load.load_txt(self, inputs[0], inputs[1])
+    elif name == "pcfg":
+      print "Loading stanford pcfg parse info to utt..."
+      utterance_load.load_stanford_pcfg_parse(self, inputs[0], inputs[1])
+    elif name == "dependency":
+      print "Loading stanford dependency parse info to utt..."
+      utterance_load.load_stanford_dependency_parse(self, inputs[0])
+    elif name == "festival":
+      if not inputs[0]:
+        pos.simple_festival_pos_predict(self)
+      prosody.simple_festival_accent_predict(self)
+    del self.layer_inputs[name]
+    self.loaded_layers.append(name)
+    self.layer_costs[name] = time.time() - start
+
+  #The phoneme features are shared by all utts and not pickled with them.
+  #They must be set again on an unpickled utt, see utterance_cache.
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state["phoneme_features"]
+    return state
+
+  #Stores the position of each segment in its parent segments.
+  #The pos_in_* methods rely on these so this must be called whenever
+  #the segment lists are changed directly, e.g. when splitting words.
+  def update_positions(self):
+    for i, word in enumerate(self.words):
+      word.utt_pos = i
+      for j, syll in enumerate(word.syllables):
+        syll.word_pos = j
+      for j, phoneme in enumerate(word.phonemes):
+        phoneme.word_pos = j
+    for i, syll in enumerate(self.syllables):
+      syll.utt_pos = i
+      for j, phoneme in enumerate(syll.phonemes):
+        phoneme.syll_pos = j
+    for i, phoneme in enumerate(self.phonemes):
+      phoneme.utt_pos = i
+    #The neighbours may have changed as well.
+    self.phoneme_neighbours = None
+    self.syllable_neighbours = None
+    self.accent_neighbours = None
+
+  #Returns a list with a (llp, lp, rp, rrp) tuple of the ids of the neighbouring
+  #phonemes of each phoneme in the utt. "xx" is used past the utt edges.
+  #This is computed once and kept until update_positions is called.
+  def get_phoneme_neighbours(self):
+    if self.phoneme_neighbours == None:
+      ids = ["xx", "xx"] + [p.id for p in self.phonemes] + ["xx", "xx"]
+      self.phoneme_neighbours = [(ids[i-2], ids[i-1], ids[i+1], ids[i+2]) for i in xrange(2, len(ids) - 2)]
+    return self.phoneme_neighbours
+
+  #Returns a list with a (lss, rss, snss, spss, lsnp, rsnp) tuple of context strings for each
+  #syllable in the utt. I.e. the stress and number of phonemes of the left and right syllables
+  #and the number of syllables to the next and from the previous stressed syllable.
+  #A syllable counts as stressed if its stress is not "xx" or 0 and the first syllable is
+  #never counted as a previous stressed syllable.
+  #This is computed once and kept until update_positions is called.
+  def get_syllable_neighbours(self):
+    if self.syllable_neighbours == None:
+      n = len(self.syllables)
+      stress = [str(s.stress) for s in self.syllables]
+      size = [str(len(s.phonemes)) for s in self.syllables]
+      stressed = [s.stress not in ["xx", 0] for s in self.syllables]
+      #Syllables to next stressed syllable
+      snss = ["xx"]*n
+      nxt = None
+      for i in xrange(n-1, -1, -1):
+        if nxt != None:
+          snss[i] = str(nxt - i)
+        if stressed[i]:
+          nxt = i
+      #Syllables from previous stressed syllable
+      spss = ["xx"]*n
+      prev = None
+      for i in xrange(n):
+        if prev != None:
+          spss[i] = str(i - prev)
+        if stressed[i] and i > 0:
+          prev = i
+      stress = ["xx"] + stress + ["xx"]
+      size = ["xx"] + size + ["xx"]
+      self.syllable_neighbours = [(stress[i], stress[i+2], snss[i], spss[i], size[i], size[i+2]) for i in xrange(n)]
+    return self.syllable_neighbours
+
+  #Returns a list with a (nasbcs, nasacs, pasd, nasd) tuple for each syllable in the utt.
+  #I.e. the number of accented syllables before and after it and the distance to
+  #the previous and next accented syllable ("xx" if there is none).
+  #Accents must have been added to the syllables first, see prosody.simple_festival_accent_predict.
+  #This is computed once and kept until update_positions is called.
+  def get_accent_neighbours(self):
+    if self.accent_neighbours == None:
+      n = len(self.syllables)
+      accented = [s.accent == 1 for s in self.syllables]
+      #Accented syllables before and distance to the previous one
+      before = [0]*n
+      prev_dist = ["xx"]*n
+      count = 0
+      prev = None
+      for i in xrange(n):
+        before[i] = count
+        if prev != None:
+          prev_dist[i] = i - prev
+        if accented[i]:
+          count += 1
+          prev = i
+      #Accented syllables after and distance to the next one
+      after = [0]*n
+      next_dist = ["xx"]*n
+      count = 0
+      nxt = None
+      for i in xrange(n-1, -1, -1):
+        after[i] = count
+        if nxt != None:
+          next_dist[i] = nxt - i
+        if accented[i]:
+          count += 1
+          nxt = i
+      self.accent_neighbours = zip(before, after, prev_dist, next_dist)
+    return self.accent_neighbours
+
   def num_phonemes(self):
     return len(self.phonemes)
 
@@ -198,44 +335,31 @@ class Utterance(object):
     #   print "Number of emphasised words is:", num
       return num
 
-class Phoneme:
+#Phonemes, syllables and words use slots to keep them small and only refer to
+#their parents weakly so an utterance is freed as soon as it is no longer used.
+#The utterance keeps all its segments alive through its lists of them.
+class Phoneme(object):
   """A class representing a phoneme."""
+  __slots__ = ("id", "start", "end", "stress", "states", "f0",
+               "syll_pos", "word_pos", "utt_pos",
+               "_parent_syllable", "_parent_word", "_parent_utt", "__weakref__")
+  parent_syllable = weak_property("_parent_syllable")
+  parent_word = weak_property("_parent_word")
+  parent_utt = weak_property("_parent_utt")
+  __getstate__ = get_slots_state
+  __setstate__ = set_slots_state
+
   def __init__(self, p_id=None):
     self.id = p_id
 
-  def load_from_proto(self, proto_phone, p_syll_pos, p_utt_pos, p_word_pos, syll, word, utt):
-    self.id = proto_phone["id"]
-    self.start = proto_phone["start"]
-    self.end = proto_phone["end"]
-    self.stress = proto_phone["stress"]
-    #These work because they are objects and are so passed by reference value.
-    #I.e. a copy of the reference to the object is what is stored not the full object.
-    self.parent_syllable = syll
-    self.parent_word = word
-    self.parent_utt = utt
-    if "states" in proto_phone:
-      self.states = proto_phone["states"]
-
-  #These are expensive operations I think.
-  #But necessary to keep things properly dynamic and has lots of benefits further on
-  #when merging parses into utterances.
   def pos_in_syllable(self):
-    for i, p in enumerate(self.parent_syllable.phonemes):
-      if p == self:
-        return i
-    raise SiReError("Cannot find self {0} in syll {1}!".format(self.id, self.parent_syllable.id))
+    return self.syll_pos
 
   def pos_in_word(self):
-    for i, p in enumerate(self.parent_word.phonemes):
-      if p == self:
-        return i
-    raise SiReError("Cannot find phoneme {0} in word {1}!".format(self.id, self.parent_word.id))
+    return self.word_pos
 
   def pos_in_utt(self):
-    for i, p in enumerate(self.parent_utt.phonemes):
-      if p == self:
-        return i
-    raise SiReError("Cannot find phoneme {0} in utt {1}!".format(self.id, self.parent_utt.id))
+    return self.utt_pos
 
   def get_feats(self):
     return self.parent_utt.phoneme_features.get_phoneme_feats(self.id)
@@ -279,56 +403,26 @@ class Phoneme:
   def get_duration(self):
     return int(self.end)-int(self.start)
 
-class Syllable:
+class Syllable(object):
   """A class representing a syllable."""
+  __slots__ = ("id", "stress", "vowel_id", "phonemes", "accent", "start", "end",
+               "word_pos", "utt_pos",
+               "_parent_word", "_parent_utt", "__weakref__")
+  parent_word = weak_property("_parent_word")
+  parent_utt = weak_property("_parent_utt")
+  __getstate__ = get_slots_state
+  __setstate__ = set_slots_state
 
   #An empty syll.
   #Using this can be dangerous if you don't add everything necesary later.
   def __init__(self, s_id=None):
     self.id = None
 
-  def load_from_proto(self, proto_syll, current_phoneme_utt_pos, s_word_pos, s_utt_pos, word, utt):
-    self.id = proto_syll["id"]
-    self.stress = proto_syll["stress"]
-    #These work because they are objects and are so passed by reference value.
-    #I.e. a copy of the reference to the object is what is stored not the full object.
-    self.parent_word = word
-    self.parent_utt = utt
-    #We initially save the utt pos of each phoneme in the syll
-    #instead of direct references because of the order we create these.
-    #These are later added and this list removed.
-    self.child_phoneme_utt_positions = []
-    for i in range(len(proto_syll["phonemes"])):
-      self.child_phoneme_utt_positions.append(i+current_phoneme_utt_pos)
-    #This will be filled later
-    self.phonemes = None
-    self.vowel_id = self.find_vowel(proto_syll, utt.phoneme_features)
-
-  #This works because we are passing by reference value.
-  def add_phonemes(self):
-    self.phonemes = []
-    for i in self.child_phoneme_utt_positions:
-      self.phonemes.append(self.parent_utt.phonemes[i])
-    del self.child_phoneme_utt_positions
-
-  #If a syllable contains more than one vowel this return the first one.
-  def find_vowel(self, proto_syll, phoneme_features):
-    for p in proto_syll["phonemes"]:
-      if phoneme_features.is_vowel(p["id"]):
-        return p["id"]
-    return "novowel"
-
   def pos_in_word(self):
-    for i, p in enumerate(self.parent_word.syllables):
-      if p == self:
-        return i
-    raise SiReError("Cannot find syllable {0} in word {1}!".format(self.id, self.parent_word.id))
+    return self.word_pos
 
   def pos_in_utt(self):
-    for i, p in enumerate(self.parent_utt.syllables):
-      if p == self:
-        return i
-    raise SiReError("Cannot find syllable {0} in utt {1}!".format(self.id, self.parent_utt.id))
+    return self.utt_pos
 
   def num_phonemes(self):
     return len(self.phonemes)
@@ -361,54 +455,23 @@ class Syllable:
       return self.parent_utt.syllables[pos+1]
 
 
-class Word:
+class Word(object):
   """A classs representing a word."""
+  __slots__ = ("id", "pos", "syllables", "phonemes", "start", "end", "utt_pos",
+               "parent_phrase", "grandparent_phrase", "greatgrandparent_phrase",
+               "parent_dependency", "grandparent_dependency", "greatgrandparent_dependency",
+               "_parent_utt", "__weakref__")
+  parent_utt = weak_property("_parent_utt")
+  __getstate__ = get_slots_state
+  __setstate__ = set_slots_state
 
   #An empty word with only a name.
   #This can go wrong if you don't add everything needed later.
   def __init__(self):
     self.id = None
 
-  def load_from_proto(self, proto_word, word_utt_pos, current_phoneme_utt_pos, current_syll_utt_pos, proto_utt_len, utt):
-    self.id = proto_word["id"]
-    self.parent_utt = utt
-    #We initially save the utt pos of each syllable and phoneme in the word
-    #instead of direct references because for the order we create these.
-    #These can later be added, but should not be necessary
-    #as each phoneme and syll already nows its parent word.
-    self.child_syllable_utt_positions = []
-    for i in range(len(proto_word["syllables"])):
-      self.child_syllable_utt_positions.append(i+current_syll_utt_pos)
-    self.phonemes = None
-    self.child_phoneme_utt_positions = []
-    tmp = 0
-    for s in proto_word["syllables"]:
-      tmp += len(s["phonemes"])
-    for i in range(tmp):
-      self.child_phoneme_utt_positions.append(i+current_phoneme_utt_pos)
-    self.syllables = None
-
-    # print proto_word["id"]
-
-  #This works because we are passing by reference value.
-  def add_syllables(self):
-    self.syllables = []
-    for i in self.child_syllable_utt_positions:
-      self.syllables.append(self.parent_utt.syllables[i])
-    del self.child_syllable_utt_positions
-
-  #This works because we are passing by reference value.
-  def add_phonemes(self):
-    self.phonemes = []
-    for i in self.child_phoneme_utt_positions:
-      self.phonemes.append(self.parent_utt.phonemes[i])
-    del self.child_phoneme_utt_positions
-
   def pos_in_utt(self):
-    for i, p in enumerate(self.parent_utt.words):
-      if p == self:
-        return i
-    raise SiReError("Cannot find word {0} in utt {1}!".format(self.id, self.parent_utt.id))
+    return self.utt_pos
 
   def num_syllables(self):
     return len(self.syllables)
@@ -489,3 +552,134 @@ class Word:
                  return "xx"
              else:
                  return num
+
+#The builders are fed an utterance segment by segment by the loaders in utterance_load.
+#A loader calls set_id once and then for each word start_word, for each syllable in it
+#start_syllable, add_phoneme for each phoneme in that, end_syllable and finally end_word.
+#If no id is given to end_syllable or end_word it is made from the ids of its contents.
+class UtteranceBuilder(object):
+  """Builds the phonemes, syllables and words of an Utterance."""
+
+  def __init__(self, utt):
+    self.utt = utt
+    self.word = None
+    self.syll = None
+
+  def set_id(self, utt_id):
+    self.utt.id = utt_id
+
+  def start_word(self):
+    word = Word()
+    word.parent_utt = self.utt
+    word.utt_pos = len(self.utt.words)
+    word.syllables = []
+    word.phonemes = []
+    self.utt.words.append(word)
+    self.word = word
+
+  def start_syllable(self, stress):
+    syll = Syllable()
+    syll.stress = stress
+    syll.parent_word = self.word
+    syll.parent_utt = self.utt
+    syll.word_pos = len(self.word.syllables)
+    syll.utt_pos = len(self.utt.syllables)
+    syll.phonemes = []
+    self.utt.syllables.append(syll)
+    self.word.syllables.append(syll)
+    self.syll = syll
+
+  #Start and end are HTK style times where 10000 is 1ms.
+  #Stress may be None if we do not have the information.
+  #States are only given for state aligned input.
+  def add_phoneme(self, p_id, start, end, stress, states=None):
+    phoneme = Phoneme(p_id)
+    phoneme.start = start
+    phoneme.end = end
+    phoneme.stress = stress
+    if states != None:
+      phoneme.states = states
+    phoneme.parent_syllable = self.syll
+    phoneme.parent_word = self.word
+    phoneme.parent_utt = self.utt
+    phoneme.syll_pos = len(self.syll.phonemes)
+    phoneme.word_pos = len(self.word.phonemes)
+    phoneme.utt_pos = len(self.utt.phonemes)
+    self.utt.phonemes.append(phoneme)
+    self.word.phonemes.append(phoneme)
+    self.syll.phonemes.append(phoneme)
+
+  def end_syllable(self, s_id=None):
+    syll = self.syll
+    if s_id == None:
+      s_id = "".join([p.id for p in syll.phonemes])
+    syll.id = s_id
+    #If a syllable contains more than one vowel this is the first one.
+    syll.vowel_id = "novowel"
+    for p in syll.phonemes:
+      if self.utt.phoneme_features.is_vowel(p.id):
+        syll.vowel_id = p.id
+        break
+    return s_id
+
+  def end_word(self, w_id=None):
+    if w_id == None:
+      w_id = "".join([s.id for s in self.word.syllables])
+    self.word.id = w_id
+    return w_id
+
+#Builds a proto utt instead of an Utterance.
+#The proto utterance follows the following conventions:
+#It is a dictionary with two keys, id giving the name of the utt,
+#and utt containing the actual utt.
+#Utt is itself a list of proto_words.
+#A proto_word is a dict containing two keys, id giving the name of the word,
+#and syllables.
+#Syllables is itself a list of proto_syllables.
+#A proto_syllable is a dict containing three keys, id giving the name of the syllable,
+#stress giving its stress value and phonemes.
+#The id of a syllable is expected to be the id of all its contained
+#phonemes in order as a string.
+#Phonemes is itself a list of proto_phonemes.
+#A proto_phoneme is a dict containing 4 keys.
+#Id being the type of phoneme, must be a valid phoneme in phoneme set used.
+#Start - the start time in HTK style values where 10000 is 1ms.
+#End - the end time in HTK style values where 10000 is 1 ms.
+#Stress - the stress value of the phoneme - this may be None in case we do not have the information.
+#State aligned phonemes also contain states.
+class ProtoBuilder(object):
+  """Builds a proto utt."""
+
+  def __init__(self):
+    self.proto = {"id":None, "utt":[]}
+    self.word = None
+    self.syll = None
+
+  def set_id(self, utt_id):
+    self.proto["id"] = utt_id
+
+  def start_word(self):
+    self.word = {"id":"", "syllables":[]}
+    self.proto["utt"].append(self.word)
+
+  def start_syllable(self, stress):
+    self.syll = {"id":"", "stress":stress, "phonemes":[]}
+    self.word["syllables"].append(self.syll)
+
+  def add_phoneme(self, p_id, start, end, stress, states=None):
+    phoneme = {"id":p_id, "stress":stress, "start":start, "end":end}
+    if states != None:
+      phoneme["states"] = states
+    self.syll["phonemes"].append(phoneme)
+
+  def end_syllable(self, s_id=None):
+    if s_id == None:
+      s_id = "".join([p["id"] for p in self.syll["phonemes"]])
+    self.syll["id"] = s_id
+    return s_id
+
+  def end_word(self, w_id=None):
+    if w_id == None:
+      w_id = "".join([s["id"] for s in self.word["syllables"]])
+    self.word["id"] = w_id
+    return w_id
@@ -0,0 +1,168 @@
+##########################################################################
+#Copyright 2016 Rasmus Dall                                              #
+#                                                                        #
+#Licensed under the Apache License, Version 2.0 (the "License");         #
+#you may not use this file except in compliance with the License.        #
+#You may obtain a copy of the License at                                 #
+#                                                                        #
+#http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                        #
+#Unless required by applicable law or agreed to in writing, software     #
+#distributed under the License is distributed on an "AS IS" BASIS,       #
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.#
+#See the License for the specific language governing permissions and     #
+#limitations under the License.                                          #
+##########################################################################
+
+#An on disk cache of built utterances.
+#Building an utterance with parses and festival features is the slow part of
+#making labels, but the utterance does not depend on e.g. the context_type or
+#the question type. So when making several label sets from the same data the
+#utterances can be stored once and loaded again in later runs.
+#Each utterance is stored in its own zlib compressed pickle file named by a hash of
+#everything it was built from, i.e. the lab, txt, parses, dictionary and the args
+#affecting how it is built. If any of these change the utt is simply built again.
+#The cache is kept below a maximum size by removing the least recently used files.
+
+import os, hashlib, zlib, cPickle
+import utterance
+
+#Change this if the stored utterances change so old cache files are not used.
+CACHE_VERSION = "3"
+
+#The args which change how an utterance is built.
+BUILD_ARGS = ["intype", "state_level", "festival_features", "emphasis", "stanford_pcfg_parse",
+              "stanford_dependency_parse", "comma_is_pause", "general_sil_phoneme",
+              "pron_reduced", "reduction_level", "phoneset"]
+
+class UtteranceCache(object):
+  """A size bounded on disk cache of utterances."""
+
+  #Max_size is in MB.
+  def __init__(self, cachedir, max_size=1024):
+    if not os.path.isdir(cachedir):
+      os.makedirs(cachedir)
+    self.cachedir = cachedir
+    self.max_size = max_size * 1024 * 1024
+    #Hashes of files which are the same for all utts, e.g. the dictionary.
+    self.file_hashes = {}
+    self.size = None
+    self.hits = 0
+    self.misses = 0
+
+  #Returns the utt for lab, loaded from the cache if it is there and built and stored if not.
+  def get_utterance(self, lab, args):
+    #The key must be made first as building the utt changes lab.
+    key = self.make_key(lab, args)
+    utt = self.load(key, args)
+    if utt == None:
+      self.misses += 1
+      utt = utterance.Utterance(lab, args)
+      #The layers are the slow part so they are stored as well.
+      utt.load_layers()
+      self.store(key, utt)
+    else:
+      self.hits += 1
+    return utt
+
+  #Makes the hash key of the utt built from lab with args.
+  def make_key(self, lab, args):
+    h = hashlib.sha1(CACHE_VERSION)
+    h.update(repr(lab))
+    for arg in BUILD_ARGS:
+      h.update(arg+"="+repr(getattr(args, arg, None)))
+    #How a SiRe lab is read depends on how it was made.
+    if args.intype == "sire_lab":
+      h.update(repr((args.context_type, args.HHEd_fix)))
+    utt_id = os.path.basename(lab[0])
+    #The txt is used if it is not the input itself.
+    if args.intype != "txt" and (args.festival_features or args.stanford_pcfg_parse or args.stanford_dependency_parse):
+      if getattr(args, "txtdict", None) != None:
+        h.update(hashlib.sha1(args.txtdict[utt_id]).hexdigest())
+      else:
+        h.update(self.hash_file(os.path.join(args.txtdir, utt_id+".txt"), False))
+    if args.stanford_pcfg_parse:
+      h.update(repr(args.pcfgdict[utt_id]))
+    if args.stanford_dependency_parse:
+      h.update(repr(args.dependencydict[utt_id]))
+    if getattr(args, "dict", None) != None:
+      h.update(self.hash_file(args.dict[1]))
+    if args.pron_reduced:
+      h.update(self.hash_file(os.path.join(args.lm_score_dir, utt_id+".scored"), False))
+    return h.hexdigest()
+
+  #Returns the hash of the contents of a file.
+  #If remember is True the hash is only computed once per run.
+  def hash_file(self, path, remember=True):
+    if remember and path in self.file_hashes:
+      return self.file_hashes[path]
+    h = hashlib.sha1()
+    f = open(path, "rb")
+    chunk = f.read(1048576)
+    while chunk:
+      h.update(chunk)
+      chunk = f.read(1048576)
+    f.close()
+    if remember:
+      self.file_hashes[path] = h.hexdigest()
+    return h.hexdigest()
+
+  def get_path(self, key):
+    return os.path.join(self.cachedir, key+".utt")
+
+  #Returns the cached utt or None if it is not cached.
+  def load(self, key, args):
+    path = self.get_path(key)
+    if not os.path.isfile(path):
+      return None
+    try:
+      f = open(path, "rb")
+      utt = cPickle.loads(zlib.decompress(f.read()))
+      f.close()
+    except (IOError, EOFError, zlib.error, cPickle.UnpicklingError):
+      print "Warning! Could not read cached utt {0}, building it again.".format(path)
+      return None
+    utt.phoneme_features = utterance.get_phoneme_features(args)
+    #Mark the file as recently used.
+    os.utime(path, None)
+    return utt
+
+  def store(self, key, utt):
+    data = zlib.compress(cPickle.dumps(utt, 2))
+    path = self.get_path(key)
+    #Write to a temporary file first so a half written file is never read.
+    tmp = path+".tmp"
+    f = open(tmp, "wb")
+    f.write(data)
+    f.close()
+    os.rename(tmp, path)
+    if self.size == None:
+      self.size = self.get_size()
+    self.size += len(data)
+    if self.size > self.max_size:
+      self.evict()
+
+  #Returns the total size of the cached utts.
+  def get_size(self):
+    size = 0
+    for f in os.listdir(self.cachedir):
+      if f.endswith(".utt"):
+        size += os.path.getsize(os.path.join(self.cachedir, f))
+    return size
+
+  #Removes the least recently used utts until the cache is at most 90% of its max size.
+  def evict(self):
+    files = []
+    for f in os.listdir(self.cachedir):
+      if f.endswith(".utt"):
+        path = os.path.join(self.cachedir, f)
+        st = os.stat(path)
+        files.append((st.st_mtime, st.st_size, path))
+    files.sort()
+    size = sum([x[1] for x in files])
+    for mtime, fsize, path in files:
+      if size <= self.max_size * 0.9:
+        break
+      os.remove(path)
+      size -= fsize
+    self.size = size
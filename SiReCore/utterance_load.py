@@ -15,11 +15,13 @@
 ##########################################################################
 
 #Methods for loading utterances
+#Each input type has a build_from_* method feeding it to a builder (see utterance.UtteranceBuilder)
+#and a proto_from_* method returning it as a proto utt (see utterance.ProtoBuilder).
 import utterance, utterance_utils, phoneme_features, parsetrees, os, dictionary
 from error_messages import SiReError
 import re
 
-#Create a prototype utterance from a lab from an aligned mlf.
+#Builds an utterance from a lab from an aligned mlf.
 #Note this assumes the following:
 #1. Stops are split into closure and release.
 #   The closure is written as [stop]_cl and the release just as the stop.
@@ -37,21 +39,17 @@ import re
 #   [1] is the phoneme end time in HTK format where 10000 is 1ms.
 #   [-1] is the phoneme id.
 #   Anything in between is ignored.
-def proto_from_align_lab(lab):
-  proto = {}
-  proto["id"] = lab[0]
+def build_from_align_lab(builder, lab):
+  builder.set_id(lab[0])
   lab.pop(0)
-  #We make a temporary utterance bottom up starting with
-  #reforming phonemes split for alignment.
-  proto["utt"] = remake_stops(lab)
-  #Then make the phonemes with stress, start, end times.
-  proto["utt"] = make_phonemes(proto["utt"])
-  #Then syllables with start end times and stress.
-  proto["utt"] = make_sylls(proto["utt"])
-  #Then words with start and end times.
-  proto["utt"] = make_words(proto["utt"])
-
-  return proto
+  #We reform phonemes split for alignment and then build the
+  #syllables and words with their stress and times.
+  build_align_words(builder, align_phonemes(remake_stops(lab)), lab)
+
+def proto_from_align_lab(lab):
+  builder = utterance.ProtoBuilder()
+  build_from_align_lab(builder, lab)
+  return builder.proto
 
 #This makes some assumptions about the lab format which is sampled below:
 #0 50000 s2 -78.739014 # -2090.613281 #
@@ -72,241 +70,171 @@ def proto_from_align_lab(lab):
 #StateStart StateEnd State6 Prob
 #StateStart StateEnd State2 Prob Phone2 Prob Phone2
 #Etc.
-def proto_from_state_align_lab(lab):
-  proto = {}
-  proto["id"] = lab[0]
+def build_from_state_align_lab(builder, lab):
+  builder.set_id(lab[0])
   lab.pop(0)
-  #We make a temporary utterance bottom up
-  ###Note this is currently not done as it creates complications
+  ###Note stops are currently not reformed as it creates complications
   ###With the timings of each state. (phones tend not to be split in this case)
-  #Then reforming phonemes split for alignment.
-  #proto["utt"] = remake_stops(lab)
-  #Then make the phonemes with stress, start, end times and state information.
-  stress = 0
-  for i, p in enumerate(lab):
-    if p[0][-1] == "#1":
-      stress = 1
-      lab[i] = "out"
-    elif p[0][-1] == "#2":
-      stress = 2
-      lab[i] = "out"
-    else:
-      lab[i] = {"stress":stress, "id":lab[i][0][-1], "start":int(lab[i][0][0]), "end":int(lab[i][-1][1]), "states":lab[i]}
-      stress = 0
-  while "out" in lab:
-    lab.remove("out")
-  proto["utt"] = lab
-  #Then syllables with start end times and stress.
-  proto["utt"] = make_sylls(proto["utt"])
-  #Then words with start and end times.
-  proto["utt"] = make_words(proto["utt"])
+  build_align_words(builder, state_align_phonemes(lab), lab)
 
-  return proto
+def proto_from_state_align_lab(lab):
+  builder = utterance.ProtoBuilder()
+  build_from_state_align_lab(builder, lab)
+  return builder.proto
 
-#Create a prototype utterance from a SiRe label which has had at least the basic set of features added.
+#Returns the value of context name in the context string of a SiRe label line.
+def get_sire_lab_value(context_string, name):
+  return context_string.split("|"+name+":")[1].split("|")[0]
+
+#Builds an utterance from a SiRe label which has had at least the basic set of features added.
+#The last item of each line is either the context string or a dict of the value of each
+#context as read from a binary label (see binary_labels).
 #Note that this will not load e.g. parsing information. Only the basic set is loaded from this and everything else must be added later!
 #TODO - support the loading of other features, e.g. parsing from these labels.
-def proto_from_sire_lab(lab, context_type, HHEd_fix):
-  proto = {"utt":[]}
-  proto["id"] = lab[0]
+def build_from_sire_lab(builder, lab, context_type, HHEd_fix):
+  builder.set_id(lab[0])
   lab.pop(0)
-  c_word = {"id":"", "syllables":[]}
-  c_syll = {"id":"", "phonemes":[], "stress":None}
+  n_sylls = 0
   for i, line in enumerate(lab):
-    c_phon = {"id":None, "stress":None, "start":None, "end":None}
+    if isinstance(line[-1], dict):
+      get = line[-1].__getitem__
+    else:
+      get = lambda name, context_string=line[-1]: get_sire_lab_value(context_string, name)
     # Create phonemes
+    p_id = get("cp")
+    #With HHEd_fix the current phoneme is written as -phoneme+
     if HHEd_fix == True:
-      c_phon["id"] = line[-1].split("|cp:-")[1].split("+|rp:")[0]
-    else:
-      c_phon["id"] = line[-1].split("|cp:")[1].split("|rp:")[0]
-    c_phon["start"] = line[0]
-    c_phon["end"] = line[1]
-    # SiRe labs do not currently contain stress information at the phoneme level as a standard
-    # This could have been added if an alignment MLF containing this info was used originially
-    c_phon["stress"] = None
-    # Add phonemes to syll
+      p_id = p_id[1:-1]
     # If phonemes is beginning of syll prev syll is done
     #This depends on what type of positional context was used to create the labels
     beg_syll = False
     if context_type == "absolute":
-      if line[-1].split("|pfwsp:")[1].split("|")[0] in ["0"]:
+      if get("pfwsp") in ["0"]:
         beg_syll = True
     elif context_type == "relational":
       #0 should be used for silence positions in the relational case, with "100" for normal things
-      if line[-1].split("|pfwsp:")[1].split("|")[0] in ["0", "100"]:
+      if get("pfwsp") in ["0", "100"]:
         beg_syll = True
     elif context_type == "categorical":
-      if line[-1].split("|cpsp:")[1].split("|")[0] in ["xx", "beg", "one"]:
+      if get("cpsp") in ["xx", "beg", "one"]:
         beg_syll = True
     else:
       raise SiReError("Unsupported context_type {0}!".format(context_type))
+    # If new syll is beginning of word, prev word is done
+    beg_word = False
+    stress = None
     if beg_syll == True:
-      for p in c_syll["phonemes"]:
-        c_syll["id"] += p["id"]
-      # Add syll to word
-      c_word["syllables"].append(c_syll)
-      # If new syll is beginning of word, prev word is done
-      #This depends on what type of positional context was used to create the labels
-      beg_word = False
       if context_type == "absolute":
-        if line[-1].split("|pfwwp:")[1].split("|")[0] in ["0"]:
+        if get("pfwwp") in ["0"]:
           beg_word = True
       elif context_type == "relational":
         #0 should be used for silence positions in the relational case, with "100" for normal things
-        if line[-1].split("|pfwwp:")[1].split("|")[0] in ["0", "100"]:
+        if get("pfwwp") in ["0", "100"]:
           beg_word = True
       elif context_type == "categorical":
-        if line[-1].split("|cpwp:")[1].split("|")[0] in ["xx", "beg", "one"]:
+        if get("cpwp") in ["xx", "beg", "one"]:
           beg_word = True
-      else:
-        raise SiReError("Unsupported context_type {0}!".format(context_type))
-      if beg_word == True:
-        for s in c_word["syllables"]:
-          c_word["id"] += s["id"]
-        proto["utt"].append(c_word)
-        c_word = {"id":"", "syllables":[]}
-      c_syll = {"id":"", "phonemes":[c_phon], "stress":line[-1].split("|css:")[1].split("|")[0]}
-    else:
-      c_syll["phonemes"].append(c_phon)
-    # If this is the last phoneme we are done
-    if i == len(lab) - 1:
-      for p in c_syll["phonemes"]:
-        c_syll["id"] += p["id"]
-      c_word["syllables"].append(c_syll)
-      for s in c_word["syllables"]:
-          c_word["id"] += c_syll["id"]
-      proto["utt"].append(c_word)
-  # The first is empty so we can pop
-  proto["utt"].pop(0)
-  return proto
+      stress = get("css")
+    # SiRe labs do not currently contain stress information at the phoneme level as a standard
+    # This could have been added if an alignment MLF containing this info was used originially
+    n_sylls = build_lab_phoneme(builder, i == 0, i == len(lab) - 1, n_sylls, p_id, line[0], line[1], None, beg_syll, beg_word, stress)
 
-def proto_from_hts_lab(lab, state):
-  proto = {"utt":[]}
-  proto["id"] = lab[0]
-  lab.pop(0)
-  # Create split lib
+def proto_from_sire_lab(lab, context_type, HHEd_fix):
+  builder = utterance.ProtoBuilder()
+  build_from_sire_lab(builder, lab, context_type, HHEd_fix)
+  return builder.proto
 
-  if state:
+#The delimiters of the contexts of HTS labels, see split_hts_lab.
+HTS_DELIMS = ("~","-","+","=",":","_","/A/","_","_","/B/","-","-",":","-","&","-","#","-","$","-",">","-","<","-","|","/C/","+","+","/D/","_","/E/","+",":","+","&","+","#","+","/F/","_","/G/","_","/H/","~",":","=","&","/I/","_","/J/","+","-")
+#The delimiters of state level HTS labels, e.g. VCTK.
+HTS_STATE_DELIMS = ("^","-","+","=","@","_","/A:","_","_","/B:","-","-","@","-","&","-","#","-","$","-","!","-",";","-","|","/C:","+","+","/D:","_","/E:","+","@","+","&","+","#","+","/F:","_","/G:","_","/H:","=","@","=","|","/I:","=","/J:","+","-","[","]")
 
-      delims = ["^","-","+","=","@","_","/A:","_","_","/B:","-","-","@","-","&","-","#","-","$","-","!","-",";","-","|","/C:","+","+","/D:","_","/E:","+","@","+","&","+","#","+","/F:","_","/G:","_","/H:","=","@","=","|","/I:","=","/J:","+","-","[","]"]
+def build_from_hts_lab(builder, lab, state):
+  builder.set_id(lab[0])
+  lab.pop(0)
+  n_sylls = 0
 
-      c_syll = {"id":"", "phonemes":[], "stress":None}
-      c_word = {"id":"", "syllables":[]}
+  if state:
 
       state_count = 0
+      n_phons = 0
 
       for i, line in enumerate(lab):
 
-        line[-1] = split_hts_lab(line[-1], delims)
-        line[-1].pop(53)
-        line[-1].pop(54)
         if state_count == 0:
-            c_phon = {"id":None, "stress":None, "start":None, "end":None, "states":{}}
-            c_phon["start"] = line[0]
-        c_phon["id"] = line[-1][2]
-        # VCTK HTS labs do not contain stress information at the phoneme level
-        c_phon["stress"] = None
-        c_phon["states"][state_count] = [line[0], line[1]]
+            states = {}
+            start = line[0]
+        states[state_count] = [line[0], line[1]]
 
         if state_count < 4:
             state_count += 1
         else:
             state_count = 0
-            c_phon["end"] = line[1]
-            # Add phonemes to syll
+            #All five states of a phoneme have the same contexts so only the last is split.
+            line[-1] = split_hts_lab(line[-1], HTS_STATE_DELIMS)
+            # VCTK HTS labs do not contain stress information at the phoneme level
             # If phonemes is beginning of syll prev syll is done
-            if line[-1][5] in ["xx", "1"]:
-              for p in c_syll["phonemes"]:
-                # print "Earlier P", p
-                c_syll["id"] += p["id"]
-
-              # Add syll to word
-              c_word["syllables"].append(c_syll)
-              # If new syll is beginning of word, prev word is done
-              if line[-1][13] in ["xx", "1"]:
-                for s in c_word["syllables"]:
-                  c_word["id"] += s["id"]
-                #   print "New S", s
-                proto["utt"].append(c_word)
-                c_word = {"id":"", "syllables":[]}
-              c_syll = {"id":"", "phonemes":[c_phon], "stress":line[-1][10]}
-            else:
-              c_syll["phonemes"].append(c_phon)
-            # If this is the last phoneme we are done
-            # print "This is I", i
-            if i == len(lab) - 1:
-              for p in c_syll["phonemes"]:
-                c_syll["id"] += p["id"]
-              c_word["syllables"].append(c_syll)
-              for s in c_word["syllables"]:
-                  c_word["id"] += c_syll["id"]
-              proto["utt"].append(c_word)
-            #   print "C_Word", c_word["id"]
-      # The first is empty so we can pop
-      proto["utt"].pop(0)
-
-      return proto
+            # If new syll is beginning of word, prev word is done
+            beg_syll = line[-1][5] in ["xx", "1"]
+            beg_word = beg_syll and line[-1][13] in ["xx", "1"]
+            n_sylls = build_lab_phoneme(builder, n_phons == 0, i == len(lab) - 1, n_sylls, line[-1][2], start, line[1], None, beg_syll, beg_word, line[-1][10], states)
+            n_phons += 1
   else:
-      delims = ["~","-","+","=",":","_","/A/","_","_","/B/","-","-",":","-","&","-","#","-","$","-",">","-","<","-","|","/C/","+","+","/D/","_","/E/","+",":","+","&","+","#","+","/F/","_","/G/","_","/H/","~",":","=","&","/I/","_","/J/","+","-"]
       for i, line in enumerate(lab):
-        c_phon = {"id":None, "stress":None, "start":None, "end":None}
-        line[-1] = split_hts_lab(line[-1], delims)
-        # Create phonemes
-        c_phon["id"] = line[-1][2]
-        c_phon["start"] = line[0]
-        c_phon["end"] = line[1]
+        line[-1] = split_hts_lab(line[-1], HTS_DELIMS)
         # VCTK HTS labs do not contain stress information at the phoneme level
-        c_phon["stress"] = None
-        # Add phonemes to syll
         # If phonemes is beginning of syll prev syll is done
-        if line[-1][5] in ["xx", "1"]:
-          for p in c_syll["phonemes"]:
-            c_syll["id"] += p["id"]
-          # Add syll to word
-          c_word["syllables"].append(c_syll)
-          # If new syll is beginning of word, prev word is done
-          if line[-1][13] in ["xx", "1"]:
-            for s in c_word["syllables"]:
-              c_word["id"] += s["id"]
-            proto["utt"].append(c_word)
-            c_word = {"id":"", "syllables":[]}
-          c_syll = {"id":"", "phonemes":[c_phon], "stress":line[-1][10]}
-        else:
-          c_syll["phonemes"].append(c_phon)
-        # If this is the last phoneme we are done
-        if i == len(lab) - 1:
-          for p in c_syll["phonemes"]:
-            c_syll["id"] += p["id"]
-          c_word["syllables"].append(c_syll)
-          for s in c_word["syllables"]:
-              c_word["id"] += c_syll["id"]
-          proto["utt"].append(c_word)
-      # The first is empty so we can pop
-      proto["utt"].pop(0)
-      return proto
-
-
-#Create a proto utterance from text.
+        # If new syll is beginning of word, prev word is done
+        beg_syll = line[-1][5] in ["xx", "1"]
+        beg_word = beg_syll and line[-1][13] in ["xx", "1"]
+        n_sylls = build_lab_phoneme(builder, i == 0, i == len(lab) - 1, n_sylls, line[-1][2], line[0], line[1], None, beg_syll, beg_word, line[-1][10])
+
+def proto_from_hts_lab(lab, state):
+  builder = utterance.ProtoBuilder()
+  build_from_hts_lab(builder, lab, state)
+  return builder.proto
+
+#Feeds a phoneme from a label which marks if each phoneme begins a syllable or word to builder.
+#The first phoneme always begins both. n_sylls is the number of syllables finished in the
+#current word and the updated number is returned for the next phoneme.
+#Note that the id of the last word is made from its last syllable only.
+def build_lab_phoneme(builder, first, last, n_sylls, p_id, start, end, stress, beg_syll, beg_word, syll_stress, states=None):
+  if first:
+    builder.start_word()
+    builder.start_syllable(syll_stress)
+  elif beg_syll:
+    builder.end_syllable()
+    n_sylls += 1
+    if beg_word:
+      builder.end_word()
+      builder.start_word()
+      n_sylls = 0
+    builder.start_syllable(syll_stress)
+  builder.add_phoneme(p_id, start, end, stress, states)
+  if last:
+    builder.end_word(builder.end_syllable()*(n_sylls+1))
+  return n_sylls
+
+#Builds an utterance from text.
 #Note that all phonemes are given a phony 100ms duration - this is expected to be overridden by the back-end duration prediction system.
 #If pron_reduced is set this will attempt to produce a reduced pronunciation for parts of the sentence as specifiied by reduction_level and
 #the scores in reduction_score_file.
 #Reduction_level must be minimally 0 (full reduction) and maximally 1 (no reduction).
-def proto_from_txt(lab, dictionary, general_sil_phoneme="sil", comma_is_pause=False, stanfordparse=False, pcfgdict=None, pron_reduced=False, lm_score_dir=None, reduction_level=1.0, phoneme_lm_prons=False):
-  #Create words
-  proto = {"utt":[]}
-  proto["id"] = lab[0].split("/")[-1]
+def build_from_txt(builder, lab, dictionary, general_sil_phoneme="sil", comma_is_pause=False, stanfordparse=False, pcfgdict=None, pron_reduced=False, lm_score_dir=None, reduction_level=1.0, phoneme_lm_prons=False):
+  utt_id = lab[0].split("/")[-1]
+  builder.set_id(utt_id)
   #First we check if we need to reduce some words, and which
   if pron_reduced == True and phoneme_lm_prons == True:
     raise SiReError("Cannot produce reduced pronunciations in combination with phoneme LM based pronunciation choice.")
   elif pron_reduced == True:
     if os.path.isdir(lm_score_dir):
-      words = reduce_word_tuples(lab[1:], os.path.join(lm_score_dir, proto["id"]+".scored"), reduction_level)
+      words = reduce_word_tuples(lab[1:], os.path.join(lm_score_dir, utt_id+".scored"), reduction_level)
     else:
       raise SiReError("The directory with reduction scores does not exist!")
   elif phoneme_lm_prons == True:
     if os.path.isdir(lm_score_dir):
       #As we do not keep stress information for the phoneme LM to score we may have a few potential versions of each word.
-      words = find_potential_words(lab[1:], os.path.join(lm_score_dir, proto["id"]+".path"))
+      words = find_potential_words(lab[1:], os.path.join(lm_score_dir, utt_id+".path"))
       raise SiReError("Not implemented yet! Phoneme_lm_scoring. ")
     else:
       raise SiReError("The directory with reduction scores does not exist!")
@@ -316,17 +244,17 @@ def proto_from_txt(lab, dictionary, general_sil_phoneme="sil", comma_is_pause=Fa
   #If no parse exists (i.e. no pos tags) we will simply grab the first pronunciation we can find that is not reduced (if one exist).
   #We also forget the pos tag of that in the process.
   #We start with silence.
-  proto["utt"].append({"id":"sil", "syllables":dictionary.make_entry(general_sil_phoneme, general_sil_phoneme+" 0", False)["syllables"]})
+  entries = [("sil", dictionary.make_entry(general_sil_phoneme, general_sil_phoneme+" 0", False))]
   if not stanfordparse:
     for word in words:
       #If we need to keep some punctuation
       if comma_is_pause == True:
-        proto["utt"].append({"id":word[0], "syllables":dictionary.get_single_entry(word[0], reduced=word[1], punct_as_sil=([","], "sil"))["syllables"]})
+        entries.append((word[0], dictionary.get_single_entry(word[0], reduced=word[1], punct_as_sil=([","], "sil"))))
       else:
-        proto["utt"].append({"id":word[0], "syllables":dictionary.get_single_entry(word[0], reduced=word[1])["syllables"]})
+        entries.append((word[0], dictionary.get_single_entry(word[0], reduced=word[1])))
   else: #Else a pcfg parse should exist and we can get the pos tags from that.
     tree = parsetrees.stanfordPcfgTree()
-    tree.make_tree(pcfgdict[proto["id"]])
+    tree.make_tree(pcfgdict[utt_id])
 
     #Do we need some punctuation?
     if comma_is_pause == True:
@@ -336,32 +264,38 @@ def proto_from_txt(lab, dictionary, general_sil_phoneme="sil", comma_is_pause=Fa
 
     #In this case we need to do some merging
     if len(leafs) != len(words):
-      leafs = merge(leafs, words, proto["id"])
+      leafs = merge(leafs, words, utt_id)
     for i, leaf in enumerate(leafs):
       pos, word = leaf.label.lower().split("-")
       if word != words[i][0]:
-        raise SiReError("Word ({0}) from parse does not match word ({1}) from txt! In {2}.".format(word, words[i][0], proto["id"]))
+        raise SiReError("Word ({0}) from parse does not match word ({1}) from txt! In {2}.".format(word, words[i][0], utt_id))
       else:
         word = words[i]
       if comma_is_pause:
         c_best = dictionary.get_single_entry(word[0], pos, word[1], punct_as_sil=([","], "sil"))
       else:
         c_best = dictionary.get_single_entry(word[0], pos, word[1])
-      proto["utt"].append({"id":word[0], "syllables":c_best["syllables"]})
+      entries.append((word[0], c_best))
   #We end with silence.
-  proto["utt"].append({"id":"sil", "syllables":dictionary.make_entry(general_sil_phoneme, general_sil_phoneme+" 0", False)["syllables"]})
-  #Add phony times to phonemes
+  entries.append(("sil", dictionary.make_entry(general_sil_phoneme, general_sil_phoneme+" 0", False)))
+  #Add the words with phony times for the phonemes
   #Phony phoneme duration counter
   cur_dur = 0
-  for word in proto["utt"]:
-    for syll in word["syllables"]:
-      #Add phony time to phonemes
+  for word_id, entry in entries:
+    builder.start_word()
+    for syll in entry["syllables"]:
+      builder.start_syllable(syll["stress"])
       for phon in syll["phonemes"]:
-        phon["start"] = cur_dur
         #Add 100ms in HTK lab format
+        builder.add_phoneme(phon["id"], cur_dur, cur_dur + 1000000, phon["stress"])
         cur_dur += 1000000
-        phon["end"] = cur_dur
-  return proto
+      builder.end_syllable(syll["id"])
+    builder.end_word(word_id)
+
+def proto_from_txt(lab, dictionary, general_sil_phoneme="sil", comma_is_pause=False, stanfordparse=False, pcfgdict=None, pron_reduced=False, lm_score_dir=None, reduction_level=1.0, phoneme_lm_prons=False):
+  builder = utterance.ProtoBuilder()
+  build_from_txt(builder, lab, dictionary, general_sil_phoneme, comma_is_pause, stanfordparse, pcfgdict, pron_reduced, lm_score_dir, reduction_level, phoneme_lm_prons)
+  return builder.proto
 
 #Add parse information from a stanford pcfg parsed sentence
 def load_stanford_pcfg_parse(utt, parse, comma_is_pause=False):
@@ -389,6 +323,8 @@ def load_stanford_pcfg_parse(utt, parse, comma_is_pause=False):
       for w in utt.words:
         print w.id
       raise SiReError("Number of leaves ({0}) not equal to number of words ({1})! In utt ({2})!".format(len(leafs), num_w, utt.id))
+  #The words only refer to the nodes above them so the utt keeps the tree alive.
+  utt.pcfg_tree = tree
   #Match each word with parse
   words = utt.get_words_no_pau(comma_is_pause)
   for i, word in enumerate(words):
@@ -437,6 +373,8 @@ def load_stanford_dependency_parse(utt, parse):
       for node in nodes:
         print node.label
       raise SiReError("Number of nodes ({0}) not equal to number of words ({1})! In utt ({2})!".format(len(nodes), utt.num_words_no_pau(), utt.id))
+  #The words only refer to the nodes above them so the utt keeps the tree alive.
+  utt.dependency_tree = tree
   #Match each word with parse
   for i, word in enumerate(utt.get_words_no_pau()):
     #As we may have split words the parse contains the id
@@ -462,7 +400,10 @@ def load_stanford_dependency_parse(utt, parse):
 
 #Get word ids from text.
 def load_txt(utt, txtpath, emphasis):
-  txt = open(txtpath, "r").read()
+  load_txt_string(utt, open(txtpath, "r").read(), emphasis)
+
+#As load_txt but with the contents of the txt file, e.g. read from a corpus archive.
+def load_txt_string(utt, txt, emphasis):
   for x in ["!", ".", "?", ",", "--"]:
     txt = txt.replace(x, "")
 
@@ -512,99 +453,96 @@ def remake_stops(lab):
     lab.remove(r)
   return lab
 
-#Creates phonemes and their info from align lab
-def make_phonemes(lab):
+#Yields (id, start, end, stress, states) for each phoneme in an align lab.
+#The stress markers #1 and #2 are not phonemes but give the stress of the following phoneme.
+def align_phonemes(lab):
   stress = 0
-  for i, p in enumerate(lab):
+  for p in lab:
     if p[-1] == "#1":
       stress = 1
-      lab[i] = "out"
     elif p[-1] == "#2":
       stress = 2
-      lab[i] = "out"
     else:
-      lab[i] = {"stress":stress, "id":lab[i][-1], "start":int(lab[i][0]), "end":int(lab[i][1])}
+      yield (p[-1], int(p[0]), int(p[1]), stress, None)
       stress = 0
-  while "out" in lab:
-    lab.remove("out")
-  return lab
 
-#Makes the sylls in an align lab word
-def make_sylls(utt):
-  sylls = []
-  syll = {"id":"", "stress":0, "phonemes":[]}
-  for i, p in enumerate(utt):
-    #. marks midword syll boundaries
-    #sp marks word boundaries and possible silence segments
-    #sil marks silence segments between words
-    if p["id"] in [".", "sil", "sp"]:
-      if len(syll["phonemes"]) > 0:
-        syll["start"] = syll["phonemes"][0]["start"]
-        syll["end"] = syll["phonemes"][-1]["end"]
-        sylls.append(syll)
-      syll = {"id":"", "stress":0, "phonemes":[]}
+#As align_phonemes but for a state align lab where each phoneme is a list of state lines.
+def state_align_phonemes(lab):
+  stress = 0
+  for p in lab:
+    if p[0][-1] == "#1":
+      stress = 1
+    elif p[0][-1] == "#2":
+      stress = 2
+    else:
+      yield (p[0][-1], int(p[0][0]), int(p[-1][1]), stress, p)
+      stress = 0
+
+#Builds the syllables and words of an align lab from its phonemes.
+#'.' marks midword syll boundaries.
+#'sp' marks word boundaries and possible silence segments.
+#'sil' marks silence segments between words.
+#Each word is kept until its end is found as only words ending at a boundary are used.
+def build_align_words(builder, phonemes, lab):
+  word = []
+  syll = None
+  n_sylls = 0
+  for p in phonemes:
+    if p[0] in [".", "sil", "sp"]:
+      if syll != None:
+        word.append(syll)
+        n_sylls += 1
+      syll = None
       #Sil and sp are also markers of word boundaries and
       #may be their own entity so should be kept
-      if p["id"] in ["sil", "sp"]:
-        sylls.append({"id":p["id"], "stress":0, "phonemes":[p], "start":p["start"], "end":p["end"]})
-    else:
-      syll["phonemes"].append(p)
-      syll["id"] += p["id"]
-      if p["stress"] > 0:
-        if syll["stress"] != 0:
-          raise SiReError("Syllable ({0}) already stressed! In utt ({1})".format(syll, utt.id))
-        syll["stress"] = p["stress"]
-      if i == len(utt)-1:
-        syll["start"] = syll["phonemes"][0]["start"]
-        syll["end"] = syll["phonemes"][-1]["end"]
-        #If we're at the end of the utt the last syll is done
-        sylls.append(syll)
-  return sylls
-
-#Finds the words in an align lab
-def make_words(utt):
-  words = []
-  word = {"id":"", "syllables":[]}
-  for i, s in enumerate(utt):
-    #The check for len phonemes is necessary as the syll id is composed
-    #of phoneme ids and all of "s", "i", "l" and "p" are valid ids.
-    #Thus a syllable of the phonemes "s" and "p" has the id "sp".
-    if s["id"] in ["sil", "sp"] and len(s["phonemes"]) == 1:
-      if word["syllables"] != []:
-        word["start"] = word["syllables"][0]["start"]
-        word["end"] = word["syllables"][-1]["end"]
-        words.append(word)
-      #If the silence is of any length it should be kept.
-      if s["end"] - s["start"] > 0:
-        words.append({"id":s["id"], "syllables":[s], "start":s["start"], "end":s["end"]})
-      elif i == 0 or i == len(utt)+1:
-        #Something is likely fishy
-        raise SiReError("Boundary silence not of any length in word ({0})!".format(word))
-      word = {"id":"", "syllables":[]}
+      if p[0] in ["sil", "sp"]:
+        if word != []:
+          build_align_word(builder, word)
+        word = []
+        #If the silence is of any length it should be kept.
+        if p[2] - p[1] > 0:
+          build_align_word(builder, [[0, [p]]])
+        elif n_sylls == 0:
+          #Something is likely fishy
+          raise SiReError("Boundary silence not of any length at the start of the utt! In {0}".format(lab))
+        n_sylls += 1
     else:
-      word["syllables"].append(s)
-      word["id"] += s["id"]
-  return words
+      if syll == None:
+        syll = [0, []]
+      syll[1].append(p)
+      if p[3] > 0:
+        if syll[0] != 0:
+          raise SiReError("Syllable ({0}) already stressed! In utt ({1})".format("".join([x[0] for x in syll[1]]), lab))
+        syll[0] = p[3]
+
+#Builds a word of [stress, phonemes] syllables.
+def build_align_word(builder, word):
+  builder.start_word()
+  for stress, phonemes in word:
+    builder.start_syllable(stress)
+    for p in phonemes:
+      builder.add_phoneme(*p)
+    builder.end_syllable()
+  builder.end_word()
 
 #Splits an HTS style label based on its delimiters.
+#Returns a dict of the i'th value of the label, which is the part before the first delims[i]
+#after delims[i-1], and the rest of the label after the last delimiter. If a delimiter is not
+#found the rest of the label is its value and the values after it are empty.
+#The label is scanned once from left to right.
 def split_hts_lab(lab, delims):
   values = {}
+  pos = 0
+  end = len(lab)
   for i, delim in enumerate(delims):
-    # print "Delims", delims
-    # print "Loopers", i, delim
-    # print "lab", lab
-    s = lab.split(delim)
-    # print "Splitting", lab.split(delim)
-    # print "S", s
-    s = [s[0], delim.join(s[1:])]
-    # print "New S", s
-    if i+1 != len(delims):
-      values[i] = s[0]
-      lab = s[1]
+    j = lab.find(delim, pos)
+    if j == -1:
+      values[i] = lab[pos:]
+      pos = end
     else:
-      values[i] = s[0]
-      values[i+1] = s[1]
-  # print "values", values
+      values[i] = lab[pos:j]
+      pos = j + len(delim)
+  values[len(delims)] = lab[pos:]
   return values
 
 #Takes a list of words and a path to a file with LM scores for each word.
@@ -155,6 +155,8 @@ def split_word(word, split_pos):
 #    p.parent_word = w1
 #  for p in w2.phonemes:
 #    p.parent_word = w2
+  #The segment lists have changed so positions must be updated.
+  utt.update_positions()
   
   #Delete the original word. If all has gone well this should be fine.
   del word
@@ -186,6 +188,7 @@ def split_syll(syll, acceptable_phoneme_set, word_spanning_phonemes=[]):
     phony_phone.end = syll.end_time()
     phony.phonemes = [phony_phone]
     phony.vowel_id = syll.vowel_id
+    utt.update_positions()
     return
   
   #You must know which phonemes are acceptable to replace.
@@ -251,6 +254,8 @@ def split_syll(syll, acceptable_phoneme_set, word_spanning_phonemes=[]):
       v = p.id
       break
   s1.vowel_id = v
+  #The segment lists have changed so positions must be updated.
+  utt.update_positions()
   
   #Delete the original syll.
   del syll
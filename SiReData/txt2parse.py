@@ -14,7 +14,13 @@
 #limitations under the License.                                          #
 ##########################################################################
 
+#Load the SiReImports.pth file
+#Note this assumes we are in the SiReData dir when calling the script.
+import site
+site.addsitedir("../")
+
 import os, argparse, subprocess
+import sire_io as io
 
 def parse_stanford(args):
   #First perform PTB tokenisation
@@ -63,19 +69,16 @@ def split_parse_relations(parse):
 #This is necessary as the stanford parser does not add the id of the
 #parent file to the parse. But it is a bit unsafe.
 #We need to sort as the output of the parser is also sorted. Makes it a bit less unsafe.
+#Out may be a dir or a corpus archive, see corpus_archive.
 def write_out(pf, out, tf):
   count = 0
   tf.sort()
+  writer = io.CorpusWriter(out)
   for txt in tf:
-    wf = open(os.path.join(out, txt.split(".")[0]+".parse"), "w")
-    wf2 = open(os.path.join(out, txt.split(".")[0]+".relations"), "w")
-    
-    wf.write(pf[count][0]+"\n")
-    for l in pf[count][1]:
-      wf2.write(l+"\n")
-    wf.close()
-    wf2.close()
+    writer.write(txt.split(".")[0]+".parse", pf[count][0]+"\n")
+    writer.write(txt.split(".")[0]+".relations", "".join([l+"\n" for l in pf[count][1]]))
     count += 1
+  writer.close()
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(description='Perform a syntactic parsing of the text files using the Stanford parser. The output log of the stanford parser is subsequently loaded and split into individual parse files.')
@@ -88,6 +91,7 @@ if __name__ == "__main__":
   parser.add_argument('-preparsed', action='store_true', help="Specify as true if the sentences have already been parsed and the outdir contains a parser.log file. Parsing is then skipped and the log file is split into seperate parse files.")
   parser.add_argument('-pretokenised', action='store_true', help="Specify as true if the sentences have already been tokenised and the output is present in tokenpath.")
   parser.add_argument('-javamem', type=int, help="Specify the available RAM for java in MB.", default=2000)
+  parser.add_argument('-archive', type=str, help="Write the parse files into this corpus archive (.tar, .tar.gz, .tgz, .tar.bz2, .tbz2 or .zip) instead of OUTPATH. The parser log is still written to OUTPATH.", default=None)
   args = parser.parse_args()
   
   if not args.preparsed:
@@ -98,4 +102,7 @@ if __name__ == "__main__":
   parse = split_parse(parse)
   
   #Write out the parses to seperate files
-  write_out(parse, args.outpath, os.listdir(args.tokenpath))
+  if args.archive:
+    write_out(parse, args.archive, os.listdir(args.tokenpath))
+  else:
+    write_out(parse, args.outpath, os.listdir(args.tokenpath))
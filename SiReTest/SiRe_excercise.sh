@@ -71,12 +71,104 @@ python make_full_context_labs.py sire_lab SiReTest/outputs/labs SiReTest/inputs/
 python make_full_context_labs.py sire_lab SiReTest/outputs/labs SiReTest/inputs/SiRe_Lab/relational SiReTest/inputs/txt/ -questions -qpath SiReTest/outputs/questions/test -HHEd_fix -context_type relational || { echo "Error at line: ${LINENO}"; exit 1; }
 python make_full_context_labs.py sire_lab SiReTest/outputs/labs SiReTest/inputs/SiRe_Lab/categorical SiReTest/inputs/txt/ -questions -qpath SiReTest/outputs/questions/test -HHEd_fix -context_type categorical || { echo "Error at line: ${LINENO}"; exit 1; }
 
+#The following options should not change the labels so they are checked against a plain run
+mkdir SiReTest/outputs/plain
+python make_full_context_labs.py align_mlf SiReTest/outputs/plain SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Utterance cache - the second run should load all utts from the cache
+mkdir SiReTest/outputs/cached
+python make_full_context_labs.py align_mlf SiReTest/outputs/cached SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -utt_cache SiReTest/outputs/utt_cache || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py align_mlf SiReTest/outputs/cached SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -utt_cache SiReTest/outputs/utt_cache | grep "Utterance cache: 50 loaded, 0 built." || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/plain SiReTest/outputs/cached || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Validation - checking fewer or no values should make the same labels
+mkdir SiReTest/outputs/sampled
+mkdir SiReTest/outputs/unchecked
+python make_full_context_labs.py align_mlf SiReTest/outputs/sampled SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -validation sampled || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py align_mlf SiReTest/outputs/unchecked SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -validation off || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/plain SiReTest/outputs/sampled || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/plain SiReTest/outputs/unchecked || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Feature matrices - the labels should be the same as without them
+mkdir SiReTest/outputs/nn_plain
+mkdir SiReTest/outputs/nn_labs
+mkdir SiReTest/outputs/matrices
+python make_full_context_labs.py align_mlf SiReTest/outputs/nn_plain SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -questions -qpath SiReTest/outputs/questions/nn_plain -qtype Nitech_NN || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py align_mlf SiReTest/outputs/nn_labs SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -questions -qpath SiReTest/outputs/questions/nn -qtype Nitech_NN -feature_matrix npy -matrixdir SiReTest/outputs/matrices || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/nn_plain SiReTest/outputs/nn_labs || { echo "Error at line: ${LINENO}"; exit 1; }
+diff SiReTest/outputs/questions/nn_plain SiReTest/outputs/questions/nn || { echo "Error at line: ${LINENO}"; exit 1; }
+[ $(ls SiReTest/outputs/matrices/*.npy | wc -l) -eq 50 ] || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Matching the question set against the written labels should give the same matrices
+mkdir SiReTest/outputs/matched
+python SiReUtils/question_utils.py -match SiReTest/outputs/questions/nn SiReTest/outputs/nn_labs SiReTest/outputs/matched || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/matrices SiReTest/outputs/matched || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Incremental labels - adding emphasis to existing labels should give the same labels as making them from scratch
+mkdir SiReTest/outputs/emphasis
+mkdir SiReTest/outputs/incremental
+python make_full_context_labs.py align_mlf SiReTest/outputs/emphasis SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -emphasis || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py align_mlf SiReTest/outputs/incremental SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -write_manifest || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py align_mlf SiReTest/outputs/incremental SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -emphasis -incremental | grep "Reusing feature groups" || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r -x "sire_manifest*" SiReTest/outputs/emphasis SiReTest/outputs/incremental || { echo "Error at line: ${LINENO}"; exit 1; }
+#Adding dependency features should update the labels of the utts whose words the parse does not split instead of rebuilding them
+mkdir SiReTest/outputs/dependency
+mkdir SiReTest/outputs/incremental_dependency
+python make_full_context_labs.py align_mlf SiReTest/outputs/dependency SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -stanford_dependency_parse -parsedir SiReTest/inputs/parse/ || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py align_mlf SiReTest/outputs/incremental_dependency SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -write_manifest || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py align_mlf SiReTest/outputs/incremental_dependency SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -stanford_dependency_parse -parsedir SiReTest/inputs/parse/ -incremental > SiReTest/outputs/incremental_dependency.log || { echo "Error at line: ${LINENO}"; exit 1; }
+[ $(grep -c "making it from scratch" SiReTest/outputs/incremental_dependency.log) -lt 50 ] || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r -x "sire_manifest*" SiReTest/outputs/dependency SiReTest/outputs/incremental_dependency || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Reading an mlf one label at a time should give the same labels as reading the labs of a dir
+mkdir SiReTest/outputs/from_hts_mlf
+mkdir SiReTest/outputs/from_hts_labs
+python make_full_context_labs.py hts_mlf SiReTest/outputs/from_hts_mlf SiReTest/inputs/hts.mlf SiReTest/inputs/txt/ -context_type absolute || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py hts_lab SiReTest/outputs/from_hts_labs SiReTest/inputs/HTS_Lab SiReTest/inputs/txt/ -context_type absolute || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/from_hts_mlf SiReTest/outputs/from_hts_labs || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Only some utts of an mlf - the labels of the utts listed should be those of the plain run
+mkdir SiReTest/outputs/subset
+ls SiReTest/outputs/plain | head -5 | sed 's/\.lab$//' > SiReTest/outputs/utt_list
+python make_full_context_labs.py align_mlf SiReTest/outputs/subset SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -utt_list SiReTest/outputs/utt_list || { echo "Error at line: ${LINENO}"; exit 1; }
+[ $(ls SiReTest/outputs/subset | wc -l) -eq 5 ] || { echo "Error at line: ${LINENO}"; exit 1; }
+for lab in SiReTest/outputs/subset/*.lab; do diff $lab SiReTest/outputs/plain/${lab##*/} || { echo "Error at line: ${LINENO}"; exit 1; }; done
+#Two shards written into the same dir should together make the plain run
+mkdir SiReTest/outputs/sharded
+python make_full_context_labs.py align_mlf SiReTest/outputs/sharded SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -shard 0 2 || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py align_mlf SiReTest/outputs/sharded SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -shard 1 2 || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/plain SiReTest/outputs/sharded || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Writing all labels into one mlf should give the labels of the plain run
+python make_full_context_labs.py align_mlf SiReTest/outputs/plain SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -mlf SiReTest/outputs/labs.mlf || { echo "Error at line: ${LINENO}"; exit 1; }
+(echo "#!MLF!#"; for lab in SiReTest/outputs/plain/*.lab; do echo "\"*/${lab##*/}\""; cat $lab; echo "."; done) > SiReTest/outputs/plain.mlf
+diff SiReTest/outputs/plain.mlf SiReTest/outputs/labs.mlf || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Reading the input labs one at a time instead of with a pool of threads should make the same labels
+mkdir SiReTest/outputs/one_thread
+python make_full_context_labs.py hts_lab SiReTest/outputs/one_thread SiReTest/inputs/HTS_Lab SiReTest/inputs/txt/ -context_type absolute -io_threads 1 || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/from_hts_labs SiReTest/outputs/one_thread || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Corpus archives - reading the txt from a .tgz and writing the labels into a .zip should make the plain labels
+mkdir SiReTest/outputs/unzipped
+tar -czf SiReTest/outputs/txt.tgz -C SiReTest/inputs txt || { echo "Error at line: ${LINENO}"; exit 1; }
+python make_full_context_labs.py align_mlf SiReTest/outputs/labs.zip SiReTest/inputs/align.mlf SiReTest/outputs/txt.tgz -context_type absolute || { echo "Error at line: ${LINENO}"; exit 1; }
+python -m zipfile -e SiReTest/outputs/labs.zip SiReTest/outputs/unzipped || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/plain SiReTest/outputs/unzipped || { echo "Error at line: ${LINENO}"; exit 1; }
+
+#Binary labels - converting them back to .lab files should give the plain labels
+mkdir SiReTest/outputs/from_binary
+python make_full_context_labs.py align_mlf SiReTest/outputs/plain SiReTest/inputs/align.mlf SiReTest/inputs/txt/ -context_type absolute -binary SiReTest/outputs/labs.slab || { echo "Error at line: ${LINENO}"; exit 1; }
+python SiReUtils/convertion_utils.py -binary_to_labs SiReTest/outputs/labs.slab SiReTest/outputs/from_binary || { echo "Error at line: ${LINENO}"; exit 1; }
+diff -r SiReTest/outputs/plain SiReTest/outputs/from_binary || { echo "Error at line: ${LINENO}"; exit 1; }
+
 #THE FOLLOWING EXCERCISES NEED YOU TO HAVE COMBILEX OR CMUDICT AND SET A THE PATH TO IT YOURSELF!!!
 #From txt
 if [ "$1" != "all" ]
 then
   echo "Skipping final tests..."
   rm -r SiReTest/outputs
+  rm -f SiReTest/inputs/*.mlf.idx
   exit
 fi
 DICTPATH=/Users/Rasmus/SiRe/cmudict/syllabified.dict
@@ -94,3 +186,4 @@ python make_full_context_labs.py txt SiReTest/outputs/labs SiReTest/inputs/txt S
 
 #Clean up
 rm -r SiReTest/outputs
+rm -f SiReTest/inputs/*.mlf.idx
@@ -14,9 +14,9 @@
 #limitations under the License.                                          #
 ##########################################################################
 
-#Load the SiReImports.pth file
-import site
-site.addsitedir(".")
+#Load the SiReImports.pth file from the repo root, wherever the script is run from
+import site, os
+site.addsitedir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
 #Get other imports
 import argparse, dictionary, sire_io
@@ -15,11 +15,11 @@
 ##########################################################################
 
 #Methods for converting labels from one format to another. The ones here are simply the ones that has been needed so far.
-#Load the SiReImports.pth file
-import site
-site.addsitedir("../")
+#Load the SiReImports.pth file from the repo root, wherever the script is run from
+import site, os
+site.addsitedir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-import argparse, sire_io, os
+import argparse, sire_io, mlf_index, binary_labels, label_writer, os
 from error_messages import SiReError
 
 def merge_hvite_state_align_and_full_context_lab(state_align_labs, full_context_labs):
@@ -109,19 +109,41 @@ def merge_hvite_state_with_sp_align_mlf(state_labs, phone_labs):
     merged.append(c_merge)
   return merged
 
+#Writes the labels of the utts in utt_ids (or all) in a binary label file as .lab files
+#into a dir or corpus archive. These are the same as the labels written by
+#make_full_context_labs without -binary.
+def binary_labels_to_labs(binpath, outpath, utt_ids=None):
+  reader = binary_labels.BinaryLabelReader(binpath)
+  if utt_ids == None:
+    utt_ids = reader.get_utt_ids()
+  writer = label_writer.LabelWriter(labdir=outpath)
+  f = open(binpath, "rb")
+  for utt_id in utt_ids:
+    writer.write(utt_id, reader.get_lines(utt_id, f))
+  f.close()
+  writer.close()
+
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(description='Utility file convertion related methods.')
   parser.add_argument('-merge_hvite_state_with_full_context', nargs=3, help="Merge an HVite state level alignment MLF with full-context labels in a directory and output state-level full-context labels to another.", metavar=('mlf_path', 'lab_dir', 'out_dir'))
   parser.add_argument('-merge_hvite_state_with_sp_align_mlf', nargs=3, help="Merge an HVite state level alignment MLF which does not contain SP and syllable stress information with a phone level alignment ready mlf which does and output a state-level with SP and syllable stress.", metavar=('state_mlf_path', 'phone_mlf_path', 'out_mlf_path'))
+  parser.add_argument('-binary_to_labs', nargs=2, help="Write the labels in a binary label file made by make_full_context_labs -binary as .lab files into a dir or corpus archive.", metavar=('binary_path', 'out_dir'))
   parser.add_argument('-collapse_closure', action="store_true", help="Collapses stops split into closure and release into one when merging state_align_labs with full_context_labs.")
   parser.add_argument('-f', action="store_true", help="Force overwrite of files in output dir.")
+  parser.add_argument('-utt_list', type=str, help="Only merge the utts listed in this file (one id per line). Only their labels are read from the mlfs.", default=None)
+  parser.add_argument('-shard', type=int, nargs=2, help="Only merge the I'th of N equal parts of the utts in the state mlf (counting from 0).", default=None, metavar=("I", "N"))
   args = parser.parse_args()
+  if args.utt_list != None:
+    args.utt_list = sire_io.read_utt_list(args.utt_list)
+  subset = args.utt_list != None or args.shard != None
   
   if args.merge_hvite_state_with_sp_align_mlf != None:
-    state_mlf = sire_io.open_file_line_by_line(args.merge_hvite_state_with_sp_align_mlf[0])
-    phone_mlf = sire_io.open_file_line_by_line(args.merge_hvite_state_with_sp_align_mlf[1])
-    state_utts = sire_io.parse_mlf(state_mlf, "state_align_mlf")
-    phone_utts = sire_io.parse_mlf(phone_mlf, "hts_mlf")
+    state_utts = list(mlf_index.get_mlf_labs(args.merge_hvite_state_with_sp_align_mlf[0], "state_align_mlf", args.utt_list, args.shard))
+    if subset:
+      #Only read the same utts from the phone mlf.
+      phone_utts = list(mlf_index.get_mlf_labs(args.merge_hvite_state_with_sp_align_mlf[1], "hts_mlf", [utt[0] for utt in state_utts]))
+    else:
+      phone_utts = list(mlf_index.get_mlf_labs(args.merge_hvite_state_with_sp_align_mlf[1], "hts_mlf"))
     merged_utts = merge_hvite_state_with_sp_align_mlf(state_utts, phone_utts)
     if args.f == True:
       wf = sire_io.open_writefile_safe(args.merge_hvite_state_with_sp_align_mlf[2], overwrite=True)
@@ -138,8 +160,10 @@ if __name__ == "__main__":
   
   if args.merge_hvite_state_with_full_context != None:
     full_context_labs = sire_io.open_labdir_line_by_line(args.merge_hvite_state_with_full_context[1])
-    mlf = sire_io.open_file_line_by_line(args.merge_hvite_state_with_full_context[0])
-    state_labs = sire_io.parse_mlf(mlf, "align_mlf")
+    state_labs = list(mlf_index.get_mlf_labs(args.merge_hvite_state_with_full_context[0], "align_mlf", args.utt_list, args.shard))
+    if subset:
+      utt_ids = set([lab[0] for lab in state_labs])
+      full_context_labs = [lab for lab in full_context_labs if lab[0] in utt_ids]
     if args.collapse_closure == True:
       for x, lab in enumerate(state_labs):
         for i, l in enumerate(lab):
@@ -160,3 +184,9 @@ if __name__ == "__main__":
       for l in lab:
         wf.write(" ".join(l)+"\n")
       wf.close()
+  
+  if args.binary_to_labs != None:
+    utt_ids = None
+    if subset:
+      utt_ids = sire_io.select_utts(binary_labels.BinaryLabelReader(args.binary_to_labs[0]).get_utt_ids(), args.utt_list, args.shard)
+    binary_labels_to_labs(args.binary_to_labs[0], args.binary_to_labs[1], utt_ids)
@@ -16,22 +16,29 @@
 
 #This contains a number of things for investigating a TTS corpus. E.g. a count for the number of triphoneme types in the corpus.
 
-#Load the SiReImports.pth file
-import site
-site.addsitedir(".")
+#Load the SiReImports.pth file from the repo root, wherever the script is run from
+import site, os
+site.addsitedir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-import argparse, dictionary, utterance, sire_io, sire_math, os, math, phoneme_features
+import argparse, dictionary, utterance, compact_utterance, sire_io, sire_math, os, math, phoneme_features, binary_labels
 
 from error_messages import SiReError
 from check_dictionary import get_oov_words
 from sire_io import open_writefile_safe
 from sire_io import load_txt_dir
 
-def get_utts(txt, args):
+#If compact is True the utts are stored as compact_utterance.CompactUtterance
+#which use far less memory but do not contain parse or festival information.
+def get_utts(txt, args, compact=False):
   print "Making utts..."
   utts = []
+  #The compact utts of the corpus share one symbol table.
+  symbols = compact_utterance.SymbolTable()
   for t in txt:
-    utts.append(utterance.Utterance(t, args))
+    if compact == True:
+      utts.append(compact_utterance.CompactUtterance(t, args, symbols))
+    else:
+      utts.append(utterance.Utterance(t, args))
   print "Done"
   return utts
 
@@ -53,8 +60,14 @@ def get_text_utts(indir, compilexpath):
   utts = get_utts(txt, args)
   return utts
 
+#Labdir may also be a binary label file, see binary_labels.
 def get_sire_utts(labdir, context_type, hhed_fix, durlab=False):
-  labs = sire_io.open_labdir_line_by_line(labdir, dur_lab=durlab)
+  if binary_labels.is_binary_labels(labdir):
+    if durlab:
+      raise SiReError("A binary label file does not contain dur labs!")
+    labs = list(binary_labels.BinaryLabelReader(labdir).iter_labs())
+  else:
+    labs = sire_io.open_labdir_line_by_line(labdir, dur_lab=durlab)
   quinphone = []
   phone = []
   triphone = []
@@ -65,7 +78,8 @@ def get_sire_utts(labdir, context_type, hhed_fix, durlab=False):
   args.phoneme_features = phoneme_features.CombilexPhonemes()
   #As we do not require the input text to analyse from a sire_lab we need to disable the festival features
   args.festival_features = False
-  utts = get_utts(labs, args)
+  #We only need the segmental information for the analysis so we keep the utts compact.
+  utts = get_utts(labs, args, compact=True)
   return utts
 
 #Analysis a list of phones with some standard measurements
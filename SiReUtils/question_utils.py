@@ -14,7 +14,12 @@
 #limitations under the License.                                          #
 ##########################################################################
 
-import argparse
+#Load the SiReImports.pth file from the repo root, wherever the script is run from
+import site, os
+site.addsitedir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import argparse, os
+import question_matcher, feature_matrix
 
 def merge(set1, set2, outpath):
   set1 += set2
@@ -28,9 +33,18 @@ def merge(set1, set2, outpath):
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(description='Utility question file related methods.')
   parser.add_argument('-merge', nargs=3, help="Merge two question sets into 1.", metavar=('set1', 'set2', 'outpath'))
+  parser.add_argument('-match', nargs=3, help="Match a question set against each label in a dir and write the feature matrix of each.", metavar=('questions', 'labdir', 'outdir'))
+  parser.add_argument('-matrix_format', type=str, help="The format of the matched feature matrices.", choices=feature_matrix.MATRIX_FORMATS, default="npy")
   args = parser.parse_args()
   
   if args.merge:
     l1 = open(args.merge[0], "r").readlines()
     l2 = open(args.merge[1], "r").readlines()
     merge(l1, l2, args.merge[2])
+  
+  if args.match:
+    matcher = question_matcher.QuestionMatcher(question_matcher.read_questions(args.match[0]))
+    if not os.path.isdir(args.match[2]):
+      os.makedirs(args.match[2])
+    for utt_id, matrix, shape in matcher.match_labdir(args.match[1]):
+      feature_matrix.write_matrix(os.path.join(args.match[2], utt_id+"."+args.matrix_format), matrix, shape, args.matrix_format)
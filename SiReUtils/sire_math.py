@@ -16,9 +16,9 @@
 
 #Some simple mathematical functions. A surrogate for importing non-standard libraries like numpy.
 
-#Load the SiReImports.pth file
-import site
-site.addsitedir(".")
+#Load the SiReImports.pth file from the repo root, wherever the script is run from
+import site, os
+site.addsitedir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
 import math
 from error_messages import SiReError
@@ -18,9 +18,9 @@
 #NOTE: Requires matplotlib which is not a standard python module.
 #See here http://matplotlib.org/users/installing.html for how to get it.
 
-#Load the SiReImports.pth file
-import site
-site.addsitedir("../")
+#Load the SiReImports.pth file from the repo root, wherever the script is run from
+import site, os
+site.addsitedir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
 import wave, argparse, math
 from error_messages import SiReError
@@ -19,145 +19,107 @@ import site
 site.addsitedir(".")
 
 #Rest of imports
-import argparse, os, utterance, contexts, copy, context_skeletons, dictionary, phoneme_features
+import argparse, os, importlib, utterance, contexts, feature_matrix, question_matcher, copy, context_skeletons, dictionary, phoneme_features, utterance_cache, label_manifest, label_writer, binary_labels, mlf_index, corpus_archive
 import sire_io as io
 from datetime import datetime
 from error_messages import SiReError
 
+#The parse files are read from a dir or corpus archive, see sire_io.iter_corpus.
 def read_stanford_pcfg_parses(dirpath):
-  pdct = {}
-  for f in os.listdir(dirpath):
-    if ".parse" in f:
-      pdct[f[:-6]] = open(os.path.join(dirpath, f), "r").read().strip()
-  return pdct
+  files = io.list_corpus(dirpath, ".parse")
+  parses = io.iter_corpus(dirpath, files, lambda name, data: data.strip())
+  return dict(zip([f[:-6] for f in files], parses))
 
 def read_stanford_dependency_parses(dirpath):
-  pdct = {}
-  for f in os.listdir(dirpath):
-    if ".relations" in f:
-      pdct[f.split(".rel")[0]] = io.open_file_line_by_line(os.path.join(dirpath, f))
-  return pdct
-
-#Writes out a label context.
-#If args.questions is true it returns a list of
-#contexts for each phoneme to make questions about.
-#Actually it could be useful to let contexts sort this out. See TODO
+  files = io.list_corpus(dirpath, ".relations")
+  parses = io.iter_corpus(dirpath, files, lambda name, data: [x.strip() for x in io.split_lines(data)])
+  return dict(zip([f.split(".rel")[0] for f in files], parses))
+
+#Returns the contents of each txt file in a corpus archive by utt id.
+def read_txt_archive(path):
+  files = io.list_corpus(path, ".txt")
+  return dict(zip([os.path.splitext(f)[0] for f in files], io.iter_corpus(path, files, lambda name, data: data)))
+
+#Makes the context table of utt and writes its label through the label or binary writer.
+#The table is also added to the label manifest, to the question accumulator if
+#args.questions is true and to the feature matrix store if args.feature_matrix is set.
 def write_context_utt(utt, args):
-  wf = open(os.path.join(args.labdir, utt.id+".lab"), "w")
-  if args.questions == True:
-    cs = []
-  for phone in utt.phonemes:
-    if args.stanford_pcfg_parse == True and args.stanford_dependency_parse == True:
-      if args.context_type == "relational":
-        context = contexts.RelationalStanfordCombined(phone)
-      elif args.context_type == "absolute":
-        context = contexts.AbsoluteStanfordCombined(phone)
-      elif args.context_type == "categorical":
-        context = contexts.CategoricalStanfordCombined(phone)
-    elif args.stanford_pcfg_parse == True:
-      if args.context_type == "relational":
-        context = contexts.RelationalStanfordPcfg(phone)
-      elif args.context_type == "absolute":
-        context = contexts.AbsoluteStanfordPcfg(phone)
-      elif args.context_type == "categorical":
-        context = contexts.CategoricalStanfordPcfg(phone)
-    elif args.stanford_dependency_parse == True:
-      if args.context_type == "relational":
-        context = contexts.RelationalStanfordDependency(phone)
-      elif args.context_type == "absolute":
-        context = contexts.AbsoluteStanfordDependency(phone)
-      elif args.context_type == "categorical":
-        context = contexts.CategoricalStanfordDependency(phone)
-    elif args.emphasis == True:
-        if args.context_type == "absolute":
-            context = contexts.Emphasis(phone)
-        elif args.context_type != "absolute":
-            print "Emphasis features can only be used with the Absolute context type."
-    else:
-      if args.context_type == "relational":
-          context = contexts.Relational(phone)
-      elif args.context_type == "absolute":
-          context = contexts.Absolute(phone)
-      elif args.context_type == "categorical":
-        context = contexts.Categorical(phone)
-    if args.questions == True:
-      cs.append(context)
+  #The contexts of all phonemes are made at once
+  table = args.context_pipeline.make_table(utt)
+  context_strings = args.context_pipeline.get_context_strings(table)
+  lines = []
+  for phone, context_string in zip(utt.phonemes, context_strings):
     if args.labtype == "Phone":
-      wf.write(context.get_context_string(args.HHEd_fix))
+      lines.append(context_string)
     elif args.labtype == "AlignState":
-      base_string = context.get_context_string(args.HHEd_fix).split()
+      base_string = context_string.split()
       if phone.states:
         if len(phone.states) != 5:
           raise SiReError("Wrong number of states for phone {0}!".format(phone.id))
         #S2
-        wf.write(phone.states[0][0]+" "+phone.states[0][1]+" "+base_string[-1]+"[2] "+base_string[-1]+"\n")
+        lines.append(phone.states[0][0]+" "+phone.states[0][1]+" "+base_string[-1]+"[2] "+base_string[-1])
         #S3
-        wf.write(phone.states[1][0]+" "+phone.states[1][1]+" "+base_string[-1]+"[3]\n")
+        lines.append(phone.states[1][0]+" "+phone.states[1][1]+" "+base_string[-1]+"[3]")
         #S4
-        wf.write(phone.states[2][0]+" "+phone.states[2][1]+" "+base_string[-1]+"[4]\n")
+        lines.append(phone.states[2][0]+" "+phone.states[2][1]+" "+base_string[-1]+"[4]")
         #S5
-        wf.write(phone.states[3][0]+" "+phone.states[3][1]+" "+base_string[-1]+"[5]\n")
+        lines.append(phone.states[3][0]+" "+phone.states[3][1]+" "+base_string[-1]+"[5]")
         #S6
-        wf.write(phone.states[4][0]+" "+phone.states[4][1]+" "+base_string[-1]+"[6]")
+        lines.append(phone.states[4][0]+" "+phone.states[4][1]+" "+base_string[-1]+"[6]")
       else:
         print SiReError("No states in phone {0}! Faking phone states is not a feature currently.".format(phone.id))
+        lines.append("")
     else:
       raise SiReError("Invalid labtype {0}!")
-    wf.write("\n")
-  wf.close()
-  #This is an odd way of doing it but it works.
-  if args.questions == True:
-    write_questions(cs, args)
-
-def write_questions(context_set, args):
-  if args.stanford_pcfg_parse == True and args.stanford_dependency_parse == True:
-    if args.context_type == "relational":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.RelationalStanfordCombined(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-    elif args.context_type == "absolute":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.AbsoluteStanfordCombined(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-    elif args.context_type == "categorical":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.CategoricalStanfordCombined(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-  elif args.stanford_pcfg_parse == True:
-    if args.context_type == "relational":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.RelationalStanfordPcfg(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-    elif args.context_type == "absolute":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.AbsoluteStanfordPcfg(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-    elif args.context_type == "categorical":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.CategoricalStanfordPcfg(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-  elif args.stanford_dependency_parse == True:
-    if args.context_type == "relational":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.RelationalStanfordDependency(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-    elif args.context_type == "absolute":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.AbsoluteStanfordDependency(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-    elif args.context_type == "categorical":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.CategoricalStanfordDependency(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
+  if args.binary_writer != None:
+    args.binary_writer.write(utt.id, table.columns["start"], table.columns["end"], table.get_formatted_columns(args.HHEd_fix))
   else:
-    if args.context_type == "relational":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.Relational(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-    elif args.context_type == "absolute":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.Absolute(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-    elif args.context_type == "categorical":
-      qs, q_utt = contexts.get_question_sets(context_skeletons.Categorical(args.phoneme_features), args.qtype, True, context_set, args.HHEd_fix)
-  for q in qs:
-    args.qfile.write(q+"\n")
-  for q in q_utt:
-    args.qfileutt.write(q+"\n")
-
-def finalise_questions(qpath):
-  f = open(qpath, "r").readlines()
-  f = list(set(f))
-  f.sort()
-  wf = open(qpath, "w")
-  for x in f:
-    wf.write(x)
-  wf.close()
+    args.label_writer.write(utt.id, lines)
+  args.label_manifest.add(utt, label_manifest.get_group_types(table))
+  #The question set is made from the values of all utts at the end.
+  if args.questions == True:
+    args.question_accumulator.add(table)
+  #The matrix can only be made when the question set is complete so we store what is needed for it.
+  if args.feature_matrix:
+    args.matrix_values.add(utt.id, feature_matrix.get_label_values(table, args.HHEd_fix))
+
+#Updates the existing label of utt with the feature groups which changed, see label_manifest.
+#If it cannot be updated it is made from scratch.
+def update_context_utt(utt, args):
+  updater = args.label_updater
+  #Only the layers needed for the changed groups are loaded.
+  for layer in updater.get_layers(utt):
+    utt.load_layer(layer)
+  updated = updater.update(utt)
+  if updated == None:
+    print "Cannot update label of {0}, making it from scratch.".format(utt.id)
+    utt.load_layers()
+    write_context_utt(utt, args)
+    return
+  lines, groups, keys = updated
+  args.label_writer.write(utt.id, lines)
+  args.label_manifest.add(utt, groups, keys)
+
+#Writes the question sets fitted to all the utts.
+#Each question is only written once and they are sorted.
+def write_questions(args):
+  qs, q_utt = args.question_accumulator.get_question_sets(args.qtype, args.HHEd_fix)
+  io.write_file_atomic(args.qpath, "".join([q+"\n" for q in sorted(set(qs))]))
+  io.write_file_atomic(args.qpath+"_utt", "".join([q+"\n" for q in sorted(set(q_utt))]))
+
+#Writes the feature matrix of each utt fitting the finished question set.
+def write_feature_matrices(args):
+  matcher = question_matcher.QuestionMatcher(question_matcher.read_questions(args.qpath))
+  for utt_id, label_values in args.matrix_values.iter_values():
+    matrix, shape = feature_matrix.make_matrix(label_values, matcher)
+    feature_matrix.write_matrix(os.path.join(args.matrixdir, utt_id+"."+args.feature_matrix), matrix, shape, args.feature_matrix)
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(description='Create full context labels from a variety of input.')
   parser.add_argument('intype', type=str, help='The type of input.', choices=['align_mlf', 'hts_mlf', 'hts_lab', 'txt', 'sire_lab', 'state_align_mlf'])
-  parser.add_argument('labdir', type=str, help="The output lab dir.")
-  parser.add_argument('inpath', type=str, help='The input path. The path to the mlf if that is the input. A dir path if labs or txt as input.')
-  parser.add_argument('txtdir', type=str, help="The directory containing the original txt files. If producing input from txt this is set to equal INPATH and is technically superfluous, but necessary for other contexts.")
+  parser.add_argument('labdir', type=str, help="The output lab dir. May be a .tar, .tar.gz, .tgz, .tar.bz2, .tbz2 or .zip corpus archive to write the labels into instead, see corpus_archive.")
+  parser.add_argument('inpath', type=str, help='The input path. The path to the mlf if that is the input. A dir path or corpus archive if labs or txt as input. SiRe labels may also be a binary label file, see -binary.')
+  parser.add_argument('txtdir', type=str, help="The directory or corpus archive containing the original txt files. If producing input from txt this is set to equal INPATH and is technically superfluous, but necessary for other contexts.")
   parser.add_argument('-dict', type=str, nargs=2, help="The path to the dictionary.", default=None, metavar=["DICTTYPE", "DICTPATH"])
   parser.add_argument('-phoneset', type=str, help="The phoneset to use - combilex or cmudict. Is overwritten to fit the dictionary if one is used.", default="combilex", choices=["combilex", "cmudict"])
   parser.add_argument('-questions', action="store_true", help="Write out a question set fitting the input dataset.")
@@ -167,12 +129,27 @@ if __name__ == "__main__":
   parser.add_argument('-stanford_pcfg_parse', action="store_true", help="Add stanford pcfg parse information from parses in provided dirpath. Note this assumes you have already run txt2parse to create a parse.")
   parser.add_argument('-stanford_dependency_parse', action="store_true", help="Add stanford dependency parse information from parses in provided dirpath. Note this assumes you have already run txt2parse to create a parse.")
   parser.add_argument('-context_type', type=str, choices=['absolute', 'relational', 'categorical'], help="The type of positional contexts to add.", default='absolute')
-  parser.add_argument('-parsedir', type=str, help="The path to the parses.", default="parse")
+  parser.add_argument('-parsedir', type=str, help="The path to the dir or corpus archive of the parses.", default="parse")
   parser.add_argument('-HHEd_fix', action="store_true", help="Applies a fix to the contexts around the current phoneme to be compatible with hardcoded delimiters in HHEd.")
   parser.add_argument('-comma_is_pause', action='store_true', help="If making labs from txt, commas mark where to pause and so we should pause.")
   parser.add_argument('-general_sil_phoneme', type=str, help="If making labs from txt, use this as the silence phoneme.", default="sil")
   parser.add_argument('-emphasis', action="store_true", help="If using a corpus emphasis tagged via all capital letters, use this to add emphasis features")
   parser.add_argument('-state_level', action="store_true", help="If the input labels are state aligned. Uses HTK 3.5 labels.")
+  parser.add_argument('-utt_cache', type=str, help="Store the built utterances in this dir and reuse them in later runs on the same input, e.g. when making labels with another context_type.", default=None, metavar=("CACHEDIR"))
+  parser.add_argument('-feature_matrix', type=str, help="Also write a float32 feature matrix for each utterance with a column per question in the NN question set. Requires -questions and a NN qtype.", choices=feature_matrix.MATRIX_FORMATS, default=None)
+  parser.add_argument('-matrixdir', type=str, help="The dir to write the feature matrices to. Default is the output lab dir.", default=None)
+  parser.add_argument('-validation', type=str, help="How the context values are checked. strict checks all utterances, sampled only VALIDATION_RATE of them and off none.", choices=context_skeletons.VALIDATION_POLICIES, default="strict")
+  parser.add_argument('-validation_rate', type=float, help="The fraction of utterances to check with -validation sampled.", default=0.1)
+  parser.add_argument('-utt_cache_size', type=int, help="The maximum size of the utterance cache in MB. The least recently used utterances are removed when it is full.", default=1024)
+  parser.add_argument('-context_set', type=str, help="Use this registered context set instead of the one chosen by CONTEXT_TYPE and the parse and emphasis options. See contexts.register_context_set.", default=None)
+  parser.add_argument('-context_modules', type=str, nargs="+", help="Python modules to import before choosing the context set, e.g. modules registering new context sets or feature groups.", default=[], metavar=("MODULE"))
+  parser.add_argument('-utt_list', type=str, help="Only make labels for the utts listed in this file (one id per line). For mlf input only these labels are read from the mlf, see mlf_index, and for lab dirs only these files are read.", default=None)
+  parser.add_argument('-io_threads', type=int, help="The number of threads reading the input, txt and parse files of a dir. Use 1 to read them one at a time.", default=io.IO_THREADS)
+  parser.add_argument('-shard', type=int, nargs=2, help="Only make labels for the I'th of N equal parts of the utts (counting from 0), e.g. to split the work over N processes.", default=None, metavar=("I", "N"))
+  parser.add_argument('-binary', type=str, help="Write all labels into one binary label file (see binary_labels) at this path ending in "+binary_labels.BINARY_LAB_EXT+" instead of a .lab file each in LABDIR. Only for Phone labels. Use SiReUtils/convertion_utils.py -binary_to_labs to get the .lab files.", default=None)
+  parser.add_argument('-mlf', type=str, help="Write all labels into one full-context mlf at this path instead of a .lab file each in LABDIR. LABDIR is still the default MATRIXDIR. Cannot be used with -incremental.", default=None)
+  parser.add_argument('-incremental', action="store_true", help="If LABDIR has labels made by an earlier run with -write_manifest or -incremental only compute the feature groups which changed since, e.g. when adding -emphasis, and add them to the existing labels. Utts whose words, syllables or phonemes changed are made from scratch. Also writes the label manifest, see -write_manifest. Cannot be used with -questions, -feature_matrix or AlignState labels.")
+  parser.add_argument('-write_manifest', action="store_true", help="Write a label manifest (sire_manifest.json, see label_manifest) to LABDIR telling what the labels were made of so a later -incremental run can update them. Runs with -utt_list or -shard write sire_manifest.TAG.json instead so runs making different parts of LABDIR do not overwrite each other's. Not for -mlf, -binary or a corpus archive as LABDIR.")
   #A few mutually exclusive groups
   #TODO should be more
   group = parser.add_mutually_exclusive_group()
@@ -190,6 +167,36 @@ if __name__ == "__main__":
     args.phoneme_features = phoneme_features.CombilexPhonemes()
   else:
     args.phoneme_features = phoneme_features.CMUPhonemes()
+  context_skeletons.set_validation(args.validation, args.validation_rate)
+  if args.utt_list != None:
+    args.utt_list = io.read_utt_list(args.utt_list)
+
+  if args.io_threads < 1:
+    raise SiReError("-io_threads must be at least 1!")
+  io.IO_THREADS = args.io_threads
+
+  #Check the context set asked for exists before doing any work.
+  for module in args.context_modules:
+    importlib.import_module(module)
+  contexts.get_context_set_name(args)
+
+  if args.binary:
+    if args.mlf:
+      raise SiReError("Cannot write both -binary and -mlf labels!")
+    if args.labtype != "Phone":
+      raise SiReError("Binary labels can only be made of Phone labels!")
+    if not binary_labels.is_binary_labels(args.binary):
+      raise SiReError("The path of binary labels must end with {0}!".format(binary_labels.BINARY_LAB_EXT))
+
+  if args.feature_matrix:
+    if not args.questions or args.qtype not in ["Nitech_NN", "CSTR_NN"]:
+      raise SiReError("A feature matrix can only be made with -questions and a NN qtype (Nitech_NN or CSTR_NN)!")
+    if args.matrixdir == None:
+      args.matrixdir = args.labdir
+    if corpus_archive.is_archive(args.matrixdir):
+      raise SiReError("Feature matrices cannot be written into a corpus archive! Please use -matrixdir.")
+    args.matrix_values = feature_matrix.LabelValueStore()
+
   #We use festival features always - hardcoded here as we want them in all full-context labs but not in e.g. corpus analysis
   args.festival_features = True
 
@@ -222,8 +229,8 @@ if __name__ == "__main__":
 
 
   if args.intype == "txt":
-    if not os.path.isdir(args.inpath):
-      raise SiReError("Input path is not a directory! It must be when creating labs from text.")
+    if not os.path.isdir(args.inpath) and not corpus_archive.is_archive(args.inpath):
+      raise SiReError("Input path is not a directory or corpus archive! It must be when creating labs from text.")
     args.txtdir = args.inpath
     labs = io.load_txt_dir(args.txtdir, args.comma_is_pause)
     if args.dict == None:
@@ -231,38 +238,109 @@ if __name__ == "__main__":
     args.dictionary = dictionary.Dictionary(args.dict[1], args.dict[0])
     #The phoneme set used must match the dictionary.
     args.phoneme_features = args.dictionary.phoneme_feats
-  elif args.intype == "hts_lab":
-    labs = io.open_labdir_line_by_line(args.inpath)
-    # print "This is a lab", len(labs[0])
+  elif args.intype == "sire_lab" and binary_labels.is_binary_labels(args.inpath):
+    #Only the labels used are read from the binary label file.
+    reader = binary_labels.BinaryLabelReader(args.inpath)
+    labs = reader.iter_labs(io.select_utts(reader.get_utt_ids(), args.utt_list, args.shard))
+  elif args.intype in ["hts_lab", "sire_lab"]:
+    #The labels are read by a pool of threads while making them.
+    #If only some utts are used only their labels are read.
+    utt_ids = None
+    if args.utt_list != None or args.shard != None:
+      utt_ids = io.select_utts(io.get_labdir_ids(args.inpath), args.utt_list, args.shard)
+    labs = io.iter_labdir_line_by_line(args.inpath, utt_ids=utt_ids)
     # labs is a list of lists. Each list within the list of one of the labs
-    args.intype = "hts_mlf"
-  elif args.intype == "sire_lab":
-    labs = io.open_labdir_line_by_line(args.inpath)
+    if args.intype == "hts_lab":
+      args.intype = "hts_mlf"
   else:
-    if not os.path.exists(args.inpath):
-      raise SiReError("Input path to mlf does no exist!")
-    mlf = open(args.inpath, "r").readlines()
-    labs = io.parse_mlf(mlf, args.intype)
+    #The labels are read one at a time while making them.
+    #If only some utts are used only their labels are read, using the index of the mlf.
+    labs = mlf_index.get_mlf_labs(args.inpath, args.intype, args.utt_list, args.shard)
+  if args.intype == "txt" and (args.utt_list != None or args.shard != None):
+    utt_ids = set(io.select_utts([lab[0] for lab in labs], args.utt_list, args.shard))
+    labs = [lab for lab in labs if lab[0] in utt_ids]
+  #The txt of each utt is read from the archive at once as it cannot be opened by path later.
+  if args.intype != "txt" and corpus_archive.is_archive(args.txtdir):
+    args.txtdict = read_txt_archive(args.txtdir)
+
+  #The context set is resolved once for all utts.
+  #This is done here as making labs from txt changes the phoneme features.
+  args.context_pipeline = contexts.get_context_pipeline(args)
 
   #Used if we make questions fitted to a dataset
-  #We use qfile as the path to the file later.
+  #The questions are written when all utts are done.
   if args.questions == True:
-    parser.add_argument('-qfile', type=str, help="A variable used to store the question file.", default=None)
-    args.qfile = open(args.qpath, "w")
-    parser.add_argument('-qfileutt', type=str, help="A variable used to store the GV question file.", default=None)
-    args.qfileutt = open(args.qpath+"_utt", "w")
+    if not os.path.isdir(os.path.dirname(args.qpath) or "."):
+      raise SiReError("The dir to write the question set to does not exist! ({0})".format(args.qpath))
+    args.question_accumulator = args.context_pipeline.get_question_accumulator()
+
+  #Each label is written whole, either to its own file in labdir or into one mlf.
+  #Labdir may also be a corpus archive. Binary labels are written as a table instead.
+  args.label_writer = None
+  args.binary_writer = None
+  if args.binary:
+    args.binary_writer = binary_labels.BinaryLabelWriter(args.binary)
+  elif args.mlf:
+    args.label_writer = label_writer.LabelWriter(mlf_path=args.mlf)
+  else:
+    args.label_writer = label_writer.LabelWriter(labdir=args.labdir)
+
+  #What the labels are made of is written to labdir when they are all done if asked for.
+  #Old manifests are removed or marked first so they are never out of date with the labels.
+  #There is no manifest for an mlf or archive as their labels cannot be updated.
+  keep_manifest = not args.mlf and not args.binary and not corpus_archive.is_archive(args.labdir)
+  write_manifest = args.write_manifest or args.incremental
+  if args.incremental and keep_manifest:
+    old_manifest = label_manifest.read_manifest(args.labdir)
+  args.label_manifest = label_manifest.LabelManifest(args)
+  if keep_manifest:
+    args.label_manifest.start(args.labdir, write_manifest)
+  args.label_updater = None
+  if args.incremental:
+    if not keep_manifest:
+      print "Warning! -incremental cannot be used with -mlf, -binary or a corpus archive as LABDIR. Making all labels from scratch."
+    elif args.questions or args.feature_matrix or args.labtype != "Phone":
+      print "Warning! -incremental cannot be used with -questions, -feature_matrix or AlignState labels. Making all labels from scratch."
+    elif old_manifest == None:
+      print "No label manifest in {0}. Making all labels from scratch.".format(args.labdir)
+    else:
+      updater = label_manifest.LabelUpdater(old_manifest, args.context_pipeline, args)
+      if updater.is_empty():
+        print "No feature groups of the labels in {0} can be reused. Making all labels from scratch.".format(args.labdir)
+      else:
+        print "Reusing feature groups {0} and computing {1}.".format(", ".join(sorted(updater.reused.keys())), ", ".join(updater.changed))
+        args.label_updater = updater
+
+  if args.utt_cache:
+    cache = utterance_cache.UtteranceCache(args.utt_cache, args.utt_cache_size)
 
   for lab in labs:
     print "Making full context label for {0}".format(lab[0])
     #Make an utt
     # print "The lab sent in", lab
-    utt = utterance.Utterance(lab, args)
-    #This writes out the label and also the questions
-    write_context_utt(utt, args)
+    if args.utt_cache:
+      utt = cache.get_utterance(lab, args)
+    else:
+      utt = utterance.Utterance(lab, args)
+    if args.label_updater != None:
+      update_context_utt(utt, args)
+    else:
+      #The labels use all the layers asked for.
+      utt.load_layers()
+      #This writes out the label and also the questions
+      write_context_utt(utt, args)
+
+  if args.utt_cache:
+    print "Utterance cache: {0} loaded, {1} built.".format(cache.hits, cache.misses)
+
+  if args.binary_writer != None:
+    args.binary_writer.close()
+  else:
+    args.label_writer.close()
+  if keep_manifest:
+    args.label_manifest.finish(args.labdir, write_manifest)
 
-  #Removes duplicates in the question set
   if args.questions:
-    args.qfile.close()
-    finalise_questions(args.qpath)
-    args.qfileutt.close()
-    finalise_questions(args.qpath+"_utt")
+    write_questions(args)
+  if args.feature_matrix:
+    write_feature_matrices(args)
@@ -66,30 +66,25 @@ def write_initial_alignment_mlfs(utt, spmlf, nospmlf, no_stop_split=False):
   nospmlf.write(".\n")
 
 #Writes out an HTK SLF lattice for lattice based alignment.
-def write_slf_alignment_lattices(outpath, sent, slfdirpath, dictionary, pronoun_variant):
+#Slfwriter is a sire_io.CorpusWriter writing to a dir or corpus archive.
+def write_slf_alignment_lattices(outpath, sent, slfwriter, dictionary, pronoun_variant):
   #Make the SLF
   slf = lattice_tools.make_phoneme_slf(sent, dictionary, pronoun_variant)
   
   #Write it out
-  wf = open(os.path.join(slfdirpath, outpath), "w")
-  for l in slf:
-    wf.write(l)
-  wf.close()
+  slfwriter.write(outpath, "".join(slf))
 
 #Writes out an HTK SLF lattice for phoneme ngram re-scoring.
-def write_slf_phoneme_ngram_lattices(outpath, sent, slfdirpath, dictionary, no_syll_stress):
+def write_slf_phoneme_ngram_lattices(outpath, sent, slfwriter, dictionary, no_syll_stress):
   #Make the SLF
   slf = lattice_tools.make_phoneme_slf(sent, dictionary, pronoun_variant=True, no_syll_stress=no_syll_stress, SRILM_lattice_fix=True)
   
   #Write it out
-  wf = open(os.path.join(slfdirpath, outpath), "w")
-  for l in slf:
-    wf.write(l)
-  wf.close()
+  slfwriter.write(outpath, "".join(slf))
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(description='Create alignment mlfs and slfs.')
-  parser.add_argument('txtdir', type=str, help="The directory containing the txt files with the sentences to create lattices/mlfs from.")
+  parser.add_argument('txtdir', type=str, help="The directory or corpus archive containing the txt files with the sentences to create lattices/mlfs from.")
   parser.add_argument('combilexpath', type=str, help="The path to the combilex dictionary directory.")
   parser.add_argument('outdir', type=str, help="The outpath directory.")
   parser.add_argument('-mlf', action="store_true", help="Output mlfs.")
@@ -97,6 +92,7 @@ if __name__ == "__main__":
   parser.add_argument('-pronoun_variant', action="store_true", help="Create pronounciation variant slfs. Always true when creating phoneme ngram slfs.")
   parser.add_argument('-no_syll_stress', action="store_true", help="Create pronounciation variant slfs for ngram rescoring without syllable stress information.")
   parser.add_argument('-no_stop_split', action="store_true", help="If making mlfs do not split stops in two.")
+  parser.add_argument('-slf_archive', type=str, help="Write the slfs into this corpus archive (.tar, .tar.gz, .tgz, .tar.bz2, .tbz2 or .zip) instead of OUTDIR.", default=None)
   
   group = parser.add_mutually_exclusive_group()
   group.add_argument('-slf_phoneme', action="store_true", help="Output phoneme ngram rescoring suitable slfs.")
@@ -126,6 +122,12 @@ if __name__ == "__main__":
   
   txtfiles = io.load_txt_dir(args.txtdir)
   
+  if args.slf_align or args.slf_phoneme:
+    if args.slf_archive:
+      slfwriter = io.CorpusWriter(args.slf_archive)
+    else:
+      slfwriter = io.CorpusWriter(args.outdir)
+  
   #Opening the mlf files here means we don't have to loop twice if outputting slfs as well.
   if args.mlf:
     #Out mlf with short pause
@@ -143,10 +145,12 @@ if __name__ == "__main__":
       #Write out mlfs for standard alignment methods.
       write_initial_alignment_mlfs(utt, wfsp, wfnosp, args.no_stop_split)
     if args.slf_align:
-      write_slf_alignment_lattices(txt[0]+'.slf', txt[1:], args.outdir, args.dictionary, args.pronoun_variant)
+      write_slf_alignment_lattices(txt[0]+'.slf', txt[1:], slfwriter, args.dictionary, args.pronoun_variant)
     elif args.slf_phoneme:
-      write_slf_phoneme_ngram_lattices(txt[0]+'.slf', txt[1:], args.outdir, args.dictionary, args.no_syll_stress)
+      write_slf_phoneme_ngram_lattices(txt[0]+'.slf', txt[1:], slfwriter, args.dictionary, args.no_syll_stress)
   
   if args.mlf:
     wfsp.close()
     wfnosp.close()
+  if args.slf_align or args.slf_phoneme:
+    slfwriter.close()
@@ -25,6 +25,7 @@ site.addsitedir(".")
 #Other imports
 import argparse, subprocess, os
 import sire_io as io
+import mlf_index
 
 #It is assumed that the input mlf uses "#1" and "#2" to mark syllable stress at the beginning of syllables. This is changed to "sb"
 #"." to mark word internal syllable boundaries. This is changed to "sb".
@@ -65,11 +66,15 @@ if __name__ == "__main__":
   parser.add_argument('-lm_binary_options', type=str, help="Additional arguments to be sent to the ngram binary as options. Overwrites the defaults options: -order 4 -interpolate -gt3min 1 -wbdiscount -debug 3", nargs=argparse.REMAINDER, default='-order 4 -interpolate -gt3min 1 -wbdiscount -debug 3'.split())
   parser.add_argument('-f', action='store_true', help="Force overwrite of outputpath file if it exists.")
   parser.add_argument('-no_syll_stress', action='store_true', help="Replace syllable stress markers with a boundary marker sb.")
+  parser.add_argument('-utt_list', type=str, help="Only use the utts listed in this file (one id per line).", default=None)
+  parser.add_argument('-shard', type=int, nargs=2, help="Only use the I'th of N equal parts of the utts (counting from 0).", default=None, metavar=("I", "N"))
   args = parser.parse_args()
   
   wf = io.open_writefile_safe(os.path.join(args.outpath, "sents.txt"), args.f)
   
-  labs = io.parse_mlf(io.open_file_line_by_line(args.input_mlf), "align_mlf")
+  if args.utt_list != None:
+    args.utt_list = io.read_utt_list(args.utt_list)
+  labs = mlf_index.get_mlf_labs(args.input_mlf, "align_mlf", args.utt_list, args.shard)
   
   labs = get_phoneme_strings(labs, args.no_syll_stress)
   